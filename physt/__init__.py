@@ -53,8 +53,14 @@ def histogram(data, bins=None, *args, **kwargs):
     adaptive: bool
         whether we want the bins to be modifiable
         (useful for continuous filling of a priori unknown data)
-    dtype: type
-        customize underlying data type: default int64 (without weight) or float (with weights)
+    dtype: type or "auto"
+        customize underlying data type: default int64 (without weight) or float (with weights);
+        "auto" for compact counters promoted as necessary
+    chunk_size: int
+        maximum number of values processed at once (limits the memory footprint)
+        default: histogram1d.DEFAULT_CHUNK_SIZE
+    workers: int
+        number of threads to bin the values in (default: 1)
 
     Other numpy.histogram parameters are excluded, see the methods of the Histogram1D class itself.
 
@@ -67,7 +73,7 @@ def histogram(data, bins=None, *args, **kwargs):
     numpy.histogram
     """
     import numpy as np
-    from .histogram1d import Histogram1D, calculate_frequencies
+    from .histogram1d import Histogram1D, calculate_frequencies, _has_nans
     from .binnings import calculate_bins
 
     adaptive = kwargs.pop("adaptive", False)
@@ -84,26 +90,34 @@ def histogram(data, bins=None, *args, **kwargs):
     keep_missed = kwargs.pop("keep_missed", True)
     name = kwargs.pop("name", None)
     axis_name = kwargs.pop("axis_name", None)
+    chunk_size = kwargs.pop("chunk_size", None)
+    workers = kwargs.pop("workers", None)
 
     # Convert to array
     if data is not None:
         array = np.asarray(data) #.flatten()
-        if dropna:
-            array = array[~np.isnan(array)]
+        if dropna and _has_nans(array, chunk_size):
+            bin_array = array[~np.isnan(array)]    # Copy only if necessary
+        else:
+            bin_array = array
     else:
-        array = None
+        array = bin_array = None
 
     # Get binning
-    binning = calculate_bins(array, bins, *args,
+    binning = calculate_bins(bin_array, bins, *args,
                              check_nan=not dropna and array is not None,
                              adaptive=adaptive, **kwargs)
+    del bin_array
     # bins = binning.bins
 
     # Get frequencies
     if array is not None:
         (frequencies, errors2, underflow, overflow, stats) =\
             calculate_frequencies(array, binning=binning,
-                                  weights=weights, dtype=dtype)
+                                  weights=weights,
+                                  dtype=(None if dtype == "auto" else dtype),
+                                  dropna=dropna, chunk_size=chunk_size,
+                                  workers=workers)
     else:
         frequencies = None
         errors2 = None
@@ -150,10 +164,8 @@ def histogram2d(data1, data2, bins=10, *args, **kwargs):
         if hasattr(data1, "name") and hasattr(data2, "name"):
             kwargs["axis_names"] = [data1.name, data2.name]
     if data1 is not None and data2 is not None:
-        data1 = np.asarray(data1)
-        data2 = np.asarray(data2)
-        data = np.concatenate([data1[:, np.newaxis],
-                               data2[:, np.newaxis]], axis=1)
+        data = [np.asarray(data1), np.asarray(data2)]    # Binned as columns, not stacked
+        kwargs["columns"] = True
     else:
         data = None
     return histogramdd(data, bins, *args, dim=2, **kwargs)
@@ -167,7 +179,9 @@ def histogramdd(data, bins=10, *args, **kwargs):
     Parameters
     ----------
     data : array_like
-        Container of all the values
+        Container of all the values: array of shape (count, dim),
+        structured array or pandas DataFrame (each field / column is one axis)
+        or a sequence of dim 1D arrays (with columns=True)
     bins: Any
     weights: array_like, optional
         (as numpy.histogram)
@@ -181,9 +195,15 @@ def histogramdd(data, bins=10, *args, **kwargs):
         whether the bins should be updated when new non-fitting value are filled
     dtype: Optional[type]
         Underlying type for the histogram.
-        If weights are specified, default is float. Otherwise int64
+        If weights are specified, default is float. Otherwise int64.
+        "auto" for compact counters promoted as necessary.
     dim: int
         Dimension - necessary if you are creating an empty adaptive histogram
+    columns: bool
+        Whether the data are in columns (shape (dim, count) or a list of arrays).
+        The columns are binned directly, without being stacked to one array.
+    workers: int
+        number of threads to bin the values in (default: 1)
 
     Returns
     -------
@@ -195,6 +215,7 @@ def histogramdd(data, bins=10, *args, **kwargs):
     """
     import numpy as np
     from . import histogram_nd
+    from .histogram_nd import _prepare_columns, _drop_nan_rows
     from .binnings import calculate_bins_nd
 
     adaptive = kwargs.pop("adaptive", False)
@@ -202,6 +223,9 @@ def histogramdd(data, bins=10, *args, **kwargs):
     name = kwargs.pop("name", None)
     dim = kwargs.pop("dim", None)
     axis_names = kwargs.pop("axis_names", None)
+    workers = kwargs.pop("workers", None)
+    columns = kwargs.pop("columns", False)
+    weights = kwargs.pop("weights", None)
 
     # pandas - guess axis names
     if not "axis_names" in kwargs:
@@ -212,21 +236,17 @@ def histogramdd(data, bins=10, *args, **kwargs):
                 pass # Perhaps columns has different meaning here.
 
     # Prepare and check data
-    # Convert to array
+    # Split to columns (views, no copy)
     if data is not None:
-        data = np.asarray(data)
-        if data.ndim != 2:
-            raise RuntimeError("Array must have shape (n, d)")
-        if dim is not None and dim != data.shape[1]:
-            raise RuntimeError("Dimension mismatch: {0}!={1}".format(dim, data.shape[1]))
-        _, dim = data.shape
+        data = _prepare_columns(data, ndim=dim, columns=columns)
+        dim = len(data)
         if dropna:
-            data = data[~np.isnan(data).any(axis=1)]
+            data, weights = _drop_nan_rows(data, weights)
         check_nan = not dropna
     else:
         if dim is None:
             raise RuntimeError("You have to specify either data or its dimension.")
-        data = np.zeros((0, dim))
+        data = [np.zeros(0)] * dim
         check_nan = False
 
     # Prepare bins
@@ -235,10 +255,11 @@ def histogramdd(data, bins=10, *args, **kwargs):
     #bins = [binning.bins for binning in bin_schemas]
 
     # Prepare remaining data
-    weights = kwargs.pop("weights", None)
     frequencies, errors2, missed = histogram_nd.calculate_frequencies(data, ndim=dim,
                                                                       binnings=bin_schemas,
-                                                                      weights=weights)
+                                                                      weights=weights,
+                                                                      workers=workers,
+                                                                      columns=True)
 
     kwargs["name"] = name
     if axis_names:
@@ -275,7 +296,7 @@ def h3(data, *args, **kwargs):
     if data is not None and isinstance(data, (list, tuple)) and not np.isscalar(data[0]):
         if "axis_names" not in kwargs:
             kwargs["axis_names"] = [(column.name if hasattr(column, "name") else None) for column in data]
-        data = np.concatenate([item[:, np.newaxis] for item in data], axis=1)
+        kwargs["columns"] = True
     else:
         kwargs["dim"] = 3    
     return histogramdd(data, *args, **kwargs)
@@ -179,3 +179,30 @@ def is_bin_subset(sub, sup):
 def is_bin_superset(sup, sub):
     """Inverse of is_bin_subset"""
     return is_bin_subset(sub=sub, sup=sup)
+
+
+def bin_map_to_indices(bin_map):
+    """Turn a bin map into arrays of old and new bin indices.
+
+    Parameters
+    ----------
+    bin_map: Iterable[(old, new)] or numpy.ndarray
+        Pairs of old and new bin indices or an integer array
+        with the new bin index for each of the old bins.
+
+    Returns
+    -------
+    old_indices: numpy.ndarray
+    new_indices: numpy.ndarray
+
+    Examples
+    --------
+    >>> bin_map_to_indices([(0, 0), (1, 0), (2, 1)])
+    (array([0, 1, 2]), array([0, 0, 1]))
+    >>> bin_map_to_indices(np.array([0, 0, 1]))
+    (array([0, 1, 2]), array([0, 0, 1]))
+    """
+    if isinstance(bin_map, np.ndarray) and bin_map.ndim == 1:
+        return np.arange(bin_map.shape[0]), bin_map.astype(np.intp, copy=False)
+    pairs = np.array(list(bin_map), dtype=np.intp).reshape(-1, 2)
+    return pairs[:, 0], pairs[:, 1]
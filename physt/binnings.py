@@ -1,14 +1,21 @@
 """Different binning algorithms/schemas for the histograms."""
 from __future__ import absolute_import, division
 
+import math
+
 import numpy as np
 from .bin_utils import (make_bin_array, is_consecutive, to_numpy_bins,
-                        is_rising, is_bin_subset, to_numpy_bins_with_mask)
+                        is_rising, is_bin_subset, to_numpy_bins_with_mask,
+                        bin_map_to_indices)
 from .util import find_subclass
+from .quantiles import QuantileSketch
 
 
 # TODO: Locking and edit operations (like numpy read-only)
 
+# Bin index of values falling between two inconsecutive bins
+GAP_INDEX = -2
+
 
 class BinningBase(object):
     """Abstract base class for binning schemas.
@@ -17,6 +24,7 @@ class BinningBase(object):
     ----------
     - define at least one of the following properties: bins, numpy_bins (cached conversion exists)
     - if you modify bins, put _bins and _numpy_bins into proper state (None may be sufficient)
+      and call _invalidate_cache to drop the other derived representations
     - checking of proper bins should be done in __init__
     - if you want to support adaptive histogram, override _force_bin_existence
     - implement _update_dict to contain the binning representation
@@ -59,6 +67,7 @@ class BinningBase(object):
         if isinstance(index, slice):
             new_binning = self.as_static()
             new_binning._bins = new_binning.bins[index]
+            new_binning._invalidate_cache()
             return new_binning
         else:
             return self.bins[index]
@@ -106,7 +115,10 @@ class BinningBase(object):
         -------
         bool
         """
-        return np.allclose(np.diff(self.bins[1] - self.bins[0]), 0.0, rtol=rtol, atol=atol)
+        return self._get_cached(
+            ("regular", rtol, atol),
+            lambda: bool(np.allclose(np.diff(self.bins[:, 1] - self.bins[:, 0]), 0.0,
+                                     rtol=rtol, atol=atol)))
 
     def is_consecutive(self, rtol=1.e-5, atol=1.e-8):
         """Whether all bins are in a growing order.
@@ -124,7 +136,8 @@ class BinningBase(object):
             if self._consecutive is None:
                 if self._numpy_bins is not None:
                     self._consecutive = True
-                self._consecutive = is_consecutive(self.bins, rtol, atol)
+                else:
+                    self._consecutive = is_consecutive(self.bins, rtol, atol)
             return self._consecutive
         else:
             return True
@@ -247,10 +260,115 @@ class BinningBase(object):
         --------
         bin_utils.to_numpy_bins_with_mask
         """
-        bwm = to_numpy_bins_with_mask(self.bins)
-        if not self.includes_right_edge:
-            bwm[0].append(np.inf)
-        return bwm
+        def calculate():
+            edges, mask = to_numpy_bins_with_mask(self.bins)
+            if not self.includes_right_edge:
+                edges = np.append(edges, np.inf)
+            return edges, mask
+        return self._get_cached("numpy_bins_with_mask", calculate)
+
+    # Representations derived from the bins (see _get_cached)
+    _cache = None
+
+    def _get_cached(self, key, function):
+        """Representation of the bins, computed only once.
+
+        All representations are dropped by _invalidate_cache.
+        The returned values are shared and must not be modified.
+
+        Parameters
+        ----------
+        key: Hashable
+        function: Callable
+            Computes the value if not available.
+        """
+        if self._cache is None:
+            self._cache = {}
+        elif key in self._cache:
+            return self._cache[key]
+        value = self._cache[key] = function()
+        return value
+
+    def _invalidate_cache(self):
+        """Drop all cached representations of the bins.
+
+        Has to be called whenever the bins change
+        (_force_bin_existence, _set_min_and_count, ...).
+        """
+        self._cache = None
+        self._consecutive = None
+
+    def _get_search_edges(self):
+        """Numpy-like edges prepared for _adjust_bin_indices (cached).
+
+        Returns
+        -------
+        np.ndarray
+        """
+        return self._get_cached("search_edges", lambda: _search_edges(self.numpy_bins))
+
+    def _find_bin_indices(self, values):
+        """Vectorized bin lookup.
+
+        Each value is searched in the edge array (O(log bin_count)),
+        no sorting of values is necessary. For consecutive bins of equal
+        width (e.g. from np.linspace), the indices are computed directly.
+        Override if the binning allows direct computation of indices.
+
+        Parameters
+        ----------
+        values: np.ndarray
+
+        Returns
+        -------
+        np.ndarray
+            Bin indices (-1=underflow, bin_count=overflow, GAP_INDEX=between
+            inconsecutive bins). The right edge of the last bin is included in it.
+        """
+        values = np.asarray(values)
+        if self.bin_count == 0:
+            return np.zeros(values.shape, dtype=np.intp)
+        edges = self._get_cached("regular_edges", lambda: _regular_edges(self.bins))
+        if edges is not None:
+            return _adjust_bin_indices(values, (values - edges[0]) / (edges[1] - edges[0]), edges)
+        edges, lookup = self._get_cached("search_lookup", self._calculate_search_lookup)
+        return lookup[np.searchsorted(edges, values, side="right")]
+
+    def _calculate_search_lookup(self):
+        """Edges to search values in and bin indices for the search results.
+
+        Returns
+        -------
+        edges: np.ndarray
+            All edges (including those of gaps), the right one included in the last bin
+        lookup: np.ndarray
+            Bin index for each position returned by searchsorted
+        """
+        edges, mask = to_numpy_bins_with_mask(self.bins)
+        edges = _search_edges(edges)
+
+        # Position 0 => underflow, len(edges) => overflow, otherwise interval (position - 1)
+        lookup = np.full(edges.shape[0] + 1, GAP_INDEX, dtype=np.intp)
+        lookup[0] = -1
+        lookup[np.asarray(mask, dtype=np.intp) + 1] = np.arange(self.bin_count)
+        lookup[-1] = self.bin_count
+        return edges, lookup
+
+    def _find_bin_index(self, value):
+        """Bin index of a single value calculated directly (without searching the edges).
+
+        Scalar variant of _find_bin_indices for binnings that allow it
+        (otherwise None is returned and the caller has to search).
+
+        Parameters
+        ----------
+        value: float
+
+        Returns
+        -------
+        int or None
+        """
+        return None
 
     @property
     def first_edge(self):
@@ -260,7 +378,7 @@ class BinningBase(object):
         -------
         float
         """
-        if self._numpy_bins is None:
+        if self._numpy_bins is not None:
             return self._numpy_bins[0]
         else:
             return self.bins[0][0]
@@ -273,7 +391,7 @@ class BinningBase(object):
         -------
         float
         """
-        if self._numpy_bins is None:
+        if self._numpy_bins is not None:
             return self._numpy_bins[-1]
         else:
             return self.bins[-1][1]
@@ -322,29 +440,30 @@ class BinningBase(object):
         raise NotImplementedError()
 
     def apply_bin_map(self, bin_map):
-        """
+        """Binning with bins merged according to a map.
 
         Parameters
         ----------
-        bin_map: Iterator(tuple)
-            The bins must be in ascending order
+        bin_map: Iterable[tuple] or np.ndarray
+            Pairs (old bin index, new bin index) or array with the new index
+            for each old bin. The bins must be in ascending order.
 
         Returns
         -------
         BinningBase
         """
-        length = max(item[1] for item in bin_map) + 1
-        bins = np.empty((length, 2), dtype=float)
-        bins[:] = np.nan
-        for old, new in bin_map:
-            if np.isnan(bins[new, 0]):
-                bins[new, :] = self.bins[old, :]
-            else:
-                if bins[new, 1] != self.bins[old, 0]:
-                    raise RuntimeError("Merging non-consecutive bins")
-                bins[new, 1] = self.bins[old, 1]
-        if np.any(np.isnan(bins)):
+        old_indices, new_indices = bin_map_to_indices(bin_map)
+        length = new_indices.max() + 1
+        if not np.array_equal(np.unique(new_indices), np.arange(length)):
             raise RuntimeError("New binning is not complete.")
+        if np.any(new_indices[1:] < new_indices[:-1]):
+            raise RuntimeError("Bins must be in rising order.")
+        old_bins = self.bins[old_indices]
+        first = np.concatenate([[True], new_indices[1:] != new_indices[:-1]])
+        last = np.concatenate([first[1:], [True]])
+        if np.any(old_bins[1:, 0][~first[1:]] != old_bins[:-1, 1][~first[1:]]):
+            raise RuntimeError("Merging non-consecutive bins")
+        bins = np.column_stack([old_bins[first, 0], old_bins[last, 1]]).astype(float)
         includes_right_edge = (self.includes_right_edge and bins[-1, 1] == self.bins[-1, 1])
         binning = StaticBinning(bins, includes_right_edge=includes_right_edge)
         return binning
@@ -384,6 +503,7 @@ class StaticBinning(BinningBase):
     def __getitem__(self, item):
         copy = self.copy()
         copy._bins = self._bins[item]
+        copy._invalidate_cache()
         # TODO: check for the right_edge??
         return copy
 
@@ -392,8 +512,8 @@ class StaticBinning(BinningBase):
 
     def _adapt(self, other):
         if is_bin_subset(other.bins, self.bins):
-            indices = np.searchsorted(other.bins[:, 0], self.bins[:, 0])
-            return None, list(enumerate(indices))
+            indices = np.searchsorted(self.bins[:, 0], other.bins[:, 0])
+            return None, indices
 
     def __repr__(self):
         return "{0}({1})".format(self.__class__.__name__, repr(self.bins))
@@ -421,11 +541,18 @@ class NumpyBinning(BinningBase):
 
 
 class FixedWidthBinning(BinningBase):
-    """Binning schema with predefined bin width."""
+    """Binning schema with predefined bin width.
+
+    With max_bins set, the binning never grows over this number of bins.
+    Instead, the bin width is doubled (merging pairs of bins aligned to the doubled width)
+    until the bins fit. Binnings with the same original width and shift thus stay
+    mergeable.
+    """
     adaptive_allowed = True
 
     def __init__(self, bin_width, bin_count=0, bin_times_min=None, min=None,
-                 includes_right_edge=False, adaptive=False, bin_shift=None, align=True, **kwargs):
+                 includes_right_edge=False, adaptive=False, bin_shift=None, align=True,
+                 max_bins=None, **kwargs):
         super(FixedWidthBinning, self).__init__(adaptive=adaptive,
                                                 includes_right_edge=includes_right_edge)
         # TODO: Check edge cases for min/shift/align
@@ -435,6 +562,8 @@ class FixedWidthBinning(BinningBase):
             raise RuntimeError("Bin count must be >= 0.")
         if (bin_times_min is not None or bin_shift is not None) and (min is not None):
             raise RuntimeError("Cannot specify both min and (times_min or shift)")
+        if max_bins is not None and max_bins < 2:
+            raise RuntimeError("Maximum number of bins must be >= 2.")
         self._bin_width = float(bin_width)
         self._align = align
         self._bin_count = int(bin_count)
@@ -444,14 +573,21 @@ class FixedWidthBinning(BinningBase):
         else:
             self._times_min = bin_times_min
             self._shift = bin_shift or 0.0
+        if self._bin_count and self._times_min is None:
+            raise RuntimeError("Position of the bins (min or bin_times_min) must be specified.")
         self._bins = None
         self._numpy_bins = None
+        self._max_bins = max_bins
+        if max_bins is not None and self._bin_count > max_bins:
+            self._coarsen(max_bins)
 
     def __repr__(self):
         result = "{0}(bin_width={1}, bin_count={2}, min={3}".format( 
             self.__class__.__name__,
             self.bin_width, self.bin_count, self.first_edge
         )
+        if self._max_bins is not None:
+            result += ", max_bins={0}".format(self._max_bins)
         if self.is_adaptive():
             result += ", adaptive=True"
         return result + ")"
@@ -470,15 +606,17 @@ class FixedWidthBinning(BinningBase):
             self._bin_count = 1
             self._bins = None
             self._numpy_bins = None
+            self._invalidate_cache()
             return ()
         else:
+            # Edges calculated directly (numpy_bins would be O(bin_count))
             add_left = add_right = 0
-            if value < self.numpy_bins[0]:
-                add_left = int(np.ceil((self.numpy_bins[0] - value) / self.bin_width))
+            if value < self.first_edge:
+                add_left = int(np.ceil((self.first_edge - value) / self.bin_width))
                 self._times_min -= add_left
                 self._bin_count += add_left
-            elif value >= self.numpy_bins[-1]:
-                add_right = (value - self.numpy_bins[-1]) / self.bin_width
+            elif value >= self.last_edge:
+                add_right = (value - self.last_edge) / self.bin_width
                 add_right = int(np.ceil(add_right))
                 self._bin_count += add_right
                 if self.last_edge == value and not includes_right_edge:
@@ -487,21 +625,71 @@ class FixedWidthBinning(BinningBase):
             if add_left or add_right:
                 self._bins = None
                 self._numpy_bins = None
+                self._invalidate_cache()
                 return add_left
             else:
                 return None
 
     def _force_bin_existence(self, values, includes_right_edge=None):
+        times_min, bin_count = self._times_min, self._bin_count
         if np.isscalar(values):
-            return self._force_bin_existence_single(values, includes_right_edge=includes_right_edge)
+            result = self._force_bin_existence_single(values, includes_right_edge=includes_right_edge)
         else:
             min, max = np.min(values), np.max(values)
             result = self._force_bin_existence_single(min)
             result2 = self._force_bin_existence_single(max, includes_right_edge=includes_right_edge)
             if result is None:
-                return result2
-            else:
-                return result
+                result = result2
+        if self._max_bins is not None and self._bin_count > self._max_bins:
+            factor = self._coarsen(self._max_bins)
+            if not bin_count:
+                return ()
+            return _coarsened_bin_map(times_min, bin_count, factor, self._times_min)
+        return result
+
+    @property
+    def max_bins(self):
+        """Maximum number of bins (None => unlimited)."""
+        return self._max_bins
+
+    def _coarsen(self, max_bins):
+        """Double the bin width until there are at most max_bins bins.
+
+        Pairs of bins aligned to the doubled width are merged (i.e. the edges
+        stay on the lattice of the original width and shift).
+
+        Returns
+        -------
+        int
+            Factor by which the bin width was multiplied.
+        """
+        factor = 1
+        times_min, times_max = int(self._times_min), int(self._times_min + self._bin_count)
+        while times_max - times_min > max_bins:
+            times_min = times_min // 2
+            times_max = -(-times_max // 2)
+            factor *= 2
+        if factor > 1:
+            self._bin_width *= factor
+            self._set_min_and_count(times_min, times_max - times_min)
+        return factor
+
+    def _find_bin_indices(self, values):
+        values = np.asarray(values)
+        if self._bin_count == 0:
+            return np.zeros(values.shape, dtype=np.intp)
+        candidates = (values - self.first_edge) / self.bin_width
+        return _adjust_bin_indices(values, candidates, self._get_search_edges())
+
+    def _find_bin_index(self, value):
+        if self._bin_count == 0:
+            return 0
+        candidate = (value - self.first_edge) / self._bin_width
+        return _adjust_bin_index(value, candidate, self._get_edge, self._bin_count)
+
+    def _get_edge(self, index):
+        # Same arithmetic as in numpy_bins (=> the same value)
+        return (self._times_min + index) * self._bin_width + self._shift
 
     @property
     def first_edge(self):
@@ -533,31 +721,19 @@ class FixedWidthBinning(BinningBase):
             bin_times_min=self._times_min,
             bin_shift=self._shift,
             includes_right_edge=self.includes_right_edge,
-            adaptive=self._adaptive)
+            adaptive=self._adaptive,
+            max_bins=self._max_bins)
 
     @property
     def bin_width(self):
         return self._bin_width
 
-    def _force_new_min_max(self, new_min, new_max):
-        bin_map = None
-        add_right = add_left = 0
-        if new_min < self._times_min:
-            add_left = self._times_min - new_min
-        if new_max - self._times_min > self._bin_count:
-            add_right = new_max - self._times_min - self._bin_count
-        if add_left or add_right:
-            bin_map = ((i, i + add_left) for i in range(self._bin_count))
-            self._set_min_and_count(
-                self._times_min - add_left,
-                self._bin_count + add_left + add_right)
-        return bin_map
-
     def _set_min_and_count(self, times_min, bin_count):
         self._bin_count = bin_count
         self._times_min = times_min
         self._bins = None
         self._numpy_bins = None
+        self._invalidate_cache()
 
     def _adapt(self, other):
         """
@@ -568,28 +744,52 @@ class FixedWidthBinning(BinningBase):
 
         Returns
         -------
-        bin_map1: Iterable[tuple] or None
-        bin_map2: Iterable[tuple] or None
+        bin_map1: int or Iterable[tuple] or np.ndarray or None
+        bin_map2: int or Iterable[tuple] or np.ndarray or None
+            None if the bins did not change, an offset (that also iterates
+            as (old, new) pairs) if they were only shifted, an array
+            with the new index of each old bin if they were coarsened.
         """
         other = other.as_fixed_width()
-        if self.bin_width != other.bin_width:
-            raise RuntimeError("Cannot adapt fixed-width histograms with different widths")
         if self._shift != other._shift:
             raise RuntimeError("Cannot adapt shifted fixed-width histograms: {0} vs {1}"
                                .format(self._shift, other._shift))
-        # Following operations modify schemas
-        other = other.copy()
+        if self.bin_width != other.bin_width:
+            # Widths coarsened by max_bins policy differ by a power of two
+            ratio = max(self.bin_width, other.bin_width) / min(self.bin_width, other.bin_width)
+            if self._max_bins is None or 2 ** int(round(np.log2(ratio))) != ratio:
+                raise RuntimeError("Cannot adapt fixed-width histograms with different widths")
         if other.bin_count == 0:
             return None, ()
         if self.bin_count == 0:
+            self._bin_width = other.bin_width
             self._set_min_and_count(other._times_min, other.bin_count)
+            if self._max_bins is not None and self._bin_count > self._max_bins:
+                return (), _coarsened_bin_map(other._times_min, other.bin_count,
+                                              self._coarsen(self._max_bins), self._times_min)
             return (), None
-        new_min = min(self._times_min, other._times_min)
-        new_max = max(self._times_min + self._bin_count, other._times_min + other._bin_count)
 
-        bin_map1 = self._force_new_min_max(new_min, new_max)
-        bin_map2 = other._force_new_min_max(new_min, new_max)
-        return bin_map1, bin_map2
+        # Following operations modify the schema (to the common width first)
+        bin_width = max(self.bin_width, other.bin_width)
+        factors = [int(round(bin_width / binning.bin_width)) for binning in (self, other)]
+        old_states = [(binning._times_min, binning.bin_count) for binning in (self, other)]
+        new_min = min(times_min // factor for (times_min, _), factor in zip(old_states, factors))
+        new_max = max(-(-(times_min + bin_count) // factor)
+                      for (times_min, bin_count), factor in zip(old_states, factors))
+        self._bin_width = bin_width
+        self._set_min_and_count(new_min, new_max - new_min)
+        if self._max_bins is not None and self._bin_count > self._max_bins:
+            factors = [factor * self._coarsen(self._max_bins) for factor in factors]
+
+        bin_maps = []
+        for (times_min, bin_count), factor in zip(old_states, factors):
+            if factor > 1:
+                bin_maps.append(_coarsened_bin_map(times_min, bin_count, factor, self._times_min))
+            elif times_min == self._times_min and bin_count == self._bin_count:
+                bin_maps.append(None)
+            else:
+                bin_maps.append(_ShiftBinMap(times_min - self._times_min, bin_count))
+        return tuple(bin_maps)
 
     def as_fixed_width(self, copy=True):
         if copy:
@@ -603,42 +803,477 @@ class FixedWidthBinning(BinningBase):
         a_dict["bin_width"] = self.bin_width
         a_dict["bin_shift"] = self._shift
         a_dict["bin_times_min"] = self._times_min
+        if self._max_bins is not None:
+            a_dict["max_bins"] = self._max_bins
 
 
 class ExponentialBinning(BinningBase):
-    """Binning schema with exponentially distributed bins."""
-    adaptive_allowed = False
+    """Binning schema with exponentially distributed bins.
 
-    # TODO: Implement adaptivity
+    The adaptive binning is extended in whole log_width steps on either side,
+    so that binnings with the same log_width (and edges on the same lattice)
+    can be merged by only shifting the bins.
+    """
+    adaptive_allowed = True
 
-    def __init__(self, log_min, log_width, bin_count, includes_right_edge=True,
+    def __init__(self, log_min, log_width, bin_count, includes_right_edge=None,
                  adaptive=False, **kwargs):
+        if includes_right_edge is None:
+            includes_right_edge = not adaptive    # Adaptive binnings cannot include it
         super(ExponentialBinning, self).__init__(includes_right_edge=includes_right_edge,
                                                  adaptive=adaptive)
+        if log_width <= 0:
+            raise RuntimeError("Log width must be > 0.")
         self._log_min = log_min
         self._log_width = log_width
         self._bin_count = bin_count
 
+    def __repr__(self):
+        result = "{0}(log_min={1}, log_width={2}, bin_count={3}".format(
+            self.__class__.__name__, self._log_min, self._log_width, self._bin_count)
+        if self.is_adaptive():
+            result += ", adaptive=True"
+        return result + ")"
+
     def is_regular(self, *args, **kwargs):
         return False
 
+    @property
+    def log_width(self):
+        return self._log_width
+
+    @property
+    def bin_count(self):
+        return self._bin_count
+
+    def _get_edges(self, indices):
+        """Numpy-like edges for bin indices (the same arithmetic for all uses)."""
+        return 10.0 ** (self._log_min + np.asarray(indices) * self._log_width)
+
     @property
     def numpy_bins(self):
         if self._bin_count == 0:
             return np.ndarray((0,), dtype=float)
         if self._numpy_bins is None:
-            log_bins = self._log_min + np.arange(self._bin_count + 1) * self._log_width
-            self._numpy_bins = 10.0 ** log_bins
+            self._numpy_bins = self._get_edges(np.arange(self._bin_count + 1))
         return self._numpy_bins
 
+    def _find_bin_indices(self, values):
+        values = np.asarray(values)
+        if self._bin_count == 0:
+            return np.zeros(values.shape, dtype=np.intp)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Non-positive values => -inf / nan => underflow
+            candidates = (np.log10(values) - self._log_min) / self._log_width
+        return _adjust_bin_indices(values, candidates, self._get_search_edges())
+
+    def _find_bin_index(self, value):
+        if self._bin_count == 0:
+            return 0
+        log_value = math.log10(value) if value > 0 else -np.inf    # => underflow
+        candidate = (log_value - self._log_min) / self._log_width
+        return _adjust_bin_index(value, candidate, self.numpy_bins.__getitem__, self._bin_count)
+
+    def _force_bin_existence(self, values, includes_right_edge=None):
+        if includes_right_edge is None:
+            includes_right_edge = self.includes_right_edge
+        values = np.asarray(values)
+        values = values[values > 0]    # Others can go only to underflow (nan's are dropped too)
+        if not values.size:
+            return None
+        min_, max_ = np.min(values), np.max(values)
+        if not np.isfinite(max_):
+            raise RuntimeError("Cannot create bins for infinite values.")
+
+        was_empty = self._bin_count == 0
+        if was_empty:
+            steps = int(np.floor((np.log10(min_) - self._log_min) / self._log_width))
+            self._set_min_and_count(self._log_min + steps * self._log_width, 1)
+
+        # Edges calculated directly (numpy_bins would be O(bin_count))
+        add_left = max(int(np.ceil((self._log_min - np.log10(min_)) / self._log_width)), 0)
+        while self._get_edges(-add_left) > min_:
+            add_left += 1
+        if add_left:
+            self._set_min_and_count(self._log_min - add_left * self._log_width,
+                                    self._bin_count + add_left)
+        add_right = max(int(np.ceil((np.log10(max_) - self._log_min) / self._log_width))
+                        - self._bin_count, 0)
+        while True:
+            last_edge = self._get_edges(self._bin_count + add_right)
+            if max_ < last_edge or (max_ == last_edge and includes_right_edge):
+                break
+            add_right += 1
+        if add_right:
+            self._set_min_and_count(self._log_min, self._bin_count + add_right)
+
+        if was_empty:
+            return ()
+        elif add_left or add_right:
+            return add_left
+        else:
+            return None
+
+    def _set_min_and_count(self, log_min, bin_count):
+        self._log_min = log_min
+        self._bin_count = bin_count
+        self._bins = None
+        self._numpy_bins = None
+        self._invalidate_cache()
+
+    def _adapt(self, other):
+        """
+
+        Parameters
+        ----------
+        other: BinningBase
+
+        Returns
+        -------
+        bin_map1: int or None
+        bin_map2: int or None
+        """
+        if not isinstance(other, ExponentialBinning) or not np.isclose(self._log_width, other._log_width,
+                                                                       rtol=1.e-9, atol=0):
+            raise RuntimeError("Cannot adapt exponential binnings with different log widths")
+        if other.bin_count == 0:
+            return None, ()
+        if self.bin_count == 0:
+            self._set_min_and_count(other._log_min, other.bin_count)
+            return (), None
+        offset = (other._log_min - self._log_min) / self._log_width
+        steps = int(np.round(offset))
+        if not np.isclose(offset, steps, rtol=0, atol=1.e-6):
+            raise RuntimeError("Cannot adapt shifted exponential binnings: {0} vs {1}"
+                               .format(self._log_min, other._log_min))
+        add_left = max(-steps, 0)
+        new_count = max(self._bin_count, steps + other.bin_count) + add_left
+        bin_map1 = None
+        if new_count != self._bin_count:
+            self._set_min_and_count(self._log_min - add_left * self._log_width, new_count)
+            bin_map1 = add_left
+        return bin_map1, steps + add_left
+
     def copy(self):
         return ExponentialBinning(self._log_min, self._log_width,
-                                  self._bin_count, self.includes_right_edge)
+                                  self._bin_count, self.includes_right_edge,
+                                  adaptive=self._adaptive)
 
     def _update_dict(self, a_dict):
         a_dict["log_min"] = self._log_min
         a_dict["log_width"] = self._log_width
-        a_dict["bin_count"] = self._bin_count        
+        a_dict["bin_count"] = self._bin_count
+
+
+class LogLinearBinning(BinningBase):
+    """Binning schema with exponential buckets subdivided linearly (as in HdrHistogram).
+
+    The bins start at 0. Up to `sub_bucket_count * lowest`, they all have
+    the width `lowest`. Each following power-of-two bucket is split
+    into `sub_bucket_count / 2` bins of equal width. The relative width
+    of these bins is at most 10 ** -significant_digits.
+
+    Bin indices are computed directly from the float exponent and mantissa of the values.
+    The adaptive binning grows only at the top (existing bins never move),
+    so that histograms with the same lowest and significant_digits merge cheaply.
+    """
+    adaptive_allowed = True
+
+    def __init__(self, lowest=1.0, significant_digits=3, bin_count=None, includes_right_edge=False,
+                 adaptive=False, **kwargs):
+        super(LogLinearBinning, self).__init__(includes_right_edge=includes_right_edge,
+                                               adaptive=adaptive)
+        if lowest <= 0:
+            raise RuntimeError("The lowest distinguishable value must be > 0.")
+        if significant_digits not in range(6):
+            raise RuntimeError("Significant digits must be an integer between 0 and 5.")
+        self._lowest = float(lowest)
+        self._significant_digits = int(significant_digits)
+        self._sub_bucket_bits = int(math.ceil(math.log(2 * 10 ** significant_digits, 2)))
+        if bin_count is None:
+            bin_count = self.sub_bucket_count
+        if bin_count < 0:
+            raise RuntimeError("Bin count must be >= 0.")
+        self._bin_count = int(bin_count)
+
+    def __repr__(self):
+        result = "{0}(lowest={1}, significant_digits={2}, bin_count={3}".format(
+            self.__class__.__name__, self._lowest, self._significant_digits, self._bin_count)
+        if self.is_adaptive():
+            result += ", adaptive=True"
+        return result + ")"
+
+    @property
+    def lowest(self):
+        """Width of the bins in the linear part."""
+        return self._lowest
+
+    @property
+    def significant_digits(self):
+        return self._significant_digits
+
+    @property
+    def sub_bucket_count(self):
+        """Number of bins in the linear part (a power of two)."""
+        return 1 << self._sub_bucket_bits
+
+    def is_regular(self, *args, **kwargs):
+        return self._bin_count <= self.sub_bucket_count
+
+    def _get_edges(self, indices):
+        """Numpy-like edges for bin indices (the same arithmetic for all uses)."""
+        indices = np.asarray(indices, dtype=np.int64)
+        count = self.sub_bucket_count
+        half = count >> 1
+        octaves, sub_indices = np.divmod(np.maximum(indices - count, 0), half)
+        edges = np.where(indices <= count, indices.astype(float),
+                         np.ldexp((half + sub_indices).astype(float), (octaves + 1).astype(int)))
+        return edges * self._lowest
+
+    def _get_edge(self, index):
+        return float(self._get_edges(index))
+
+    def _get_candidates(self, values):
+        """Approximate (float) bin indices of values."""
+        count = self.sub_bucket_count
+        scaled = np.asarray(values, dtype=float) / self._lowest
+        mantissa, exponent = np.frexp(scaled)
+        with np.errstate(invalid="ignore"):
+            return np.where(scaled < count, scaled,
+                            count + (exponent - 1 - self._sub_bucket_bits) * (count >> 1)
+                            + (mantissa - 0.5) * count)
+
+    @property
+    def numpy_bins(self):
+        if self._numpy_bins is None:
+            self._numpy_bins = self._get_edges(np.arange(self._bin_count + 1))
+        return self._numpy_bins
+
+    @property
+    def bin_count(self):
+        return self._bin_count
+
+    @property
+    def first_edge(self):
+        return 0.0
+
+    @property
+    def last_edge(self):
+        return self._get_edge(self._bin_count)
+
+    def _find_bin_indices(self, values):
+        values = np.asarray(values)
+        if self._bin_count == 0:
+            return np.zeros(values.shape, dtype=np.intp)
+        candidates = np.array(self._get_candidates(values), dtype=float)
+        return _adjust_bin_indices(values, candidates, self._get_search_edges())
+
+    def _find_bin_index(self, value):
+        if self._bin_count == 0:
+            return 0
+        return _adjust_bin_index(value, float(self._get_candidates(value)), self._get_edge,
+                                 self._bin_count)
+
+    def _force_bin_existence(self, values, includes_right_edge=None):
+        if includes_right_edge is None:
+            includes_right_edge = self.includes_right_edge
+        values = np.asarray(values)
+        if not values.size:
+            return None
+        max_value = np.max(values)
+        if max_value < self.last_edge or (includes_right_edge and max_value == self.last_edge):
+            return None
+        if not np.isfinite(max_value):
+            raise RuntimeError("Cannot create bins for infinite values.")
+        index = min(max(int(self._get_candidates(max_value)), 0), self._bin_count)
+        # Fix rounding errors
+        while self._get_edge(index) > max_value:
+            index -= 1
+        while self._get_edge(index + 1) <= max_value:
+            index += 1
+        self._set_bin_count(index + 1)
+        return 0    # Bins are only added at the end
+
+    def _set_bin_count(self, bin_count):
+        self._bin_count = bin_count
+        self._bins = None
+        self._numpy_bins = None
+        self._invalidate_cache()
+
+    def _adapt(self, other):
+        if not isinstance(other, LogLinearBinning) or (
+                (self._lowest, self._significant_digits) != (other._lowest, other._significant_digits)):
+            raise RuntimeError("Can adapt only to log-linear binning with the same precision.")
+        if other._bin_count > self._bin_count:
+            self._set_bin_count(other._bin_count)
+            return 0, None
+        else:
+            return None, 0
+
+    def copy(self):
+        return LogLinearBinning(lowest=self._lowest, significant_digits=self._significant_digits,
+                                bin_count=self._bin_count, includes_right_edge=self.includes_right_edge,
+                                adaptive=self._adaptive)
+
+    def _update_dict(self, a_dict):
+        a_dict["lowest"] = self._lowest
+        a_dict["significant_digits"] = self._significant_digits
+        a_dict["bin_count"] = self._bin_count
+
+
+class _ShiftBinMap(int):
+    """Bin map shifting all bins by the same offset.
+
+    As an int, it is the offset (which allows histograms to grow
+    in place, see HistogramBase._reshape_data), iterating yields
+    the (old, new) pairs.
+    """
+    def __new__(cls, offset, bin_count):
+        self = int.__new__(cls, offset)
+        self.bin_count = bin_count
+        return self
+
+    def __iter__(self):
+        return iter(zip(range(self.bin_count), range(int(self), int(self) + self.bin_count)))
+
+
+def _coarsened_bin_map(times_min, bin_count, factor, new_times_min):
+    """Bin map from fixed-width bins to coarser bins on the same lattice.
+
+    Parameters
+    ----------
+    times_min: int
+        Position of the first old bin (in old bin widths)
+    bin_count: int
+        Number of old bins
+    factor: int
+        Ratio of new and old bin widths
+    new_times_min: int
+        Position of the first new bin (in new bin widths)
+
+    Returns
+    -------
+    np.ndarray
+        The new index for each old bin
+    """
+    return (times_min + np.arange(bin_count)) // factor - new_times_min
+
+
+def _regular_edges(bins):
+    """Numpy-like edges of consecutive bins with (almost exactly) equal widths.
+
+    The tolerance is low enough for _adjust_bin_indices to correct
+    the directly computed indices.
+
+    Parameters
+    ----------
+    bins: np.ndarray
+        Bins in the (bin_count, 2) format.
+
+    Returns
+    -------
+    np.ndarray or None
+        Edges prepared for _adjust_bin_indices (see _search_edges),
+        None if the bins are not regular or not exactly consecutive.
+    """
+    if bins.shape[0] < 2 or not np.array_equal(bins[1:, 0], bins[:-1, 1]):
+        return None
+    edges = np.concatenate([bins[:, 0], bins[-1:, 1]]).astype(float)
+    widths = np.diff(edges)
+    if not np.all(widths > 0) or not np.allclose(widths, widths[0], rtol=1.e-9, atol=0):
+        return None
+    return _search_edges(edges)
+
+
+def _search_edges(edges):
+    """Edges as float array, with the right edge of the last bin included in it.
+
+    Parameters
+    ----------
+    edges: array_like
+        Numpy-like edges
+
+    Returns
+    -------
+    np.ndarray
+        A new array with the last edge moved by the smallest possible step up.
+    """
+    edges = np.array(edges, dtype=float)
+    if edges.shape[0]:
+        edges[-1] = np.nextafter(edges[-1], np.inf)
+    return edges
+
+
+def _adjust_bin_indices(values, candidates, edges):
+    """Exact bin indices from approximate ones.
+
+    Used by binnings which can compute bin indices directly (arithmetically),
+    avoiding both sorting and searching. The computed values are corrected
+    against the edges (at most by one bin) so that the result
+    is exactly the same as for the edge-based lookup.
+
+    Parameters
+    ----------
+    values: np.ndarray
+        The values to find bins for.
+    candidates: np.ndarray
+        Approximate (float) bin indices of the values. Modified in place.
+    edges: np.ndarray
+        Numpy-like edges of the bins with the right edge included
+        in the last bin (see _search_edges)
+
+    Returns
+    -------
+    np.ndarray
+        Bin indices (-1=underflow, bin_count=overflow, same as BinningBase._find_bin_indices)
+    """
+    bin_count = len(edges) - 1
+
+    np.floor(candidates, out=candidates)
+    np.clip(candidates, 0, bin_count - 1, out=candidates)
+    nans = np.isnan(candidates)
+    has_nans = nans.any()
+    if has_nans:
+        candidates[nans] = 0
+    indices = candidates.astype(np.intp)
+    del candidates, nans
+
+    # Fix rounding errors (and move under-/overflows outside)
+    indices -= values < edges[indices]
+    indices += values >= edges[indices + 1]
+    if has_nans:
+        indices[np.isnan(values)] = bin_count    # Same as in searching
+    return indices
+
+
+def _adjust_bin_index(value, candidate, get_edge, bin_count):
+    """Exact bin index from an approximate one (scalar variant of _adjust_bin_indices).
+
+    Parameters
+    ----------
+    value: float
+    candidate: float
+        Approximate (float) bin index of the value.
+    get_edge: Callable
+        Numpy-like edge (0..bin_count) by its index
+    bin_count: int
+
+    Returns
+    -------
+    int
+        Bin index (-1=underflow, bin_count=overflow)
+    """
+    if value != value or value > get_edge(bin_count):
+        return bin_count    # Nan's included, same as in searching
+    elif value < get_edge(0):
+        return -1
+    index = min(max(int(candidate), 0), bin_count - 1)
+    # Fix rounding errors
+    if value < get_edge(index):
+        index -= 1
+    elif index + 1 < bin_count and value >= get_edge(index + 1):
+        index += 1
+    return index
 
 
 def numpy_binning(data, bins=10, range=None, *args, **kwargs):
@@ -710,30 +1345,47 @@ def human_binning(data=None, bin_count=None, range=None, **kwargs):
     return fixed_width_binning(bin_width=bin_width, data=data, range=range, **kwargs)
 
 
-def quantile_binning(data=None, bins=10, qrange=(0.0, 1.0), **kwargs):
+def quantile_binning(data=None, bins=10, qrange=(0.0, 1.0), weights=None, sketch=None, **kwargs):
     """Binning schema based on quantile ranges.
 
     This binning finds equally spaced quantiles. This should lead to
     all bins having roughly the same frequencies.
 
-    Note: weights are not (yet) take into account for calculating
-    quantiles.
+    Without weights and sketch, the quantiles are calculated exactly
+    (using numpy.percentile). With weights, the (weighted) quantiles
+    are also exact. For data that do not fit in memory, build a
+    quantile sketch chunk by chunk (and/or merge sketches from workers)
+    and pass it instead of the data.
 
     Parameters
     ----------
     bins: sequence or Optional[int]
-        Number of bins
+        Number of bins (or a sequence of percentiles)
     qrange: Optional[tuple]
         Two floats as minimum and maximum quantile (default: 0.0, 1.0)
+    weights: Optional[array_like]
+        Weights of the data
+    sketch: Optional[physt.quantiles.QuantileSketch]
+        Approximate summary of the data. If set, data and weights are not used.
+        The edges are exact quantiles for a rank within sketch.relative_rank_error.
 
     Returns
     -------
     StaticBinning
-    """
 
+    See Also
+    --------
+    physt.quantiles.QuantileSketch
+    """
     if np.isscalar(bins):
         bins = np.linspace(qrange[0] * 100, qrange[1] * 100, bins + 1)
-    bins = np.percentile(data, bins)
+    if sketch is None and weights is None:
+        bins = np.percentile(data, bins)
+    else:
+        if sketch is None:
+            data = np.asarray(data)
+            sketch = QuantileSketch(capacity=max(data.size, 1)).update(data, weights)    # Exact
+        bins = sketch.quantile(np.asarray(bins) / 100)
     return static_binning(bins=make_bin_array(bins), includes_right_edge=True)
 
 
@@ -791,7 +1443,7 @@ def fixed_width_binning(data=None, bin_width=1, range=None, includes_right_edge=
     return result
 
 
-def exponential_binning(data=None, bin_count=None, range=None, **kwargs):
+def exponential_binning(data=None, bin_count=None, range=None, log_width=None, **kwargs):
     """Construct exponential binning schema.
 
     Parameters
@@ -800,6 +1452,10 @@ def exponential_binning(data=None, bin_count=None, range=None, **kwargs):
         Number of bins
     range: Optional[tuple]
         (min, max)
+    log_width: Optional[float]
+        Width of bins in log10 scale. If set, bin_count is ignored and the bins
+        are aligned to powers of 10 ** log_width (this works also without data,
+        e.g. for adaptive histograms).
 
     Returns
     -------
@@ -809,6 +1465,14 @@ def exponential_binning(data=None, bin_count=None, range=None, **kwargs):
     --------
     numpy.logspace - note that our range semantics is different
     """
+    if log_width is not None:
+        result = ExponentialBinning(log_min=0.0, log_width=log_width, bin_count=0, **kwargs)
+        if range:
+            result._force_bin_existence(range, includes_right_edge=True)
+        elif data is not None and data.shape[0]:
+            result._force_bin_existence(data)
+        return result
+
     if bin_count is None:
         bin_count = ideal_bin_count(data)
 
@@ -820,6 +1484,177 @@ def exponential_binning(data=None, bin_count=None, range=None, **kwargs):
     return ExponentialBinning(log_min=range[0], log_width=log_width, bin_count=bin_count, **kwargs)
 
 
+def fine_bayesian_blocks_binning(data, range=None, p0=0.05, fine_bins=1024, **kwargs):
+    """Binning schema based on Bayesian blocks (approximate, without astropy).
+
+    The blocks are found by the dynamic programming of Scargle et al. (2013)
+    with the "events" fitness. Data with more distinct values than `fine_bins`
+    are first accumulated in a fine fixed-width histogram whose bins serve
+    as the cells, so that the cost scales with fine_bins ** 2 instead of N ** 2
+    (the edges are then limited to the resolution of the fine bins).
+
+    Parameters
+    ----------
+    range: Optional[tuple]
+    p0: Optional[float]
+        False alarm probability used for the prior on the number of blocks
+    fine_bins: Optional[int]
+        Maximum number of cells
+
+    Returns
+    -------
+    NumpyBinning
+
+    See also
+    --------
+    bayesian_blocks_binning
+    astropy.stats.bayesian_blocks
+    """
+    data = _data_in_range(data, range)
+    edges, counts = _fine_cells(data, fine_bins)
+    ncp_prior = 4 - np.log(73.53 * p0 * (data.size ** -0.478))
+
+    best = np.zeros(counts.size)
+    last = np.zeros(counts.size, dtype=int)
+    for r in np.arange(counts.size):
+        # Blocks ending in cell r and starting in any cell <= r
+        block_counts = np.cumsum(counts[r::-1])[::-1]
+        block_widths = edges[r + 1] - edges[:r + 1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fitness = np.where(block_counts > 0,
+                               block_counts * np.log(block_counts / block_widths), 0)
+        fitness -= ncp_prior
+        fitness[1:] += best[:r]
+        last[r] = np.argmax(fitness)
+        best[r] = fitness[last[r]]
+
+    change_points = [counts.size]
+    while change_points[-1] > 0:
+        change_points.append(last[change_points[-1] - 1])
+    return NumpyBinning(edges[change_points[::-1]], **kwargs)
+
+
+def fine_knuth_binning(data, range=None, max_bins=None, fine_bins=16384, **kwargs):
+    """Binning schema based on Knuth's rule (approximate, without astropy).
+
+    Finds the number of equal-width bins maximizing Knuth's posterior
+    by trying all counts up to `max_bins`. Data with more items than `fine_bins`
+    are first accumulated in a fine fixed-width histogram and counts in the candidate
+    bins are interpolated from its cumulative frequencies, so that the cost
+    does not depend on N.
+
+    Parameters
+    ----------
+    data: arraylike
+    range: Optional[tuple]
+    max_bins: Optional[int]
+        Maximum number of bins to consider (default: fine_bins // 8)
+    fine_bins: Optional[int]
+
+    Returns
+    -------
+    NumpyBinning
+
+    See also
+    --------
+    knuth_binning
+    astropy.stats.knuth_bin_width
+    """
+    try:
+        from scipy.special import gammaln
+    except ImportError:
+        gammaln = np.vectorize(math.lgamma, otypes=[float])    # Slower, but no scipy needed
+    data = _data_in_range(data, range)
+    n = data.size
+    if max_bins is None:
+        max_bins = max(min(fine_bins // 8, n), 1)
+    min_, max_ = data.min(), data.max()
+
+    if n <= fine_bins:
+        sorted_data = np.sort(data)
+
+        def cumulative(edges):
+            return np.searchsorted(sorted_data, edges, side="right")
+    else:
+        fine_edges, fine_counts = _fine_cells(data, fine_bins)
+        fine_cumulative = np.concatenate([[0], np.cumsum(fine_counts)])
+
+        def cumulative(edges):
+            return np.interp(edges, fine_edges, fine_cumulative)
+
+    best_count, best_value = 1, -np.inf
+    for bin_count in np.arange(1, max_bins + 1):
+        edges = np.linspace(min_, max_, bin_count + 1)
+        counts = np.diff(np.concatenate([[0], cumulative(edges[1:-1]), [n]]))
+        value = (n * np.log(bin_count) + gammaln(0.5 * bin_count) - bin_count * gammaln(0.5)
+                 - gammaln(n + 0.5 * bin_count) + gammaln(counts + 0.5).sum())
+        if value > best_value:
+            best_count, best_value = bin_count, value
+    return NumpyBinning(np.linspace(min_, max_, best_count + 1), **kwargs)
+
+
+def _data_in_range(data, range):
+    """Flattened data limited to a range, checked to be usable for data-driven binning."""
+    data = np.asarray(data).ravel()
+    if range is not None:
+        data = data[(data >= range[0]) & (data <= range[1])]
+    if not data.size or data.min() == data.max():
+        raise RuntimeError("Cannot find binning for less than two different values.")
+    return data
+
+
+def _fine_cells(data, fine_bins):
+    """Cells of data for block-like algorithms.
+
+    Distinct values are used as cells if there are at most `fine_bins` of them
+    (with edges half-way between them, as in Scargle et al.). Otherwise the data
+    are filled into a fine fixed-width histogram.
+
+    Returns
+    -------
+    edges: np.ndarray
+        Numpy-like edges of the cells
+    counts: np.ndarray
+        Number of items in each cell
+    """
+    if data.size <= fine_bins:
+        values, counts = np.unique(data, return_counts=True)
+        if values.size <= fine_bins:
+            edges = np.concatenate([values[:1], 0.5 * (values[1:] + values[:-1]), values[-1:]])
+            return edges.astype(float), counts
+    from .histogram1d import calculate_frequencies
+    binning = NumpyBinning(np.linspace(data.min(), data.max(), fine_bins + 1))
+    counts = calculate_frequencies(data, binning)[0]
+    return binning.numpy_bins, counts
+
+
+def log_linear_binning(data=None, lowest=1.0, significant_digits=3, range=None, **kwargs):
+    """Construct HdrHistogram-like binning schema with bounded relative bin widths.
+
+    Parameters
+    ----------
+    lowest: Optional[float]
+        Width of the bins at the bottom of the range (i.e. the absolute precision)
+    significant_digits: Optional[int]
+        Relative width of all bins above `lowest * sub_bucket_count` is at most 10 ** -significant_digits
+    range: Optional[tuple]
+        (min, max) - only the max is used, the bins always start at 0
+
+    Returns
+    -------
+    LogLinearBinning
+    """
+    result = LogLinearBinning(lowest=lowest, significant_digits=significant_digits, **kwargs)
+    adaptive = result.is_adaptive()
+    result.set_adaptive(True)
+    if range:
+        result.force_bin_existence(range[1])
+    elif data is not None and data.shape[0]:
+        result.force_bin_existence(np.max(data))
+    result.set_adaptive(adaptive)
+    return result
+
+
 def calculate_bins(array, _=None, *args, **kwargs):
     """Find optimal binning from arguments.
 
@@ -878,16 +1713,25 @@ def calculate_bins_nd(array, bins=None, *args, **kwargs):
 
     Usage similar to `calculate_bins`.
 
+    Parameters
+    ----------
+    array: np.ndarray or list[np.ndarray]
+        Array of shape (count, dim) or a list of dim columns.
+
     Returns
     -------
     List[BinningBase]
     """
-    if kwargs.pop("check_nan", True):
-        if np.any(np.isnan(array)):
-            raise RuntimeError("Cannot calculate bins in presence of NaN's.")
-
     if array is not None:
-        _, dim = array.shape
+        if isinstance(array, (list, tuple)):
+            columns = array                 # Already split into columns
+        else:
+            columns = [array[:, i] for i in range(array.shape[1])]
+        dim = len(columns)
+
+    if kwargs.pop("check_nan", True) and array is not None:
+        if any(np.any(np.isnan(column)) for column in columns):
+            raise RuntimeError("Cannot calculate bins in presence of NaN's.")
 
     # Prepare bins
     if isinstance(bins, (list, tuple)):
@@ -922,7 +1766,7 @@ def calculate_bins_nd(array, bins=None, *args, **kwargs):
         kwargs["range"] = range_
 
     bins = [
-        calculate_bins(array[:, i], bins[i],
+        calculate_bins(columns[i], bins[i],
                        *(arg[i] for arg in args if arg[i] is not None),
                        **{k: kwarg[i] for k, kwarg in kwargs.items() if kwarg[i] is not None})
         for i in range(dim)
@@ -937,7 +1781,10 @@ binning_methods = {
     "quantile": quantile_binning,
     "fixed_width": fixed_width_binning,
     "integer": integer_binning,
-    "human": human_binning
+    "human": human_binning,
+    "log_linear": log_linear_binning,
+    "fine_blocks": fine_bayesian_blocks_binning,
+    "fine_knuth": fine_knuth_binning
 }
 
 
@@ -3,6 +3,7 @@
 from __future__ import absolute_import
 from .. import h1 as original_h1
 from .. import histogramdd as original_hdd
+from ..quantiles import quantile_sketch as original_quantile_sketch
 
 options = {
     "chunk_split": 16
@@ -61,6 +62,38 @@ def histogram1d(data, bins=None, *args, **kwargs):
 h1 = histogram1d  # Alias for convenience
 
 
+def quantile_sketch(data, *args, **kwargs):
+    """Facade function to create a quantile sketch using dask.
+
+    Sketches of the blocks are merged. Use the result as `sketch`
+    argument of quantile binning.
+
+    Parameters
+    ----------
+    data: dask.DaskArray or array-like
+
+    See also
+    --------
+    physt.quantiles.quantile_sketch
+    """
+    import dask
+    if not hasattr(data, "dask"):
+        data = dask.array.from_array(data, chunks=int(data.shape[0] / options["chunk_split"]))
+
+    compute = kwargs.pop("compute", True)
+    method = kwargs.pop("dask_method", "threaded")
+
+    def block_sketch(array):
+        return original_quantile_sketch(array, *args, **kwargs)
+
+    return _run_dask(
+        name="dask_sketch",
+        data=data,
+        compute=compute,
+        method=method,
+        func=block_sketch)
+
+
 def histogramdd(data, bins=None, *args, **kwargs):
     """Facade function to create multi-dimensional histogram using dask."""
     import dask
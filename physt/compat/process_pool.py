@@ -0,0 +1,381 @@
+"""Process-based variants of physt histogram facade functions.
+
+The input data are copied once into a block of shared memory
+(multiprocessing.shared_memory, Python 3.8+) and the worker processes
+attach to it by name, so that the data themselves are never pickled.
+The binning is found in the parent process, each worker then bins
+its own part of the data using the original facade function and
+the partial histograms are added.
+
+Compared to the `workers` parameter of the facades (threads),
+this is not limited by the GIL, which matters especially for
+the coordinate transformations of the special histograms.
+For small data, the overhead of starting the processes dominates.
+See tests/profile/benchmark_parallel.py for a comparison.
+"""
+
+from __future__ import absolute_import
+import numpy as np
+
+from .. import h1 as original_h1
+from .. import histogramdd as original_hdd
+from .. import special
+from ..binnings import calculate_bins, calculate_bins_nd
+from ..histogram1d import _iter_chunks, _has_nans
+
+options = {
+    "processes": None       # Default number of processes (None => number of CPUs)
+}
+
+# Facade arguments that are not sent to the binning methods
+_H1_ARGUMENTS = ("adaptive", "dtype", "dropna", "keep_missed", "name", "axis_name",
+                 "chunk_size", "workers")
+_HDD_ARGUMENTS = ("adaptive", "dropna", "name", "dim", "axis_names", "workers")
+_SPECIAL_ARGUMENTS = ("dropna",)
+
+
+class _SharedArray(object):
+    """Numpy array stored in a block of shared memory.
+
+    When pickled (i.e. sent to a worker process), only the name
+    of the memory block is transferred and it is attached to
+    on the other side.
+    """
+    def __init__(self, shape, dtype, name=None):
+        try:
+            from multiprocessing import shared_memory
+        except ImportError:
+            raise RuntimeError("Shared memory requires Python 3.8 or newer.")
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self._owner = name is None
+        if self._owner:
+            size = max(int(np.prod(self.shape)) * self.dtype.itemsize, 1)
+            self._memory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self._memory = shared_memory.SharedMemory(name=name)
+
+    @classmethod
+    def from_array(cls, array, dtype=None):
+        """Copy of an existing array (or None).
+
+        Parameters
+        ----------
+        array: Optional[array_like]
+        dtype: Optional[np.dtype]
+            If set, the values are cast while being copied (without a temporary array).
+
+        Returns
+        -------
+        Optional[_SharedArray]
+        """
+        if array is None:
+            return None
+        array = np.asarray(array)
+        shared = cls(array.shape, dtype or array.dtype)
+        np.copyto(shared.array, array, casting="unsafe")
+        return shared
+
+    @classmethod
+    def from_columns(cls, columns, dtype=None):
+        """Two-dimensional array with columns copied from 1D arrays.
+
+        Returns
+        -------
+        _SharedArray
+        """
+        columns = [np.asarray(column) for column in columns]
+        shared = cls((columns[0].shape[0], len(columns)), dtype or np.result_type(*columns))
+        array = shared.array
+        for i, column in enumerate(columns):
+            array[:, i] = column
+        return shared
+
+    @property
+    def array(self):
+        """A new view of the shared data.
+
+        All views have to be released before the array is closed.
+
+        Returns
+        -------
+        np.ndarray
+        """
+        return np.ndarray(self.shape, dtype=self.dtype, buffer=self._memory.buf)
+
+    def close(self):
+        """Detach from the memory (and free it if this is the original)."""
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()
+
+    def __reduce__(self):
+        return _SharedArray, (self.shape, self.dtype.str, self._memory.name)
+
+
+def _close_all(*shared_arrays):
+    for shared in shared_arrays:
+        if shared is not None:
+            shared.close()
+
+
+def _get_parts(length, processes):
+    """Contiguous parts of the data, one for each process.
+
+    Returns
+    -------
+    list[slice]
+    """
+    import multiprocessing
+    processes = processes or multiprocessing.cpu_count()
+    if processes < 1:
+        raise RuntimeError("Number of processes must be positive.")
+    return list(_iter_chunks(length, -(-length // processes) or 1))
+
+
+def _run(func, tasks, processes):
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(func, tasks))
+
+
+def _without_nans(array, dropna):
+    if not dropna:
+        return array
+    if array.ndim == 1:
+        return array[~np.isnan(array)] if _has_nans(array) else array
+    return array[~np.isnan(array).any(axis=1)] if _has_nans(array) else array
+
+
+def _h1_part(task):
+    shared_data, shared_weights, part, binning, kwargs = task
+    try:
+        weights = shared_weights.array[part] if shared_weights else None
+        return original_h1(shared_data.array[part], binning, weights=weights, **kwargs)
+    finally:
+        weights = None
+        _close_all(shared_data, shared_weights)
+
+
+def _hdd_part(task):
+    shared_data, shared_weights, part, binnings, kwargs = task
+    try:
+        weights = shared_weights.array[part] if shared_weights else None
+        return original_hdd(shared_data.array[part], binnings, weights=weights, **kwargs)
+    finally:
+        weights = None
+        _close_all(shared_data, shared_weights)
+
+
+def _transform_part(task):
+    shared_data, part, klass = task
+    try:
+        data = shared_data.array
+        data[part] = klass.transform(data[part])
+    finally:
+        data = None
+        _close_all(shared_data)
+
+
+def _special_part(task):
+    shared_data, shared_weights, part, binnings, facade, kwargs = task
+    try:
+        data = shared_data.array[part]
+        weights = shared_weights.array[part] if shared_weights else None
+        if facade is special.polar_histogram:
+            return facade(data[:, 0], data[:, 1], *binnings, transformed=True,
+                          weights=weights, **kwargs)
+        else:
+            return facade(data, *binnings, transformed=True, weights=weights, **kwargs)
+    finally:
+        data = weights = None
+        _close_all(shared_data, shared_weights)
+
+
+def histogram1d(data, bins=None, *args, **kwargs):
+    """Facade function to create one-dimensional histogram using a pool of processes.
+
+    Parameters
+    ----------
+    data: array_like
+    processes: Optional[int]
+        Number of processes (default: options["processes"] or number of CPUs)
+
+    See also
+    --------
+    physt.histogram
+    """
+    if data is None:
+        kwargs.pop("processes", None)
+        return original_h1(data, bins, *args, **kwargs)
+    processes = kwargs.pop("processes", options["processes"])
+    weights = kwargs.pop("weights", None)
+    if "axis_name" not in kwargs and hasattr(data, "name"):
+        kwargs["axis_name"] = data.name
+    dropna = kwargs.get("dropna", True)
+    binning_kwargs = {key: value for key, value in kwargs.items() if key not in _H1_ARGUMENTS}
+
+    shared_data = _SharedArray.from_array(data)
+    shared_weights = None
+    try:
+        shared_weights = _SharedArray.from_array(weights)
+        binning = calculate_bins(_without_nans(shared_data.array, dropna), bins, *args,
+                                 check_nan=not dropna, adaptive=kwargs.get("adaptive", False),
+                                 **binning_kwargs)
+        tasks = [(shared_data, shared_weights, part, binning, kwargs)
+                 for part in _get_parts(shared_data.shape[0], processes)]
+        return sum(_run(_h1_part, tasks, processes))
+    finally:
+        _close_all(shared_data, shared_weights)
+
+
+h1 = histogram1d  # Alias for convenience
+
+
+def histogramdd(data, bins=10, *args, **kwargs):
+    """Facade function to create multi-dimensional histogram using a pool of processes.
+
+    Parameters
+    ----------
+    data: array_like or _SharedArray
+        Array of shape (n, d)
+    processes: Optional[int]
+        Number of processes (default: options["processes"] or number of CPUs)
+
+    See also
+    --------
+    physt.histogramdd
+    """
+    if data is None:
+        kwargs.pop("processes", None)
+        return original_hdd(data, bins, *args, **kwargs)
+    processes = kwargs.pop("processes", options["processes"])
+    weights = kwargs.pop("weights", None)
+    if "axis_names" not in kwargs and hasattr(data, "columns"):
+        kwargs["axis_names"] = tuple(data.columns)
+    dropna = kwargs.get("dropna", True)
+    binning_kwargs = {key: value for key, value in kwargs.items() if key not in _HDD_ARGUMENTS}
+
+    shared_data = data if isinstance(data, _SharedArray) else _SharedArray.from_array(data)
+    shared_weights = None
+    try:
+        if len(shared_data.shape) != 2:
+            raise RuntimeError("Array must have shape (n, d)")
+        shared_weights = _SharedArray.from_array(weights)
+        binnings = calculate_bins_nd(_without_nans(shared_data.array, dropna), bins, *args,
+                                     check_nan=not dropna, adaptive=kwargs.get("adaptive", False),
+                                     **binning_kwargs)
+        tasks = [(shared_data, shared_weights, part, binnings, kwargs)
+                 for part in _get_parts(shared_data.shape[0], processes)]
+        return sum(_run(_hdd_part, tasks, processes))
+    finally:
+        _close_all(shared_data, shared_weights)
+
+
+def histogram2d(data1, data2, bins=10, *args, **kwargs):
+    """Facade function to create 2D histogram using a pool of processes.
+
+    See also
+    --------
+    physt.histogram2d
+    """
+    if "axis_names" not in kwargs:
+        if hasattr(data1, "name") and hasattr(data2, "name"):
+            kwargs["axis_names"] = [data1.name, data2.name]
+    data = _SharedArray.from_columns([data1, data2])    # No intermediate concatenation
+    return histogramdd(data, bins, *args, dim=2, **kwargs)
+
+
+h2 = histogram2d    # Alias for convenience
+
+
+def h3(data, *args, **kwargs):
+    """Facade function to create 3D histogram using a pool of processes.
+
+    See also
+    --------
+    physt.h3
+    """
+    if isinstance(data, (list, tuple)) and not np.isscalar(data[0]):
+        if "axis_names" not in kwargs:
+            kwargs["axis_names"] = [(column.name if hasattr(column, "name") else None)
+                                    for column in data]
+        data = _SharedArray.from_columns(data)
+    return histogramdd(data, *args, dim=3, **kwargs)
+
+
+def _angular_bins(bins, max_angle):
+    # Same default as in the physt.special facades
+    if isinstance(bins, int):
+        return np.linspace(0, max_angle, bins + 1)
+    return bins
+
+
+def _special_histogram(facade, klass, shared_data, bins, transformed, *args, **kwargs):
+    """Common implementation of the special facades.
+
+    If not yet done, the data are transformed in place (in parallel),
+    the binnings are found in the parent process and the transformed
+    data are binned (in parallel again).
+    """
+    processes = kwargs.pop("processes", options["processes"])
+    weights = kwargs.pop("weights", None)
+    dropna = kwargs.get("dropna", True)
+    binning_kwargs = {key: value for key, value in kwargs.items() if key not in _SPECIAL_ARGUMENTS}
+
+    shared_weights = None
+    try:
+        parts = _get_parts(shared_data.shape[0], processes)
+        if not transformed:
+            _run(_transform_part, [(shared_data, part, klass) for part in parts], processes)
+        shared_weights = _SharedArray.from_array(weights)
+        binnings = calculate_bins_nd(_without_nans(shared_data.array, dropna), bins, *args,
+                                     check_nan=not dropna, **binning_kwargs)
+        tasks = [(shared_data, shared_weights, part, binnings, facade, kwargs)
+                 for part in parts]
+        return sum(_run(_special_part, tasks, processes))
+    finally:
+        _close_all(shared_data, shared_weights)
+
+
+def polar_histogram(xdata, ydata, radial_bins="numpy", phi_bins=16,
+                    transformed=False, *args, **kwargs):
+    """Facade function to create PolarHistogram using a pool of processes.
+
+    See also
+    --------
+    physt.special.polar_histogram
+    """
+    return _special_histogram(special.polar_histogram, special.PolarHistogram,
+                              _SharedArray.from_columns([xdata, ydata], np.float64),
+                              [radial_bins, _angular_bins(phi_bins, 2 * np.pi)],
+                              transformed, *args, **kwargs)
+
+
+def spherical_histogram(data=None, radial_bins="numpy", theta_bins=16, phi_bins=16,
+                        transformed=False, *args, **kwargs):
+    """Facade function to create SphericalHistogram using a pool of processes.
+
+    See also
+    --------
+    physt.special.spherical_histogram
+    """
+    return _special_histogram(special.spherical_histogram, special.SphericalHistogram,
+                              _SharedArray.from_array(data, np.float64),
+                              [radial_bins, _angular_bins(theta_bins, np.pi),
+                               _angular_bins(phi_bins, 2 * np.pi)],
+                              transformed, *args, **kwargs)
+
+
+def cylindrical_histogram(data=None, rho_bins="numpy", phi_bins=16, z_bins="numpy",
+                          transformed=False, *args, **kwargs):
+    """Facade function to create CylindricalHistogram using a pool of processes.
+
+    See also
+    --------
+    physt.special.cylindrical_histogram
+    """
+    return _special_histogram(special.cylindrical_histogram, special.CylindricalHistogram,
+                              _SharedArray.from_array(data, np.float64),
+                              [rho_bins, _angular_bins(phi_bins, 2 * np.pi), z_bins],
+                              transformed, *args, **kwargs)
@@ -14,10 +14,13 @@ def create_h1(cursor, *args, **kwargs):
     if len(axis_names) != 1:
         raise RuntimeError("Invalid number of columns: {0}".format(len(axis_names)))
     kwargs["axis_name"] = kwargs.get("axis_name", axis_names[0])
+    buffer_size = kwargs.pop("buffer_size", 10000)
     if kwargs.get("adaptive", False):
         h = h1(None, *args, **kwargs)
+        h.set_buffer_size(buffer_size)
         for row in cursor:
             h << row[0]
+        h.set_buffer_size(None)
         return h
     else:
         raise NotImplementedError()
@@ -1,12 +1,41 @@
 """One-dimensional histograms."""
 from __future__ import absolute_import, division
+import functools
+
 import numpy as np
 from . import bin_utils
-from .histogram_base import HistogramBase
+from .binnings import GAP_INDEX
+from .histogram_base import HistogramBase, _bincount_frequencies
+from .util import parallel_map
 
 # TODO: Fix I/O with binning
 
 
+def _flushing(attribute):
+    """Method or property that bins the values waiting in the fill buffer first.
+
+    Parameters
+    ----------
+    attribute: Callable or property
+
+    Returns
+    -------
+    Callable or property
+    """
+    if isinstance(attribute, property):
+        return property(_flushing(attribute.fget),
+                        attribute.fset and _flushing(attribute.fset),
+                        attribute.fdel, attribute.__doc__)
+
+    @functools.wraps(attribute)
+    def wrapper(self, *args, **kwargs):
+        if self._buffer_length:
+            self.flush()
+        return attribute(self, *args, **kwargs)
+
+    return wrapper
+
+
 class Histogram1D(HistogramBase):
     """One-dimensional histogram data.
 
@@ -23,6 +52,55 @@ class Histogram1D(HistogramBase):
     These are the basic attributes that can be used in the constructor (see there)
     Other attributes are dynamic.
     """
+    # Buffered filling (see set_buffer_size)
+    _buffer = None    # (values, weights) with dtypes of the filled data
+    _buffer_size = 0
+    _buffer_length = 0
+
+    # Public readers of the contents bin the buffered values first.
+    # (Own properties like _binning, underflow, ... check the buffer themselves.)
+    frequencies = _flushing(HistogramBase.frequencies)
+    errors2 = _flushing(HistogramBase.errors2)
+    errors = _flushing(HistogramBase.errors)
+    densities = _flushing(HistogramBase.densities)
+    total = _flushing(HistogramBase.total)
+    missed = _flushing(HistogramBase.missed)
+    set_dtype = _flushing(HistogramBase.set_dtype)
+    shape = _flushing(HistogramBase.shape)
+    has_same_bins = _flushing(HistogramBase.has_same_bins)
+    normalize = _flushing(HistogramBase.normalize)
+    merge_bins = _flushing(HistogramBase.merge_bins)
+    copy = _flushing(HistogramBase.copy)
+    to_dict = _flushing(HistogramBase.to_dict)
+    __getstate__ = _flushing(HistogramBase.__getstate__)
+    __repr__ = _flushing(HistogramBase.__repr__)
+    __imul__ = _flushing(HistogramBase.__imul__)
+    __itruediv__ = _flushing(HistogramBase.__itruediv__)
+    __array__ = _flushing(HistogramBase.__array__)
+
+    def _get_dtype(self):
+        if self._buffer_length:
+            self.flush()
+        return self._dtype
+
+    dtype = property(_get_dtype, HistogramBase.set_dtype)
+
+    @property
+    def bin_count(self):
+        """Total number of bins.
+
+        Returns
+        -------
+        int
+        """
+        return self._binning.bin_count
+
+    @_flushing
+    def __iadd__(self, other):
+        if isinstance(other, Histogram1D) and other._buffer_length:
+            other.flush()
+        return HistogramBase.__iadd__(self, other)
+
     def __init__(self, binning, frequencies=None, errors2=None, **kwargs):
         """Constructor
 
@@ -60,6 +138,7 @@ class Histogram1D(HistogramBase):
         HistogramBase.__init__(self, [binning], frequencies, errors2, **kwargs)
 
         if self.keep_missed:
+            self._ensure_capacity(*missed)
             self._missed = np.array(missed, dtype=self.dtype)
         else:
             self._missed = np.zeros(3, dtype=self.dtype)
@@ -81,6 +160,7 @@ class Histogram1D(HistogramBase):
         else:
             raise ValueError("In Histogram1D.select(), axis must be 0.")
 
+    @_flushing
     def __getitem__(self, i):
         """Select sub-histogram or get one bin.
 
@@ -117,14 +197,17 @@ class Histogram1D(HistogramBase):
                 if i.stop:
                     overflow += self.frequencies[i.stop:].sum()
         # Masked arrays or item list or ...
+        errors2 = None if self._errors2 is None else self._errors2[i]
         return self.__class__(self._binning.as_static(copy=False)[i], self.frequencies[i],
-                              self.errors2[i], overflow=overflow, keep_missed=keep_missed,
+                              errors2, overflow=overflow, keep_missed=keep_missed,
                               underflow=underflow, dtype=self.dtype,
                               name=self.name, axis_name=self.axis_name)
 
     @property
     def _binning(self):
         """Adapter property for HistogramBase interface"""
+        if self._buffer_length:
+            self.flush()    # Adaptive binning can change
         return self._binnings[0]
 
     @_binning.setter
@@ -170,6 +253,7 @@ class Histogram1D(HistogramBase):
         return self.frequencies, self.numpy_bins
 
     @property
+    @_flushing
     def cumulative_frequencies(self):
         """Cumulative frequencies.
 
@@ -183,34 +267,50 @@ class Histogram1D(HistogramBase):
 
     @property
     def underflow(self):
+        if self._buffer_length:
+            self.flush()
         if not self.keep_missed:
             return np.nan
         return self._missed[0]
 
     @underflow.setter
     def underflow(self, value):
+        if self._buffer_length:
+            self.flush()
         self._missed[0] = value
+        self._modified()
 
     @property
     def overflow(self):
+        if self._buffer_length:
+            self.flush()
         if not self.keep_missed:
             return np.nan
         return self._missed[1]
 
     @overflow.setter
     def overflow(self, value):
+        if self._buffer_length:
+            self.flush()
         self._missed[1] = value
+        self._modified()
 
     @property
     def inner_missed(self):
+        if self._buffer_length:
+            self.flush()
         if not self.keep_missed:
             return np.nan
         return self._missed[2]
 
     @inner_missed.setter
     def inner_missed(self, value):
+        if self._buffer_length:
+            self.flush()
         self._missed[2] = value
+        self._modified()
 
+    @_flushing
     def mean(self):
         """Statistical mean of all values entered into histogram.
 
@@ -250,6 +350,7 @@ class Histogram1D(HistogramBase):
         else:
             return None    # TODO: or error
 
+    @_flushing
     def variance(self, ddof=0):
         """Statistical variance of all values entered into histogram.
 
@@ -290,7 +391,7 @@ class Histogram1D(HistogramBase):
         -------
         numpy.ndarray
         """
-        return self.bins[..., 0]
+        return self._get_binning_cached("bin_left_edges", lambda: self.bins[..., 0])
 
     @property
     def bin_right_edges(self):
@@ -300,7 +401,7 @@ class Histogram1D(HistogramBase):
         -------
         numpy.ndarray
         """
-        return self.bins[..., 1]
+        return self._get_binning_cached("bin_right_edges", lambda: self.bins[..., 1])
 
     @property
     def min_edge(self):
@@ -331,7 +432,8 @@ class Histogram1D(HistogramBase):
         -------
         numpy.ndarray
         """
-        return (self.bin_left_edges + self.bin_right_edges) / 2
+        return self._get_binning_cached(
+            "bin_centers", lambda: (self.bin_left_edges + self.bin_right_edges) / 2)
 
     @property
     def bin_widths(self):
@@ -341,7 +443,8 @@ class Histogram1D(HistogramBase):
         -------
         numpy.ndarray
         """
-        return self.bin_right_edges - self.bin_left_edges
+        return self._get_binning_cached(
+            "bin_widths", lambda: self.bin_right_edges - self.bin_left_edges)
 
     @property
     def total_width(self):
@@ -357,6 +460,9 @@ class Histogram1D(HistogramBase):
 
     @property
     def bin_sizes(self):
+        return self._get_binning_cached("bin_sizes", self._calculate_bin_sizes)
+
+    def _calculate_bin_sizes(self):
         return self.bin_widths
 
     def find_bin(self, value):
@@ -373,6 +479,9 @@ class Histogram1D(HistogramBase):
             index of bin to which value belongs
             (-1=underflow, N=overflow, None=not found - inconsecutive)
         """
+        ixbin = self._binning._find_bin_index(value)
+        if ixbin is not None:
+            return ixbin
         ixbin = np.searchsorted(self.bin_left_edges, value, side="right")
         if ixbin == 0:
             return -1
@@ -388,6 +497,24 @@ class Histogram1D(HistogramBase):
         else:
             return None
 
+    def find_bin_n(self, values):
+        """Indices of bins corresponding to an array of values.
+
+        Vectorized variant of find_bin.
+
+        Parameters
+        ----------
+        values: array_like
+            Values to be searched for.
+
+        Returns
+        -------
+        numpy.ndarray
+            Integer array of the same shape as values with bin indices
+            (-1=underflow, N=overflow or nan, binnings.GAP_INDEX=not found - inconsecutive)
+        """
+        return self._binning._find_bin_indices(np.asarray(values))
+
     def fill(self, value, weight=1):
         """Update histogram with a new value.
 
@@ -402,10 +529,22 @@ class Histogram1D(HistogramBase):
         -------
         int
             index of bin which was incremented (-1=underflow, N=overflow, None=not found)
+            In the buffered mode, the value is not binned yet and None is returned.
 
         Note: If a gap in unconsecutive bins is matched, underflow & overflow are not valid anymore.
         Note: Name was selected because of the eponymous method in ROOT
         """
+        if self._buffer_size:
+            if (type(value), type(weight)) not in self._buffer_types:
+                self._prepare_buffer(value, weight)
+            length = self._buffer_length
+            self._buffer[0][length] = value
+            self._buffer[1][length] = weight
+            self._buffer_length = length + 1
+            if self._buffer_length == self._buffer_size:
+                self.flush()
+            return None
+
         self._coerce_dtype(type(weight))
         if self._binning.is_adaptive():
             map = self._binning.force_bin_existence(value)
@@ -416,18 +555,90 @@ class Histogram1D(HistogramBase):
             self.overflow = np.nan
             self.underflow = np.nan
         elif ixbin == -1 and self.keep_missed:
+            if self._compact:
+                self._ensure_capacity(int(self.underflow) + weight)
             self.underflow += weight
         elif ixbin == self.bin_count and self.keep_missed:
+            if self._compact:
+                self._ensure_capacity(int(self.overflow) + weight)
             self.overflow += weight
         else:
+            if weight != 1:
+                self._ensure_errors2()
+            if self._compact:
+                self._ensure_capacity(int(self._frequencies[ixbin]) + weight,
+                                      int(self._get_errors2()[ixbin]) + weight ** 2)
             self._frequencies[ixbin] += weight
-            self._errors2[ixbin] += weight ** 2
+            if self._errors2 is not None:
+                self._errors2[ixbin] += weight ** 2
             if self._stats:
                 self._stats["sum"] += weight * value
                 self._stats["sum2"] += weight * value ** 2
+            self._modified()
         return ixbin
 
-    def fill_n(self, values, weights=None, dropna=True):
+    @property
+    def buffer_size(self):
+        """Capacity of the fill buffer (0 if not buffered).
+
+        Returns
+        -------
+        int
+        """
+        return self._buffer_size
+
+    @buffer_size.setter
+    def buffer_size(self, value):
+        self.set_buffer_size(value)
+
+    def set_buffer_size(self, size):
+        """Turn the buffered filling on or off.
+
+        In the buffered mode, values added using `fill` (or `<<`) are only
+        stored and they are binned all at once using `fill_n` when the buffer
+        is full or when the content of the histogram is accessed.
+
+        Parameters
+        ----------
+        size: Optional[int]
+            Maximum number of values in the buffer (0 or None => not buffered)
+        """
+        self.flush()
+        if size and size < 0:
+            raise RuntimeError("Buffer size cannot be negative.")
+        self._buffer_size = size or 0
+        self._buffer = None    # Allocated with the first value
+        self._buffer_types = set()
+
+    def _prepare_buffer(self, value, weight):
+        """Make sure that the buffer can hold the value and weight without a loss.
+
+        The buffer arrays are (re)allocated (after flushing) with types
+        able to hold all the values and weights added so far.
+        """
+        dtypes = [np.asarray(value).dtype, np.asarray(weight).dtype]
+        if self._buffer is not None:
+            dtypes = [np.promote_types(array.dtype, dtype) for array, dtype in zip(self._buffer, dtypes)]
+            if all(array.dtype == dtype for array, dtype in zip(self._buffer, dtypes)):
+                self._buffer_types.add((type(value), type(weight)))
+                return
+            self.flush()
+        self._buffer = tuple(np.empty(self._buffer_size, dtype=dtype) for dtype in dtypes)
+        self._buffer_types.add((type(value), type(weight)))
+
+    def flush(self):
+        """Bin all values waiting in the fill buffer."""
+        length = self._buffer_length
+        if length:
+            self._buffer_length = 0
+            values, weights = (array[:length] for array in self._buffer)
+            self._coerce_dtype(weights.dtype)
+            # Unit weights only => errors2 can stay equal to frequencies
+            weights = None if np.all(weights == 1) else weights.astype(self.dtype)
+            # Nan's are counted as overflow, as in fill
+            self.fill_n(values, weights, dropna=False)
+
+    def fill_n(self, values, weights=None, dropna=True, workers=None):
         """Update histograms with a set of values.
 
         Parameters
@@ -436,38 +647,60 @@ class Histogram1D(HistogramBase):
         weights: Optional[array_like]
         drop_na: Optional[bool]
             If true (default), all nan's are skipped.
+        workers: Optional[int]
+            If > 1, the values are binned in this number of threads.
         """
         # TODO: Unify with HistogramBase
         values = np.asarray(values)
-        if dropna:
-            values = values[~np.isnan(values)]
         if self._binning.is_adaptive():
-            map = self._binning.force_bin_existence(values)
+            if dropna and _has_nans(values):
+                map = self._binning.force_bin_existence(values[~np.isnan(values)])
+            else:
+                map = self._binning.force_bin_existence(values)
             self._reshape_data(self._binning.bin_count, map)
-        if weights:
+        if weights is not None:
             weights = np.asarray(weights)
             self._coerce_dtype(weights.dtype)
+        # Compact counters are accumulated in int64, checked and then added
+        compact = self._compact and self.dtype.kind == "u"
         (frequencies, errors2, underflow, overflow, stats) = \
-            calculate_frequencies(values, self._binning, dtype=self.dtype,
-                                  weights=weights, validate_bins=False)
+            calculate_frequencies(values, self._binning, dtype=(np.int64 if compact else self.dtype),
+                                  weights=weights, validate_bins=False, dropna=dropna,
+                                  workers=workers)
+        if weights is not None:
+            self._ensure_errors2()
+        elif self._errors2 is not None:
+            errors2 = frequencies
+        if compact:
+            self._ensure_capacity_for(frequencies, errors2,
+                                      max(underflow, overflow) if self.keep_missed else 0)
+            frequencies = frequencies.astype(self.dtype)
+            if self._errors2 is not None:
+                errors2 = errors2.astype(self.dtype)
         self._frequencies += frequencies
-        self._errors2 += errors2
+        if self._errors2 is not None:
+            self._errors2 += errors2
         # TODO: check that adaptive does not produce under-/over-flows?
         if self.keep_missed:
             self.underflow += underflow
             self.overflow += overflow
-        for key in self._stats:
-            self._stats[key] += stats.get(key, 0.0)
+        if self._stats:
+            for key in self._stats:
+                self._stats[key] += stats.get(key, 0.0)
+        self._modified()
 
+    @_flushing
     def __eq__(self, other):
         if not isinstance(other, self.__class__):
             return False
+        if other._buffer_length:
+            other.flush()
         # TODO: Change to something in binning itself
         if not np.allclose(other.bins, self.bins):
             return False
         if not np.allclose(other.frequencies, self.frequencies):
             return False
-        if not np.allclose(other.errors2, self.errors2):
+        if not np.allclose(other._get_errors2(), self._get_errors2()):
             return False
         if not other.overflow == self.overflow:
             return False
@@ -481,6 +714,7 @@ class Histogram1D(HistogramBase):
             return False
         return True
 
+    @_flushing
     def to_dataframe(self):
         """Convert to pandas DataFrame.
 
@@ -507,6 +741,7 @@ class Histogram1D(HistogramBase):
         kwargs["binning"] = kwargs.pop("binnings")[0]
         return kwargs
 
+    @_flushing
     def to_xarray(self):
         """Convert to xarray.Dataset
 
@@ -550,8 +785,16 @@ class Histogram1D(HistogramBase):
         return cls(**kwargs)
 
 
+# Maximum number of values processed at once in calculate_frequencies
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+# Number of values summed together before adding to the totals (see calculate_frequencies)
+BLOCK_SIZE = 1 << 16
+
+
 def calculate_frequencies(data, binning, weights=None, validate_bins=True,
-                          already_sorted=False, dtype=None):
+                          already_sorted=False, dtype=None, dropna=False, chunk_size=None,
+                          workers=None):
     """Get frequencies and bin errors from the data.
 
     Parameters
@@ -565,17 +808,27 @@ def calculate_frequencies(data, binning, weights=None, validate_bins=True,
     validate_bins : bool, optional
         If True (default), bins are validated to be in ascending order.
     already_sorted : bool, optional
-        If True, the data being entered are already sorted, no need to sort them once more.
+        Not used any more (data are not sorted), kept for compatibility.
     dtype: Optional[type]
         Underlying type for the histogram.
         (If weights are specified, default is float. Otherwise long.)
+    dropna: Optional[bool]
+        If True, nan's are skipped. Otherwise, they are counted as overflow.
+    chunk_size: Optional[int]
+        Maximum number of values to process at once (default: DEFAULT_CHUNK_SIZE).
+        This limits the extra memory needed for the calculation. It is rounded up
+        to a multiple of the block size (see Note).
+    workers: Optional[int]
+        If > 1, the data are split into this number of parts that are
+        processed in a pool of threads. The partial results are then added
+        (so floating-point sums may differ from one thread in the last digits).
 
     Returns
     -------
     frequencies : numpy.ndarray
         Bin contents
-    errors2 : numpy.ndarray
-        Error squares of the bins
+    errors2 : numpy.ndarray or None
+        Error squares of the bins (None without weights, they are equal to frequencies)
     underflow : float
         Weight of items smaller than the first bin
     overflow : float
@@ -587,15 +840,20 @@ def calculate_frequencies(data, binning, weights=None, validate_bins=True,
     ----
     Checks that the bins are in a correct order (not necessarily consecutive).
     Does not check for numerical overflows in bins.
+
+    The data are not sorted. Each value is assigned its bin index
+    (directly for fixed-width bins, by binary search in the edges otherwise)
+    and everything is accumulated in a single pass. This is done in chunks
+    of limited size, so the extra memory does not depend on the data size.
+
+    The sums are always made in blocks of max(BLOCK_SIZE, bin count) values
+    that are added to the totals one after another. The chunks consist
+    of whole blocks, so the results (stats included) are exactly the same
+    for any chunk_size.
     """
 
-    # TODO: Is it possible to merge with histogram_nd.calculate_frequencies?
     # TODO: What if data is None
 
-    # Statistics
-    sum = 0.0
-    sum2 = 0.0
-
     # Ensure correct binning
     bins = binning.bins  # bin_utils.make_bin_array(bins)
     if validate_bins:
@@ -607,13 +865,13 @@ def calculate_frequencies(data, binning, weights=None, validate_bins=True,
     # Prepare 1D numpy array of data
     data = np.asarray(data)
     if data.ndim > 1:
-        data = data.flatten()
+        data = data.ravel()
 
     # Prepare 1D numpy array of weights
     if weights is not None:
         weights = np.asarray(weights)
         if weights.ndim > 1:
-            weights = weights.flatten()
+            weights = weights.ravel()
 
         # Check compatibility of weights
         if weights.shape != data.shape:
@@ -629,49 +887,150 @@ def calculate_frequencies(data, binning, weights=None, validate_bins=True,
     if dtype.kind in "iu" and weights is not None and weights.dtype.kind == "f":
         raise RuntimeError("Integer histogram requested but float weights entered.")
 
-    # Data sorting
-    if not already_sorted:
-        args = np.argsort(data)     # Memory: another copy
-        data = data[args]           # Memory: another copy
-        if weights is not None:
-            weights = weights[args]
-        del args
+    if chunk_size is None:
+        chunk_size = DEFAULT_CHUNK_SIZE
+    dropna = dropna and data.dtype.kind in "fc"
+
+    if workers and workers > 1:
+        # Each thread works on its own part with private arrays
+        def calculate_part(part):
+            return calculate_frequencies(
+                data[part], binning, weights=(None if weights is None else weights[part]),
+                validate_bins=False, dtype=dtype, dropna=dropna, chunk_size=chunk_size)
+        parts = list(_iter_chunks(data.shape[0], -(-data.shape[0] // workers) or 1))
+        results = parallel_map(calculate_part, parts, workers=workers)
+    else:
+        results = [_calculate_chunked_frequencies(data, binning, weights=weights, dtype=dtype,
+                                                  dropna=dropna, chunk_size=chunk_size)]
 
-    # Fill frequencies and errors
     frequencies = np.zeros(bins.shape[0], dtype=dtype)
-    errors2 = np.zeros(bins.shape[0], dtype=dtype)
-    for xbin, bin in enumerate(bins):
-        start = np.searchsorted(data, bin[0], side="left")
-        stop = np.searchsorted(data, bin[1], side="left")
-
-        if xbin == 0:
-            if weights is not None:
-                underflow = weights[0:start].sum()
-            else:
-                underflow = start
-        if xbin == len(bins) - 1:
-            stop = np.searchsorted(data, bin[1], side="right")   # TODO: Understand and explain
-            if weights is not None:
-                overflow = weights[stop:].sum()
-            else:
-                overflow = data.shape[0] - stop
-
-        if weights is not None:
-            frequencies[xbin] = weights[start:stop].sum()
-            errors2[xbin] = (weights[start:stop] ** 2).sum()
-            sum += (data[start:stop] * weights[start:stop]).sum()
-            sum2 += ((data[start:stop]) ** 2 * weights[start:stop]).sum()
-        else:
-            frequencies[xbin] = stop - start
-            errors2[xbin] = stop - start
-            sum += data[start:stop].sum()
-            sum2 += (data[start:stop] ** 2).sum()
+    errors2 = None if weights is None else np.zeros(bins.shape[0], dtype=dtype)
+    underflow = 0
+    overflow = 0
+    stats = {"sum": 0.0, "sum2": 0.0}
+
+    for result in results:
+        frequencies += result[0]
+        if errors2 is not None:
+            errors2 += result[1]
+        underflow += result[2]
+        overflow += result[3]
+        for key in stats:
+            stats[key] += result[4][key]
 
     # Underflow and overflow don't make sense for unconsecutive binning.
     if not bin_utils.is_consecutive(bins):
         underflow = np.nan
         overflow = np.nan
 
-    stats = {"sum": sum, "sum2": sum2}
-
     return frequencies, errors2, underflow, overflow, stats
+
+
+def _calculate_chunked_frequencies(data, binning, weights, dtype, dropna, chunk_size):
+    """Get frequencies and bin errors from data processed in chunks of whole blocks.
+
+    Returns
+    -------
+    Same as calculate_frequencies
+    """
+    block_size = max(BLOCK_SIZE, binning.bin_count)
+    chunk_size = -(-chunk_size // block_size) * block_size
+    totals = None
+    for chunk in _iter_chunks(data.shape[0], chunk_size):
+        chunk_data = data[chunk]
+        chunk_weights = None if weights is None else weights[chunk]
+        # Find bins for all values (arithmetically or by searching in edges)
+        indices = binning._find_bin_indices(chunk_data)
+        if dropna:
+            indices[np.isnan(chunk_data)] = GAP_INDEX
+        for block in _iter_chunks(chunk_data.shape[0], block_size):
+            sums = _calculate_slot_sums(chunk_data[block], indices[block], binning.bin_count,
+                                        None if weights is None else chunk_weights[block])
+            if totals is None:
+                totals = sums
+            else:
+                for total, block_sum in zip(totals, sums):
+                    if total is not None:
+                        total += block_sum
+    if totals is None:
+        totals = _calculate_slot_sums(data[:0], np.zeros(0, dtype=int), binning.bin_count,
+                                      None if weights is None else weights[:0])
+
+    counts, errors2, sums, sums2 = totals
+    frequencies = counts[2:-1].astype(dtype)
+    errors2 = None if errors2 is None else errors2[2:-1].astype(dtype)
+    stats = {"sum": sums[2:-1].sum(), "sum2": sums2[2:-1].sum()}
+    return frequencies, errors2, counts[1], counts[-1], stats
+
+
+def _calculate_slot_sums(data, indices, bin_count, weights=None):
+    """Sums of weights and stats in the bins from pre-computed bin indices.
+
+    All values are accumulated in one pass (see histogram_base._bincount_frequencies).
+
+    Parameters
+    ----------
+    data : np.ndarray
+        1D array of data items.
+    indices : np.ndarray
+        Bin index for each of the items (-1=underflow, bin_count=overflow,
+        binnings.GAP_INDEX=not in any bin)
+    bin_count : int
+    weights : Optional[np.ndarray]
+
+    Returns
+    -------
+    counts, errors2, sums, sums2 : np.ndarray
+        Sums in slots: gap, underflow, bins..., overflow
+        (errors2 is None without weights)
+    """
+    slots = indices + 2
+    minlength = bin_count + 3
+
+    counts, errors2 = _bincount_frequencies(slots, minlength, weights=weights)
+    if weights is not None:
+        sums = np.bincount(slots, weights=data * weights, minlength=minlength)
+        sums2 = np.bincount(slots, weights=data ** 2 * weights, minlength=minlength)
+    else:
+        sums = np.bincount(slots, weights=data, minlength=minlength)
+        sums2 = np.bincount(slots, weights=data ** 2, minlength=minlength)
+    return counts, errors2, sums, sums2
+
+
+def _iter_chunks(length, chunk_size):
+    """Slices splitting a range into chunks of limited size.
+
+    Parameters
+    ----------
+    length: int
+    chunk_size: int
+
+    Returns
+    -------
+    Iterable[slice]
+    """
+    if chunk_size < 1:
+        raise RuntimeError("Chunk size must be positive.")
+    for start in range(0, length, chunk_size):
+        yield slice(start, start + chunk_size)
+
+
+def _has_nans(data, chunk_size=None):
+    """Whether an array contains any nan's.
+
+    It is checked in chunks, so that the extra memory is limited.
+
+    Parameters
+    ----------
+    data: np.ndarray
+    chunk_size: Optional[int]
+
+    Returns
+    -------
+    bool
+    """
+    if data.dtype.kind not in "fc":
+        return False
+    data = data.ravel()
+    return any(np.isnan(data[chunk]).any()
+               for chunk in _iter_chunks(data.shape[0], chunk_size or DEFAULT_CHUNK_SIZE))
@@ -2,6 +2,7 @@
 from __future__ import absolute_import, division
 import numpy as np
 from .binnings import as_binning
+from .bin_utils import bin_map_to_indices
 
 
 class HistogramBase(object):
@@ -30,8 +31,9 @@ class HistogramBase(object):
         Schema for binning(s)
     _frequencies : array_like
         Bin contents
-    _errors2 : array_like
+    _errors2 : array_like or None
         Square errors associated with the bin contents
+        (None if they are equal to frequencies, see errors2)
     _meta_data : dict
         All meta-data (names, user-custom values, ...). Anything can be put in.
         When exported, all information is kept.
@@ -66,12 +68,21 @@ class HistogramBase(object):
         binnings : Iterable[BinningBase or array_like]
         frequencies : Optional[array_like]
         errors2 : Optional[array_like]
-        dtype : np.dtype
+        dtype : np.dtype or "auto"
+            If "auto", the smallest unsigned integer type that can hold the contents
+            is used and it is promoted when necessary (see _ensure_capacity).
+            Weighted fills switch to float64 (smaller floats would silently lose
+            precision of large counters).
         keep_missed : bool
 
         """
         self._binnings = [as_binning(binning) for binning in binnings]
 
+        # Compact dtype, resolved after the frequencies are known
+        if _is_auto_dtype(kwargs.get("dtype")):
+            self._compact = True
+            kwargs["dtype"] = np.dtype(np.uint8) if frequencies is None else None
+
         # Frequencies + appropriate dtypes
         if frequencies is None:
             dtype = kwargs.pop("dtype", np.int64)
@@ -89,6 +100,14 @@ class HistogramBase(object):
                 else:
                     raise RuntimeError("Frequencies of type {0} not understood"
                                        .format(frequencies.dtype))
+            if self._compact:
+                if frequencies.dtype.kind == "f":
+                    frequencies = frequencies.astype(np.float64)
+                else:
+                    bound = _max_value(frequencies)
+                    if errors2 is not None:
+                        bound = max(bound, _max_value(np.asarray(errors2)))
+                    frequencies = frequencies.astype(_compact_dtype(bound))
             dtype = frequencies.dtype
             if frequencies.shape != self.shape:
                 raise RuntimeError("Values must have same dimension as bins.")
@@ -97,15 +116,15 @@ class HistogramBase(object):
             self._frequencies = frequencies
         self._dtype = dtype
 
-        # Errors
+        # Errors (not stored until they differ from frequencies)
         if errors2 is None:
-            self._errors2 = self._frequencies.copy()
+            self._errors2 = None
         else:
             self._errors2 = np.asarray(errors2, dtype=self.dtype)
-        if np.any(self._errors2 < 0):
-            raise RuntimeError("Cannot have negative squared errors.")
-        if self._errors2.shape != self._frequencies.shape:
-            raise RuntimeError("Errors must have same dimension as frequencies.")
+            if np.any(self._errors2 < 0):
+                raise RuntimeError("Cannot have negative squared errors.")
+            if self._errors2.shape != self._frequencies.shape:
+                raise RuntimeError("Errors must have same dimension as frequencies.")
 
         self.keep_missed = kwargs.pop("keep_missed", True)
         # Note: missed are dealt differently in 1D/ND cases
@@ -208,6 +227,24 @@ class HistogramBase(object):
         else:
             raise RuntimeError("Argument of type {0} not understood, int or str expected.".format(type(name_or_index)))
 
+    def _get_projection_axes(self, *axes):
+        axes = list(axes)
+        for i, axis in enumerate(axes):
+            if isinstance(axis, str):
+                if axis not in self.axis_names:
+                    raise RuntimeError("Invalid axis name for projection: " + axis)
+                axes[i] = self.axis_names.index(axis)
+        if not axes:
+            raise RuntimeError("No axis selected for projection")
+        if len(axes) != len(set(axes)):
+            raise RuntimeError("Duplicate axes in projection")
+        invert = list(range(self.ndim))
+        for axis in axes:
+            invert.remove(axis)
+        axes = tuple(axes)
+        invert = tuple(invert)
+        return (axes, invert)
+
     @property
     def shape(self):
         """Shape of histogram's data.
@@ -275,30 +312,88 @@ class HistogramBase(object):
             if np.issubdtype(value, np.integer):
                 if self.dtype.kind == "f":
                     for array in (self._frequencies, self._errors2):
-                        if np.any(array % 1.0):
+                        if array is not None and np.any(array % 1.0):
                             raise RuntimeError("Data contain non-integer values.")
             for array in (self._frequencies, self._errors2):
-                if np.any((array > type_info.max) | (array < type_info.min)):
+                if array is not None and np.any((array > type_info.max) | (array < type_info.min)):
                     raise RuntimeError("Data contain values outside the specified range.")
 
         self._dtype = value
         self._frequencies = self._frequencies.astype(value)
-        self._errors2 = self._errors2.astype(value)
+        if self._errors2 is not None:
+            self._errors2 = self._errors2.astype(value)
         self._missed = self._missed.astype(value)
+        self._modified()
 
     dtype = property(_get_dtype, set_dtype)
 
     def _coerce_dtype(self, other_dtype):
         """Possibly change the bin content type to allow correct operations with other operand.
 
+        Compact (dtype="auto") integer contents are not promoted here,
+        the fills check the capacity themselves (see _ensure_capacity).
+        With floating-point operands, they switch to float64.
+
         Parameters
         ----------
         other_dtype : np.dtype or type
         """
-        new_dtype = np.find_common_type([self.dtype, np.dtype(other_dtype)], [])
+        other_dtype = np.dtype(other_dtype)
+        own_kind = np.dtype(self.dtype).kind if self.dtype is not None else None
+        if self._compact:
+            if own_kind == "f" and other_dtype.kind == "f":
+                return
+            if own_kind == "u":
+                if other_dtype.kind in "biu":
+                    return
+                elif other_dtype.kind == "f":
+                    self.dtype = np.float64
+                    return
+        new_dtype = np.find_common_type([self.dtype, other_dtype], [])
         if new_dtype != self.dtype:
             self.dtype = new_dtype
 
+    # Whether the dtype was chosen automatically (dtype="auto") and can be promoted
+    _compact = False
+
+    def _ensure_capacity(self, *bounds):
+        """Promote a compact integer dtype so that values up to bounds fit in it.
+
+        Parameters
+        ----------
+        bounds: int
+            Upper bounds of the bin contents after an operation
+            (nan's are ignored).
+        """
+        if not self._compact or self.dtype.kind != "u":
+            return
+        bound = max([int(bound) for bound in bounds if not np.isnan(bound)] or [0])
+        if bound > np.iinfo(self.dtype).max:
+            self.set_dtype(_compact_dtype(bound), check=False)
+
+    def _ensure_capacity_for(self, frequencies, errors2=None, missed=0):
+        """Promote a compact dtype before adding a batch of contents.
+
+        This is checked once per batch (using the maxima of the arrays),
+        so that the data can be added by one operation.
+
+        Parameters
+        ----------
+        frequencies: np.ndarray or scalar
+            To be added to frequencies
+        errors2: Optional[np.ndarray or scalar]
+            To be added to errors2 (if stored)
+        missed: scalar
+            Maximum to be added to one of the missed counters
+        """
+        if not self._compact or self.dtype.kind != "u":
+            return
+        bounds = [_max_value(self._frequencies) + _max_value(frequencies),
+                  _max_value(self._missed) + _max_value(missed)]
+        if self._errors2 is not None and errors2 is not None:
+            bounds.append(_max_value(self._errors2) + _max_value(errors2))
+        self._ensure_capacity(*bounds)
+
     @property
     def bin_count(self):
         """Total number of bins.
@@ -362,12 +457,44 @@ class HistogramBase(object):
     def errors2(self):
         """Squares of the bin errors.
 
+        For histograms filled only with unit weights, these are equal to
+        the frequencies and no separate array is stored until they are
+        requested here (the returned array can be changed in place).
+
         Returns
         -------
         np.ndarray
         """
+        self._ensure_errors2()
         return self._errors2
 
+    def _get_errors2(self):
+        """Squares of the bin errors, without storing them separately.
+
+        Only for reading, the result may be the frequencies array.
+
+        Returns
+        -------
+        np.ndarray
+        """
+        return self._frequencies if self._errors2 is None else self._errors2
+
+    def _ensure_errors2(self):
+        """Store errors2 separately from frequencies.
+
+        Call before any operation after which they would differ
+        (weighted fill, scaling, ...).
+        """
+        if self._errors2 is None:
+            storage = self._storage
+            if storage is not None and storage["frequencies"] is self._frequencies:
+                # Keep the spare capacity of adaptive histograms (see _grow_data)
+                storage["all_errors2"] = storage["all_frequencies"].copy()
+                region = self._get_storage_region(storage["starts"], self._frequencies.shape)
+                storage["errors2"] = self._errors2 = storage["all_errors2"][region]
+            else:
+                self._errors2 = self._frequencies.copy()
+
     @property
     def errors(self):
         """Bin errors.
@@ -376,7 +503,7 @@ class HistogramBase(object):
         -------
         np.ndarray
         """
-        return np.sqrt(self.errors2)
+        return np.sqrt(self._get_errors2())
 
     @property
     def total(self):
@@ -431,6 +558,75 @@ class HistogramBase(object):
     def adaptive(self, value):
         self.set_adaptive(value)
 
+    # Arrays derived from the binnings (see _get_binning_cached)
+    _binning_cache = None
+
+    def _get_binning_cached(self, key, function):
+        """Array derived from the binnings, computed only once.
+
+        The cache is invalidated when the binning changes
+        (_change_binning, _reshape_data), the arrays are read-only.
+
+        Parameters
+        ----------
+        key: Hashable
+        function: Callable
+            Computes the array if not available.
+
+        Returns
+        -------
+        np.ndarray
+        """
+        if self._binning_cache is None:
+            self._binning_cache = {}
+        elif key in self._binning_cache:
+            return self._binning_cache[key]
+        value = np.array(function())
+        value.flags.writeable = False
+        self._binning_cache[key] = value
+        return value
+
+    # Number of changes of the bin contents (see _modified)
+    _version = 0
+
+    # Values cached per version (see _get_cached)
+    _cache = None
+    _cache_version = None
+
+    def _modified(self):
+        """Mark the histogram as changed.
+
+        All methods that change the frequencies, errors or the binning
+        call this, invalidating the values cached by _get_cached.
+        """
+        self._version += 1
+
+    def _get_cached(self, key, function):
+        """Value computed once per version.
+
+        In-place changes of the arrays returned by the properties
+        (e.g. `h.frequencies[0] = 1`) are not tracked, so only values
+        that do not depend on the contents of these arrays may be cached
+        (e.g. sizes of the occupied bins in sparse histograms).
+        Arrays are made read-only, as they are shared between the calls.
+
+        Parameters
+        ----------
+        key: Hashable
+        function: Callable
+            Computes the value if not available.
+        """
+        if self._cache is None or self._cache_version != self._version:
+            self._cache = {}
+            self._cache_version = self._version
+        elif key in self._cache:
+            return self._cache[key]
+        value = function()
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+        self._cache[key] = value
+        return value
+
     def _change_binning(self, new_binning, bin_map, axis=0):
         """Set new binnning and update the bin contents according to a map.
 
@@ -440,8 +636,9 @@ class HistogramBase(object):
         Parameters
         ----------
         new_binning: physt.binnings.BinningBase
-        bin_map: Iterable[tuple]
-            tuples contain bin indices (old, new)
+        bin_map: Iterable[tuple] or np.ndarray or int
+            tuples contain bin indices (old, new), array contains the new index
+            for each old bin, int is the offset (see _reshape_data)
         axis: int
             What axis does the binning describe(0..ndim-1)
         """
@@ -450,6 +647,7 @@ class HistogramBase(object):
             raise RuntimeError("Axis must be in range 0..(ndim-1)")
         self._reshape_data(new_binning.bin_count, bin_map, axis)
         self._binnings[axis] = new_binning
+        self._binning_cache = None
 
     def merge_bins(self, amount=None, min_frequency=None, axis=None, inplace=False):
         """Reduce the number of bins and add their content:
@@ -482,20 +680,17 @@ class HistogramBase(object):
             if amount is not None:
                 if not amount == int(amount):
                     raise RuntimeError("Amount must be integer")
-                bin_map = [(i, i // amount) for i in range(self.shape[axis])]
+                bin_map = np.arange(self.shape[axis]) // int(amount)
             elif min_frequency is not None:
-                if self.ndim == 1:
-                    check = self.frequencies
-                else:
-                    check = self.projection(axis).frequencies
-                bin_map = []
+                check = self._get_axis_frequencies(axis)
+                bin_map = np.empty(len(check), dtype=int)
                 current_new = 0
                 current_sum = 0
                 for i, freq in enumerate(check):
                     if freq >= min_frequency and current_sum > 0:
                         current_sum = 0
                         current_new += 1
-                    bin_map.append((i, current_new))
+                    bin_map[i] = current_new
                     current_sum += freq
                     if current_sum > min_frequency:
                         current_sum = 0
@@ -505,6 +700,18 @@ class HistogramBase(object):
             new_binning = self._binnings[axis].apply_bin_map(bin_map)
             self._change_binning(new_binning, bin_map, axis=axis)
 
+    def _get_axis_frequencies(self, axis):
+        """Total frequencies in the bins along one axis (used in merge_bins).
+
+        Returns
+        -------
+        np.ndarray
+        """
+        if self.ndim == 1:
+            return self.frequencies
+        else:
+            return self.projection(axis).frequencies
+
     def _reshape_data(self, new_size, bin_map, axis=0):
         """Reshape data to match new binning schema.
 
@@ -513,20 +720,28 @@ class HistogramBase(object):
         Parameters
         ----------
         new_size: int
-        bin_map: Iterable[(old, new)] or int or None
+        bin_map: Iterable[(old, new)] or np.ndarray or int or None
             If None, we can keep the data unchanged.
             If int, it is offset by which to shift the data (can be 0)
             If iterable, pairs specify which old bin should go into which new bin
+            If array, it contains the new bin index for each old bin
         axis: int
             On which axis to apply
         """
+        self._binning_cache = None
+        self._modified()
         if bin_map is None:
             return
+        elif isinstance(bin_map, int) and self._grow_data(new_size, bin_map, axis):
+            return
         else:
             new_shape = list(self.shape)
             new_shape[axis] = new_size
             new_frequencies = np.zeros(new_shape, dtype=self._frequencies.dtype)
-            new_errors2 = np.zeros(new_shape, dtype=self._frequencies.dtype)
+            if self._errors2 is None:
+                new_errors2 = None
+            else:
+                new_errors2 = np.zeros(new_shape, dtype=self._frequencies.dtype)
             self._apply_bin_map(
                 old_frequencies=self._frequencies, new_frequencies=new_frequencies,
                 old_errors2=self._errors2, new_errors2=new_errors2,
@@ -534,6 +749,78 @@ class HistogramBase(object):
             self._frequencies = new_frequencies
             self._errors2 = new_errors2
 
+    # Arrays with spare capacity, of which frequencies and errors2 are views (see _grow_data)
+    _storage = None
+
+    def _grow_data(self, new_size, offset, axis=0):
+        """Extend data along an axis, keeping spare capacity on both sides.
+
+        The frequencies and errors2 are views into larger zero-filled arrays
+        that are reallocated (with the headroom growing geometrically)
+        only when the spare capacity is exhausted. Repeated extensions
+        of adaptive histograms therefore cost amortized O(1) per bin.
+
+        Parameters
+        ----------
+        new_size: int
+        offset: int
+            Shift of the existing bins (i.e. number of bins added on the left)
+        axis: int
+
+        Returns
+        -------
+        bool
+            Whether the data could be extended (otherwise, nothing happens)
+        """
+        old_size = self._frequencies.shape[axis]
+        if offset < 0 or old_size + offset > new_size:
+            return False
+        storage = self._storage
+        if storage is None or storage["frequencies"] is not self._frequencies \
+                or storage["errors2"] is not self._errors2:
+            storage = {
+                "starts": [0] * self.ndim,
+                "frequencies": self._frequencies,
+                "errors2": self._errors2
+            }
+            storage["all_frequencies"] = self._frequencies
+            storage["all_errors2"] = self._errors2
+
+        starts = list(storage["starts"])
+        starts[axis] -= offset
+        if starts[axis] < 0 or starts[axis] + new_size > storage["all_frequencies"].shape[axis]:
+            # Reallocate with headroom of new_size / 2 on both sides
+            capacities = list(storage["all_frequencies"].shape)
+            capacities[axis] = 2 * new_size
+            starts[axis] = new_size // 2
+            all_frequencies = np.zeros(capacities, dtype=self._frequencies.dtype)
+            old_region = self._get_storage_region(starts, self._frequencies.shape, axis, offset)
+            all_frequencies[old_region] = self._frequencies
+            if self._errors2 is None:
+                all_errors2 = None
+            else:
+                all_errors2 = np.zeros(capacities, dtype=self._errors2.dtype)
+                all_errors2[old_region] = self._errors2
+            storage["all_frequencies"] = all_frequencies
+            storage["all_errors2"] = all_errors2
+
+        new_shape = list(self._frequencies.shape)
+        new_shape[axis] = new_size
+        region = self._get_storage_region(starts, new_shape)
+        storage["frequencies"] = self._frequencies = storage["all_frequencies"][region]
+        if storage["all_errors2"] is not None:
+            storage["errors2"] = self._errors2 = storage["all_errors2"][region]
+        storage["starts"] = starts
+        self._storage = storage
+        return True
+
+    @staticmethod
+    def _get_storage_region(starts, shape, axis=None, offset=0):
+        """Index of the used part of storage (with shifted start along an axis)."""
+        return tuple(slice(start + (offset if i == axis else 0),
+                           start + (offset if i == axis else 0) + size)
+                     for i, (start, size) in enumerate(zip(starts, shape)))
+
     def _apply_bin_map(self, old_frequencies, new_frequencies, old_errors2,
                        new_errors2, bin_map, axis=0):
         """Fill new data arrays using a map.
@@ -544,9 +831,9 @@ class HistogramBase(object):
             Source of frequencies data
         new_frequencies : np.ndarray
             Target of frequencies data
-        old_errors2 : np.ndarray
-            Source of errors data
-        new_errors2 : np.ndarray
+        old_errors2 : np.ndarray or None
+            Source of errors data (None => not stored)
+        new_errors2 : np.ndarray or None
             Target of errors data
         bin_map: Iterable[(old, new)] or int or None
             As in _reshape_data
@@ -561,16 +848,19 @@ class HistogramBase(object):
             if isinstance(bin_map, int):
                 new_index = [slice(None) for i in range(self.ndim)]
                 new_index[axis] = slice(bin_map, bin_map + old_frequencies.shape[axis])
-                new_frequencies[new_index] += old_frequencies
-                new_errors2[new_index] += old_errors2
+                new_frequencies[tuple(new_index)] += old_frequencies
+                if new_errors2 is not None:
+                    new_errors2[tuple(new_index)] += old_errors2
             else:
-                for (old, new) in bin_map:      # Generic enough
-                    new_index = [slice(None) for i in range(self.ndim)]
-                    new_index[axis] = new
-                    old_index = [slice(None) for i in range(self.ndim)]
-                    old_index[axis] = old
-                    new_frequencies[new_index] += old_frequencies[old_index]
-                    new_errors2[new_index] += old_errors2[old_index]
+                old_indices, new_indices = bin_map_to_indices(bin_map)
+                if np.array_equal(old_indices, np.arange(old_frequencies.shape[axis])):
+                    old_indices = None   # All bins in their order => no need to take
+                for old, new in ((old_frequencies, new_frequencies), (old_errors2, new_errors2)):
+                    if new is None:
+                        continue
+                    if old_indices is not None:
+                        old = np.take(old, old_indices, axis=axis)
+                    _add_along_axis(new, new_indices, old, axis)
 
     def has_same_bins(self, other):
         """Whether two histograms share the same binning.
@@ -589,6 +879,14 @@ class HistogramBase(object):
                     return False
             return True
 
+    def __getstate__(self):
+        # Spare capacity and caches are not worth copying
+        state = self.__dict__.copy()
+        state.pop("_storage", None)
+        state.pop("_binning_cache", None)
+        state.pop("_cache", None)
+        return state
+
     def copy(self, include_frequencies=True):
         """Copy the histogram.
 
@@ -604,11 +902,11 @@ class HistogramBase(object):
         if include_frequencies:
             frequencies = np.copy(self.frequencies)
             missed = self._missed.copy()
-            errors2 = np.copy(self.errors2)
+            errors2 = None if self._errors2 is None else np.copy(self._errors2)
             stats = self._stats or None
         else:
             frequencies = np.zeros_like(self._frequencies)
-            errors2 = np.zeros_like(self._errors2)
+            errors2 = None
             missed = np.zeros_like(self._missed)
             stats = None
         a_copy = self.__class__.__new__(self.__class__)
@@ -620,6 +918,8 @@ class HistogramBase(object):
         a_copy.keep_missed = self.keep_missed
         a_copy._missed = missed
         a_copy._stats = stats
+        if self._compact:
+            a_copy._compact = True
         return a_copy
 
     def fill(self, value, weight=1, **kwargs):
@@ -700,7 +1000,7 @@ class HistogramBase(object):
         result["binnings"] = [binning.to_dict() for binning in self._binnings]
         result["frequencies"] = self.frequencies.tolist()
         result["dtype"] = str(np.dtype(self.dtype))
-        result["errors2"] = self.errors2.tolist()
+        result["errors2"] = self._get_errors2().tolist()
         result["meta_data"] = self._meta_data
         result["missed"] = self._missed.tolist()
         result["missed_keep"] = self.keep_missed
@@ -810,9 +1110,13 @@ class HistogramBase(object):
         elif self.has_same_bins(other):
             # print("Has same!!!!!!!!!!")
             self._coerce_dtype(other.dtype)
-            self._frequencies += other.frequencies
-            self._errors2 += other.errors2
-            self._missed += other._missed
+            if other._errors2 is not None:
+                self._ensure_errors2()
+            self._ensure_capacity_for(other.frequencies, other._get_errors2(), other._missed)
+            if self._errors2 is not None:
+                self._errors2 += other._get_errors2().astype(self.dtype, copy=False)
+            self._frequencies += other.frequencies.astype(self.dtype, copy=False)
+            self._missed += other._missed.astype(self.dtype, copy=False)
         elif self.is_adaptive():
             if other.missed > 0:
                 raise RuntimeError("Cannot adapt histogram with missed values.")
@@ -831,8 +1135,12 @@ class HistogramBase(object):
                     map1, map2 = new_bins.adapt(other._binnings[i])
                     self._change_binning(new_bins, map1, axis=i)
                     other._change_binning(new_bins, map2, axis=i)
-                self._frequencies += other.frequencies
-                self._errors2 += other.errors2
+                if other._errors2 is not None:
+                    self._ensure_errors2()
+                self._ensure_capacity_for(other.frequencies, other._get_errors2())
+                if self._errors2 is not None:
+                    self._errors2 += other._get_errors2().astype(self.dtype, copy=False)
+                self._frequencies += other.frequencies.astype(self.dtype, copy=False)
 
             except:
                 raise  # RuntimeError("Cannot find common binning for added histograms.")
@@ -842,6 +1150,7 @@ class HistogramBase(object):
         if self._stats and other._stats:
             for key in self._stats:
                 self._stats[key] += other._stats[key]
+        self._modified()
         return self
 
     def __sub__(self, other):
@@ -865,12 +1174,20 @@ class HistogramBase(object):
             raise RuntimeError("Histograms may be multiplied only by a constant.")
         if np.issubdtype(self.dtype, np.integer) and np.issubdtype(type(other), np.floating):
             self.dtype = float
+        elif self._compact and self.dtype.kind == "u":
+            if other < 0:
+                self.dtype = np.int64
+            else:
+                bound = max(_max_value(self._frequencies), _max_value(self._missed)) * other
+                self._ensure_capacity(bound, _max_value(self._get_errors2()) * other ** 2)
+        self._ensure_errors2()
         self._frequencies *= other
         self._errors2 *= other ** 2
         self._missed *= other
         if self._stats:
             self._stats["sum"] *= other
             self._stats["sum2"] *= other ** 2
+        self._modified()
         return self
 
     def __rmul__(self, other):
@@ -885,12 +1202,14 @@ class HistogramBase(object):
         if not np.isscalar(other):
             raise RuntimeError("Histograms may be divided only by a constant.")
         self._coerce_dtype(np.float64)
+        self._ensure_errors2()
         self._frequencies /= other
         self._errors2 /= other ** 2
         self._missed /= other
         if self._stats:
             self._stats["sum"] /= other
             self._stats["sum2"] /= other ** 2
+        self._modified()
         return self
 
     def __lshift__(self, value):
@@ -925,3 +1244,98 @@ class HistogramBase(object):
         frequencies
         """
         return self.frequencies
+
+
+def _add_along_axis(target, indices, values, axis=0):
+    """Add values to the target at indices along an axis.
+
+    Values with the same index are summed together (as in np.add.at).
+
+    Parameters
+    ----------
+    target: np.ndarray
+        Modified in place
+    indices: np.ndarray
+        Index in target (along axis) for each item of values (along axis)
+    values: np.ndarray
+    axis: int
+    """
+    if indices.shape[0] == 0:
+        return
+    if np.all(indices[1:] >= indices[:-1]):
+        # Usual case of merged bins => sum them all at once
+        starts = np.flatnonzero(np.concatenate([[True], indices[1:] != indices[:-1]]))
+        target_index = [slice(None)] * target.ndim
+        target_index[axis] = indices[starts]
+        target[tuple(target_index)] += np.add.reduceat(values, starts, axis=axis)
+    else:
+        np.add.at(np.moveaxis(target, axis, 0), indices, np.moveaxis(values, axis, 0))
+
+
+def _bincount_frequencies(slots, slot_count, weights=None):
+    """Sum the weights (and their squares) of items falling into slots.
+
+    This is the accumulation kernel shared by 1D and ND histograms,
+    the items are processed in one pass using np.bincount.
+
+    Parameters
+    ----------
+    slots: np.ndarray
+        Non-negative integer slot for each item.
+    slot_count: int
+        Minimum length of the results.
+    weights: Optional[np.ndarray]
+        Weight of each item (if None, each item counts as 1).
+
+    Returns
+    -------
+    counts: np.ndarray
+        Sum of weights in each slot (int64 if no weights are present).
+    errors2: np.ndarray or None
+        Sum of squared weights in each slot, None if there are no weights
+        (the values would be the same as counts).
+    """
+    if weights is None:
+        return np.bincount(slots, minlength=slot_count), None
+    else:
+        counts = np.bincount(slots, weights=weights, minlength=slot_count)
+        errors2 = np.bincount(slots, weights=weights ** 2, minlength=slot_count)
+        return counts, errors2
+
+
+def _is_auto_dtype(dtype):
+    """Whether the dtype argument asks for compact automatic dtype."""
+    return isinstance(dtype, str) and dtype == "auto"
+
+
+def _compact_dtype(bound):
+    """The smallest unsigned integer type that can hold values up to bound.
+
+    Parameters
+    ----------
+    bound: int
+
+    Returns
+    -------
+    np.dtype
+    """
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if bound <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    raise RuntimeError("Value {0} too large for any integer type.".format(bound))
+
+
+def _max_value(array):
+    """Maximum of an array or scalar (0 if empty, nan's are ignored).
+
+    Returns
+    -------
+    int or float
+    """
+    array = np.asarray(array)
+    if array.size == 0:
+        return 0
+    if array.dtype.kind in "fc":
+        value = np.nanmax(array) if not np.all(np.isnan(array)) else 0
+        return float(value)
+    return int(array.max())
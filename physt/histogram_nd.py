@@ -3,7 +3,9 @@ from __future__ import absolute_import, division
 
 import numpy as np
 
-from .histogram_base import HistogramBase
+from .histogram_base import HistogramBase, _bincount_frequencies
+from .histogram1d import DEFAULT_CHUNK_SIZE, _iter_chunks
+from .util import parallel_map
 
 
 class HistogramND(HistogramBase):
@@ -44,6 +46,7 @@ class HistogramND(HistogramBase):
             raise RuntimeError("The length of axis names must be equal to histogram dimension.")
 
         # Missed values
+        self._ensure_capacity(missed)
         self._missed = np.array([missed], dtype=self.dtype)
 
     # Not supported yet
@@ -105,8 +108,8 @@ class HistogramND(HistogramBase):
         array_index = [slice(None, None, None) for i in range(self.ndim)]
         array_index[axis_id] = index
 
-        frequencies = self._frequencies[array_index].copy()
-        errors2 = self._errors2[array_index].copy()
+        frequencies = self._frequencies[tuple(array_index)].copy()
+        errors2 = None if self._errors2 is None else self._errors2[tuple(array_index)].copy()
 
         if isinstance(index, int):
             return self._reduce_dimension([ax for ax in range(self.ndim) if ax != axis_id], frequencies, errors2)
@@ -165,13 +168,18 @@ class HistogramND(HistogramBase):
 
     def get_bin_widths(self, axis=None):  # -> Base
         if axis is not None:
-            return self.get_bin_right_edges(axis) - self.get_bin_left_edges(axis)
+            axis = self._get_axis(axis)
+            return self._get_binning_cached(
+                ("bin_widths", axis),
+                lambda: self.get_bin_right_edges(axis) - self.get_bin_left_edges(axis))
         else:
             return np.meshgrid(*[self.get_bin_widths(i) for i in range(self.ndim)], indexing='ij')
 
     @property
     def bin_sizes(self):
-        # TODO: Some kind of caching?
+        return self._get_binning_cached("bin_sizes", self._calculate_bin_sizes)
+
+    def _calculate_bin_sizes(self):
         sizes = self.get_bin_widths(0)
         for i in range(1, self.ndim):
             sizes = np.multiply.outer(sizes, self.get_bin_widths(i))
@@ -201,21 +209,26 @@ class HistogramND(HistogramBase):
 
     def get_bin_left_edges(self, axis=None):
         if axis is not None:
-            return self.bins[self._get_axis(axis)][:, 0]
+            axis = self._get_axis(axis)
+            return self._get_binning_cached(("bin_left_edges", axis), lambda: self.bins[axis][:, 0])
         else:
             edges = [self.get_bin_left_edges(i) for i in range(self.ndim)]
             return np.meshgrid(*edges, indexing='ij')
 
     def get_bin_right_edges(self, axis=None):
         if axis is not None:
-            return self.bins[self._get_axis(axis)][:, 1]
+            axis = self._get_axis(axis)
+            return self._get_binning_cached(("bin_right_edges", axis), lambda: self.bins[axis][:, 1])
         else:
             edges = [self.get_bin_right_edges(i) for i in range(self.ndim)]
             return np.meshgrid(*edges, indexing='ij')
 
     def get_bin_centers(self, axis=None):
         if axis is not None:
-            return (self.get_bin_right_edges(axis) + self.get_bin_left_edges(axis)) / 2
+            axis = self._get_axis(axis)
+            return self._get_binning_cached(
+                ("bin_centers", axis),
+                lambda: (self.get_bin_right_edges(axis) + self.get_bin_left_edges(axis)) / 2)
         else:
             return np.meshgrid(*[self.get_bin_centers(i) for i in range(self.ndim)], indexing='ij')
 
@@ -236,6 +249,9 @@ class HistogramND(HistogramBase):
             If axis is specified, a number. Otherwise, a tuple. If not available, None.
         """
         if axis is not None:
+            ixbin = self._binnings[axis]._find_bin_index(value)
+            if ixbin is not None:
+                return ixbin if 0 <= ixbin < self.shape[axis] else None
             ixbin = np.searchsorted(self.get_bin_left_edges(axis), value, side="right")
             if ixbin == 0:
                 return None
@@ -257,6 +273,39 @@ class HistogramND(HistogramBase):
             else:
                 return ixbin
 
+    def find_bin_n(self, values, flat=False):
+        """Indices of bins corresponding to an array of values.
+
+        Vectorized variant of find_bin.
+
+        Parameters
+        ----------
+        values: array_like
+            Array of shape (count, ndim)
+        flat: bool
+            If True, return index into the flattened frequencies instead
+            of the index along each axis.
+
+        Returns
+        -------
+        numpy.ndarray
+            If not flat, integer array of shape (count, ndim) with bin indices along each axis
+            (-1=underflow, N=overflow or nan, binnings.GAP_INDEX=not found - inconsecutive).
+            If flat, integer array of shape (count,) with -1 for values outside the bins.
+        """
+        values = np.asarray(values)
+        if values.ndim != 2 or values.shape[1] != self.ndim:
+            raise RuntimeError("Expecting array with {0} columns".format(self.ndim))
+        indices = np.empty(values.shape, dtype=np.intp)
+        for axis, binning in enumerate(self._binnings):
+            indices[:, axis] = binning._find_bin_indices(values[:, axis])
+        if not flat:
+            return indices
+        inside = ((indices >= 0) & (indices < self.shape)).all(axis=1)
+        flat_indices = np.full(values.shape[0], -1, dtype=np.intp)
+        flat_indices[inside] = np.ravel_multi_index(indices[inside].T, self.shape)
+        return flat_indices
+
     def fill(self, value, weight=1, **kwargs):
         self._coerce_dtype(type(weight))
         for i, binning in enumerate(self._binnings):
@@ -265,13 +314,22 @@ class HistogramND(HistogramBase):
                 self._reshape_data(binning.bin_count, bin_map, i)
         ixbin = self.find_bin(value, **kwargs)
         if ixbin is None and self.keep_missed:
+            if self._compact:
+                self._ensure_capacity(int(self._missed[0]) + weight)
             self._missed += weight
         else:
+            if weight != 1:
+                self._ensure_errors2()
+            if self._compact:
+                self._ensure_capacity(int(self._frequencies[ixbin]) + weight,
+                                      int(self._get_errors2()[ixbin]) + weight ** 2)
             self._frequencies[ixbin] += weight
-            self._errors2[ixbin] += weight ** 2
+            if self._errors2 is not None:
+                self._errors2[ixbin] += weight ** 2
+        self._modified()
         return ixbin
 
-    def fill_n(self, values, weights=None, dropna=True, columns=False):
+    def fill_n(self, values, weights=None, dropna=True, columns=False, workers=None):
         """Add more values at once.
 
         Parameters
@@ -279,7 +337,8 @@ class HistogramND(HistogramBase):
         values: array_like
             Values to add. Can be array of shape (count, ndim) or
             array of shape (ndim, count) [use columns=True] or something
-            convertible to it
+            convertible to it. Structured arrays and pandas DataFrames
+            are binned by their fields / columns.
         weights: array_like
             Weights for values (optional)
         dropna: bool
@@ -287,48 +346,43 @@ class HistogramND(HistogramBase):
             exception is thrown.
         columns: bool
             Signal that the data are transposed (in columns, instead of rows).
-            This allows to pass list of arrays in values.
+            This allows to pass list of arrays in values. The columns
+            are binned directly, without being stacked to one array.
+        workers: Optional[int]
+            If > 1, the values are binned in this number of threads.
         """
-        values = np.asarray(values)
-        if values.ndim != 2:
-            raise RuntimeError("Expecting 2D array of values.")
-        if columns:
-            values = values.T
-        if values.shape[1] != self.ndim:
-            raise RuntimeError("Expecting array with {0} columns".format(self.ndim))
-        if dropna:
-            values = values[~np.isnan(values).any(axis=1)]
+        values = _prepare_columns(values, ndim=self.ndim, columns=columns)
         if weights is not None:
             weights = np.asarray(weights)
             # TODO: Check for weights size?
             self._coerce_dtype(weights.dtype)
+        if dropna:
+            values, weights = _drop_nan_rows(values, weights)
         for i, binning in enumerate(self._binnings):
             if binning.is_adaptive():
-                map = binning.force_bin_existence(values[:, i])   # TODO: Add to some test
+                map = binning.force_bin_existence(values[i])   # TODO: Add to some test
                 self._reshape_data(binning.bin_count, map, i)
+        # Compact counters are accumulated in int64, checked and then added
+        compact = self._compact and self.dtype.kind == "u"
         frequencies, errors2, missed = calculate_frequencies(values, self.ndim,
-                                                             self._binnings, weights=weights)
-        self._frequencies += frequencies
-        self._errors2 += errors2
-        self._missed[0] += missed
-
-    def _get_projection_axes(self, *axes):
-        axes = list(axes)
-        for i, axis in enumerate(axes):
-            if isinstance(axis, str):
-                if axis not in self.axis_names:
-                    raise RuntimeError("Invalid axis name for projection: " + axis)
-                axes[i] = self.axis_names.index(axis)
-        if not axes:
-            raise RuntimeError("No axis selected for projection")
-        if len(axes) != len(set(axes)):
-            raise RuntimeError("Duplicate axes in projection")
-        invert = list(range(self.ndim))
-        for axis in axes:
-            invert.remove(axis)
-        axes = tuple(axes)
-        invert = tuple(invert)
-        return (axes, invert)
+                                                             self._binnings, weights=weights,
+                                                             dtype=(np.int64 if compact else self.dtype),
+                                                             workers=workers, columns=True)
+        if frequencies is not None:
+            if weights is not None:
+                self._ensure_errors2()
+            elif self._errors2 is not None:
+                errors2 = frequencies
+            if compact:
+                self._ensure_capacity_for(frequencies, errors2, missed)
+                frequencies = frequencies.astype(self.dtype)
+                if self._errors2 is not None:
+                    errors2 = errors2.astype(self.dtype)
+            self._frequencies += frequencies
+            if self._errors2 is not None:
+                self._errors2 += errors2
+            self._missed[0] += missed
+            self._modified()
 
     def _reduce_dimension(self, axes, frequencies, errors2, **kwargs):
         name = kwargs.pop("name", self.name)
@@ -383,13 +437,89 @@ class HistogramND(HistogramBase):
         Returns
         -------
         HistogramND or Histogram2D or Histogram1D (or others in special cases)
+
+        See Also
+        --------
+        projections
         """
         # TODO: rename to project in 0.4
         axes, invert = self._get_projection_axes(*axes)
-        frequencies = self.frequencies.sum(axis=invert)
-        errors2 = self.errors2.sum(axis=invert)
+        partial_sums = kwargs.pop("_partial_sums", None)     # Shared in projections
+        if partial_sums is None:
+            frequencies = self.frequencies.sum(axis=invert)
+            errors2 = None if self._errors2 is None else self._errors2.sum(axis=invert)
+        else:
+            frequencies, errors2 = self._get_projection_sums(invert, partial_sums)
+            frequencies = frequencies.copy()
+            errors2 = None if errors2 is None else errors2.copy()
         return self._reduce_dimension(axes, frequencies, errors2, **kwargs)
 
+    def projections(self, *groups, **kwargs):
+        """Several projections computed together.
+
+        The partial sums are shared between the projections, so e.g.
+        all 1D and 2D marginals cost only a few passes over the data.
+
+        Parameters
+        ----------
+        groups: Iterable[int or str or Iterable[int or str]]
+            Axes for each of the projections (a single axis or a sequence).
+        kwargs:
+            Passed to each projection (see projection)
+
+        Returns
+        -------
+        list
+            Projections in the order of groups, the same types as in projection.
+
+        Examples
+        --------
+        >>> h.projections(0, 1, (0, 1), ("x", "z"))
+        """
+        groups = [(group,) if isinstance(group, (int, str)) else tuple(group)
+                  for group in groups]
+        partial_sums = {}
+        # Larger projections first, they serve as partial sums of the smaller ones
+        for group in sorted(groups, key=len, reverse=True):
+            _, invert = self._get_projection_axes(*group)
+            self._get_projection_sums(invert, partial_sums)
+        return [self.projection(*group, _partial_sums=partial_sums, **kwargs) for group in groups]
+
+    def _get_projection_sums(self, invert, partial_sums):
+        """Frequencies and errors2 summed over some axes.
+
+        The largest axis is summed out first and the partial sums
+        are stored, so that other projections can start from them.
+
+        Parameters
+        ----------
+        invert: tuple[int]
+            Axes to sum over.
+        partial_sums: dict
+            Sums already calculated (updated with the new ones).
+
+        Returns
+        -------
+        frequencies: np.ndarray
+        errors2: np.ndarray or None
+        """
+        invert = tuple(sorted(invert))
+        if not invert:
+            return self.frequencies, self._errors2
+
+        def calculate():
+            last = min(invert, key=lambda axis: self.shape[axis])
+            frequencies, errors2 = self._get_projection_sums(
+                tuple(axis for axis in invert if axis != last), partial_sums)
+            # Position of the axis among the not yet summed ones
+            last -= sum(1 for axis in invert if axis < last)
+            return (frequencies.sum(axis=last),
+                    None if errors2 is None else errors2.sum(axis=last))
+
+        if invert not in partial_sums:
+            partial_sums[invert] = calculate()
+        return partial_sums[invert]
+
     def __eq__(self, other):
         """Equality comparison
 
@@ -403,7 +533,7 @@ class HistogramND(HistogramBase):
         for i in range(self.ndim):
             if not np.allclose(other.bins[i], self.bins[i]):
                 return False
-        if not np.allclose(other.errors2, self.errors2):
+        if not np.allclose(other._get_errors2(), self._get_errors2()):
             return False
         if not np.allclose(other.frequencies, self.frequencies):
             return False
@@ -439,7 +569,8 @@ class Histogram2D(HistogramND):
         a_copy._binnings = list(reversed(a_copy._binnings))
         a_copy.axis_names = list(reversed(a_copy.axis_names))
         a_copy._frequencies = a_copy._frequencies.T
-        a_copy._errors2 = a_copy._errors2.T
+        if a_copy._errors2 is not None:
+            a_copy._errors2 = a_copy._errors2.T
         return a_copy
 
     def partial_normalize(self, axis=0, inplace=False):
@@ -463,6 +594,7 @@ class Histogram2D(HistogramND):
             return copy
         else:
             self._coerce_dtype(float)
+            self._ensure_errors2()
             if axis == 0:
                 divisor = self._frequencies.sum(axis=0)
             else:
@@ -470,19 +602,22 @@ class Histogram2D(HistogramND):
             divisor[divisor == 0] = 1             # Prevent division errors
             self._frequencies /= divisor
             self._errors2 /= (divisor * divisor)  # Has its limitations
+            self._modified()
             return self
 
     def numpy_like(self):
         return self.frequencies, self.numpy_bins[0], self.numpy_bins[1]
 
 
-def calculate_frequencies(data, ndim, binnings, weights=None, dtype=None):
+def calculate_frequencies(data, ndim, binnings, weights=None, dtype=None, workers=None,
+                          chunk_size=None, columns=False):
     """"Get frequencies and bin errors from the data (n-dimensional variant).
 
     Parameters
     ----------
     data : array_like
         2D array with ndim columns and row for each entry.
+        (See `columns` and `_prepare_columns` for other accepted layouts.)
     ndim : int
         Dimensionality od the data.
     binnings:
@@ -493,36 +628,47 @@ def calculate_frequencies(data, ndim, binnings, weights=None, dtype=None):
     dtype : Optional[type]
         Underlying type for the histogram.
         (If weights are specified, default is float. Otherwise int64.)
+    workers : Optional[int]
+        If > 1, the rows are split into this number of parts that are
+        processed in a pool of threads. The partial results are then added.
+    chunk_size: Optional[int]
+        Maximum number of rows to process at once (default: DEFAULT_CHUNK_SIZE).
+    columns: bool
+        If True, data are in columns (e.g. a list of ndim 1D arrays).
 
     Returns
     -------
     frequencies : array_like
-    errors2 : array_like
+    errors2 : array_like or None
+        None without weights (errors2 are equal to frequencies)
     missing : scalar[dtype]
+
+    Note
+    ----
+    The bin index in each axis is found once for every row, the indices are combined
+    into a flat index in the frequency array and everything is accumulated in a single pass
+    (the same kernel as in the 1D case). Rows outside the bins in any of the axes
+    (including the gaps between inconsecutive bins) are counted as missing.
+    The columns are never stacked together, so that no copy of the data is necessary.
     """
 
     # TODO: Remove ndim
-    # TODO: What if data is None
 
-    # Prepare numpy array of data
+    # Prepare list of columns
     if data is not None:
-        data = np.asarray(data)
-        if data.ndim != 2:
-            raise RuntimeError("histogram_nd.calculate_frequencies requires 2D input data.")
-            # TODO: If somewhere, here we would check ndim
+        data = _prepare_columns(data, columns=columns)
+        length = data[0].shape[0] if data else 0
 
-    # Guess correct dtype and apply to weights
+    # Guess correct dtype and check weights
     if weights is None:
         if not dtype:
             dtype = np.int64
-        if data is not None:
-            weights = np.ones(data.shape[0], dtype=dtype)
     else:
         weights = np.asarray(weights)
         if data is None:
             raise RuntimeError("Weights specified but data not.")
         else:
-            if data.shape[0] != weights.shape[0]:
+            if length != weights.shape[0]:
                 raise RuntimeError("Different number of entries in data and weights.")
         if dtype:
             dtype = np.dtype(dtype)
@@ -531,24 +677,126 @@ def calculate_frequencies(data, ndim, binnings, weights=None, dtype=None):
         else:
             dtype = weights.dtype
 
-    edges_and_mask = [binning.numpy_bins_with_mask for binning in binnings]
-    edges = [em[0] for em in edges_and_mask]
-    masks = [em[1] for em in edges_and_mask]
+    if data is None or not length:
+        return None, None, 0
+
+    if workers and workers > 1 and length > 1:
+        # Each thread works on its own part with private arrays
+        def calculate_part(part):
+            return calculate_frequencies([column[part] for column in data], ndim, binnings,
+                                         dtype=dtype, chunk_size=chunk_size, columns=True,
+                                         weights=(None if weights is None else weights[part]))
+        parts = list(_iter_chunks(length, -(-length // workers)))
+        results = parallel_map(calculate_part, parts, workers=workers)
+        frequencies = sum(result[0] for result in results)
+        errors2 = None if weights is None else sum(result[1] for result in results)
+        missing = sum(result[2] for result in results)
+        return frequencies, errors2, missing
+
+    shape = tuple(binning.bin_count for binning in binnings)
+    counts = None
+    errors2 = None
+    for chunk in _iter_chunks(length, chunk_size or DEFAULT_CHUNK_SIZE):
+        chunk_counts, chunk_errors2 = _calculate_chunk_frequencies(
+            [column[chunk] for column in data], binnings,
+            (None if weights is None else weights[chunk]))
+        if counts is None:
+            counts, errors2 = chunk_counts, chunk_errors2
+        else:
+            counts += chunk_counts
+            if errors2 is not None:
+                errors2 += chunk_errors2
+
+    # Slot 0 contains all rows outside the bins
+    missing = counts[0]
+    frequencies = counts[1:].reshape(shape).astype(dtype, copy=False)
+    if errors2 is not None:
+        errors2 = errors2[1:].reshape(shape).astype(dtype)
+    return frequencies, errors2, missing
+
+
+def _calculate_chunk_frequencies(columns, binnings, weights):
+    """Get frequencies and bin errors from one chunk of rows.
+
+    Returns
+    -------
+    counts: np.ndarray
+        Flat frequencies, prepended by the missing slot.
+    errors2: np.ndarray or None
+        Flat errors2 in the same layout, None without weights.
+    """
+    flat = np.zeros(columns[0].shape[0], dtype=np.intp)
+    inside = np.ones(columns[0].shape[0], dtype=bool)
+    for column, binning in zip(columns, binnings):
+        indices = binning._find_bin_indices(column)
+        inside &= (indices >= 0) & (indices < binning.bin_count)
+        # Row-major order (as np.ravel_multi_index), values outside are thrown away below
+        flat *= binning.bin_count
+        flat += indices
+    slots = np.where(inside, flat + 1, 0)
+    slot_count = 1 + int(np.prod([binning.bin_count for binning in binnings]))
+    return _bincount_frequencies(slots, slot_count, weights=weights)
+
+
+def _prepare_columns(data, ndim=None, columns=False):
+    """Split the data into 1D arrays, one for each axis.
 
-    ixgrid = np.ix_(*masks)  # Indexer to select parts we want
+    No data are copied (if possible), the columns of 2D arrays
+    are (strided) views.
 
-    # TODO: Right edges are not taken into account because they fall into inf bin
+    Parameters
+    ----------
+    data: array_like or Iterable[array_like]
+        2D array-like with a row for each entry,
+        a structured array or a pandas DataFrame (each field / column is one axis),
+        or (if columns=True) a sequence of 1D arrays / 2D array of shape (ndim, count).
+    ndim: Optional[int]
+        Expected number of columns.
+    columns: bool
+        Whether the data are transposed (in columns, instead of rows).
 
-    if data.shape[0]:
-        frequencies, _ = np.histogramdd(data, edges, weights=weights)
-        frequencies = frequencies.astype(dtype)      # Automatically copy
-        frequencies = frequencies[ixgrid]
-        missing = weights.sum() - frequencies.sum()
-        err_freq, _ = np.histogramdd(data, edges, weights=weights ** 2)
-        errors2 = err_freq[ixgrid].astype(dtype)  # Automatically copy
+    Returns
+    -------
+    list[np.ndarray]
+    """
+    if type(data).__name__ == "DataFrame":
+        data = [data[column].values for column in data.columns]
+    elif isinstance(data, np.ndarray) and data.dtype.names:
+        data = [data[name] for name in data.dtype.names]
+    elif columns:
+        data = [np.asarray(column) for column in data]
     else:
-        frequencies = None
-        missing = 0
-        errors2 = None
+        data = np.asarray(data)
+        if data.ndim != 2:
+            raise RuntimeError("Array must have shape (n, d)")
+        data = [data[:, i] for i in range(data.shape[1])]
+    if any(column.ndim != 1 for column in data):
+        raise RuntimeError("Columns must be 1D arrays.")
+    if len(set(column.shape[0] for column in data)) > 1:
+        raise RuntimeError("All columns must have the same length.")
+    if ndim is not None and len(data) != ndim:
+        raise RuntimeError("Dimension mismatch: {0}!={1}".format(ndim, len(data)))
+    return data
 
-    return frequencies, errors2, missing
+
+def _drop_nan_rows(columns, weights=None):
+    """Remove rows that contain NaN in any of the columns.
+
+    The columns are copied only if there is something to remove.
+
+    Returns
+    -------
+    columns: list[np.ndarray]
+    weights: Optional[np.ndarray]
+    """
+    nans = None
+    for column in columns:
+        if column.dtype.kind in "fc":
+            column_nans = np.isnan(column)
+            nans = column_nans if nans is None else (nans | column_nans)
+    if nans is None or not nans.any():
+        return columns, weights
+    columns = [column[~nans] for column in columns]
+    if weights is not None:
+        weights = np.asarray(weights)[~nans]
+    return columns, weights
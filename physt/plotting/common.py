@@ -25,7 +25,7 @@ def get_data(histogram, density=False, cumulative=False, flatten=False):
     """
     if density:
         if cumulative:
-            data = (histogram / histogram.total).cumulative_frequencies
+            data = histogram.cumulative_frequencies / histogram.total
         else:
             data = histogram.densities
     else:
@@ -0,0 +1,309 @@
+"""Mergeable sketch for approximate (weighted) quantiles of streamed data."""
+from __future__ import absolute_import, division
+
+import numpy as np
+
+from .util import parallel_map
+
+
+DEFAULT_CAPACITY = 1000
+
+
+class QuantileSketch(object):
+    """Mergeable summary of a (weighted) one-dimensional distribution.
+
+    The sketch can be updated chunk by chunk (from a file, a database cursor, ...)
+    and sketches of different parts of the data (built by different workers,
+    dask blocks, ...) can be merged. Quantiles are then estimated from the summary
+    that never holds much more than `capacity` points per level.
+
+    The points are kept in levels of sorted (value, weight) pairs. When a level
+    overflows `capacity`, it is compacted into `capacity` points placed at equally
+    spaced cumulative weights and pushed one level up (in the spirit of KLL sketches,
+    but deterministic and weighted).
+
+    Rank-error bound
+    ----------------
+    Let R(x) be the total weight of the data <= x and R'(x) the same estimated
+    from the sketch. Compacting points of total weight w changes R' by at most
+    w / (2 * capacity) and merging adds the errors of both summaries. The sketch
+    keeps the accumulated bound in `rank_error`, so that for all x:
+
+        |R'(x) - R(x)| <= rank_error <= levels * total / (2 * capacity)
+
+    (each unit of weight is compacted at most once per level). With fixed-size chunks,
+    the number of levels grows as log2 of the number of chunks. Value returned by `quantile(q)`
+    is an exact quantile q' of the data with |q' - q| <= relative_rank_error.
+    Until the first compaction, the sketch is exact.
+
+    Attributes
+    ----------
+    capacity : int
+        Maximum number of points in one level.
+    total : float
+        Total weight of the data seen.
+    """
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise RuntimeError("Capacity of the sketch must be positive.")
+        self.capacity = int(capacity)
+        self.total = 0.0
+        self._min = np.inf
+        self._max = -np.inf
+        self._levels = []    # (values, weights, error) or None
+
+    @property
+    def min(self):
+        """Minimum value seen (exact)."""
+        return self._min if self.total else None
+
+    @property
+    def max(self):
+        """Maximum value seen (exact)."""
+        return self._max if self.total else None
+
+    @property
+    def size(self):
+        """Number of points held in the sketch.
+
+        Returns
+        -------
+        int
+        """
+        return sum(level[0].shape[0] for level in self._levels if level is not None)
+
+    @property
+    def rank_error(self):
+        """Upper bound of the absolute error of estimated ranks (in units of weight).
+
+        Returns
+        -------
+        float
+        """
+        return sum(level[2] for level in self._levels if level is not None)
+
+    @property
+    def relative_rank_error(self):
+        """Upper bound of the error of estimated quantiles (as fraction of total weight).
+
+        Returns
+        -------
+        float
+        """
+        return self.rank_error / self.total if self.total else 0.0
+
+    def update(self, values, weights=None, dropna=True, workers=None):
+        """Add a chunk of data to the sketch.
+
+        Parameters
+        ----------
+        values: array_like
+            Values to add.
+        weights: Optional[array_like]
+            Non-negative weights of the values.
+        dropna: Optional[bool]
+            If true (default), NaN's are ignored, otherwise they raise an error.
+        workers: Optional[int]
+            If more than 1, the chunk is split and sketched in parallel threads.
+
+        Returns
+        -------
+        QuantileSketch
+            self (to allow chaining)
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        if weights is not None:
+            weights = np.asarray(weights, dtype=float).ravel()
+            if weights.shape != values.shape:
+                raise RuntimeError("Weights must have the same shape as values.")
+            if np.any(weights < 0):
+                raise RuntimeError("Weights must not be negative.")
+        if workers and workers > 1 and values.shape[0] > 1:
+            step = -(-values.shape[0] // workers)
+
+            def sketch_part(start):
+                return QuantileSketch(self.capacity).update(
+                    values[start:start + step],
+                    None if weights is None else weights[start:start + step],
+                    dropna=dropna)
+
+            return self.merge(*parallel_map(sketch_part, range(0, values.shape[0], step),
+                                            workers=workers))
+
+        mask = np.isnan(values)
+        if mask.any():
+            if not dropna:
+                raise RuntimeError("Cannot add NaN's to the sketch.")
+            values = values[~mask]
+            weights = None if weights is None else weights[~mask]
+        if weights is not None:
+            values, weights = values[weights > 0], weights[weights > 0]
+        if not values.shape[0]:
+            return self
+
+        # Identical values are stored as a single point
+        values, inverse = np.unique(values, return_inverse=True)
+        weights = np.bincount(inverse.ravel(), weights=weights).astype(float)
+
+        self.total += weights.sum()
+        self._min = min(self._min, values[0])
+        self._max = max(self._max, values[-1])
+        self._insert(values, weights, 0.0, 0)
+        return self
+
+    def merge(self, *others):
+        """Add other sketches to this one (in place).
+
+        Parameters
+        ----------
+        others: QuantileSketch
+
+        Returns
+        -------
+        QuantileSketch
+            self (to allow chaining)
+        """
+        for other in others:
+            if other is self:
+                other = other.copy()
+            self.total += other.total
+            self._min = min(self._min, other._min)
+            self._max = max(self._max, other._max)
+            for level, content in enumerate(other._levels):
+                if content is not None:
+                    self._insert(content[0], content[1], content[2], level)
+        return self
+
+    def copy(self):
+        """An independent copy of the sketch.
+
+        Returns
+        -------
+        QuantileSketch
+        """
+        result = QuantileSketch(self.capacity)
+        result.total = self.total
+        result._min = self._min
+        result._max = self._max
+        result._levels = list(self._levels)    # Level arrays are never modified in place
+        return result
+
+    def __add__(self, other):
+        return self.copy().merge(other)
+
+    def __radd__(self, other):
+        # Allows using sum() on a collection of sketches
+        if other == 0:
+            return self.copy()
+        return other + self
+
+    def __iadd__(self, other):
+        return self.merge(other)
+
+    def _insert(self, values, weights, error, level):
+        """Put sorted points into a level, compacting them upwards if necessary."""
+        while True:
+            while level >= len(self._levels):
+                self._levels.append(None)
+            current = self._levels[level]
+            if current is not None:
+                self._levels[level] = None
+                values, weights = _merge_points(current[0], current[1], values, weights)
+                error += current[2]
+            if values.shape[0] > self.capacity:
+                values, weights, compaction_error = _compact(values, weights, self.capacity)
+                error += compaction_error
+                level += 1
+            else:
+                self._levels[level] = (values, weights, error)
+                return
+
+    def _points(self):
+        """All points of the sketch, sorted by value.
+
+        Returns
+        -------
+        values: np.ndarray
+        weights: np.ndarray
+        """
+        levels = [level for level in self._levels if level is not None]
+        values = np.concatenate([level[0] for level in levels])
+        weights = np.concatenate([level[1] for level in levels])
+        order = np.argsort(values, kind="mergesort")
+        return values[order], weights[order]
+
+    def quantile(self, q):
+        """Estimate quantiles of the data.
+
+        Parameters
+        ----------
+        q: float or array_like
+            Quantile(s) between 0 and 1. Extreme values give exact minimum and maximum.
+
+        Returns
+        -------
+        float or np.ndarray
+            The lowest value(s) with estimated cumulative weight >= q * total.
+        """
+        if not self.total:
+            raise RuntimeError("Cannot estimate quantiles from an empty sketch.")
+        q = np.asarray(q, dtype=float)
+        if np.any((q < 0) | (q > 1)):
+            raise RuntimeError("Quantiles must be between 0 and 1.")
+        values, weights = self._points()
+        cumulative = np.cumsum(weights)
+        indices = np.searchsorted(cumulative, q * cumulative[-1], side="left")
+        result = values[np.minimum(indices, values.shape[0] - 1)]
+        result = np.where(q <= 0, self._min, np.where(q >= 1, self._max, result))
+        return result[()] if result.ndim == 0 else result
+
+    def __repr__(self):
+        return "{0}(capacity={1}, total={2}, rank_error={3})".format(
+            self.__class__.__name__, self.capacity, self.total, self.rank_error)
+
+
+def _merge_points(values1, weights1, values2, weights2):
+    """Merge two sorted collections of points."""
+    values = np.concatenate([values1, values2])
+    weights = np.concatenate([weights1, weights2])
+    order = np.argsort(values, kind="mergesort")
+    return values[order], weights[order]
+
+
+def _compact(values, weights, count):
+    """Replace sorted points by `count` points at equally spaced cumulative weights.
+
+    Returns
+    -------
+    values: np.ndarray
+    weights: np.ndarray
+    error: float
+        Maximum change of any cumulative weight.
+    """
+    cumulative = np.cumsum(weights)
+    step = cumulative[-1] / count
+    indices = np.searchsorted(cumulative, (np.arange(count) + 0.5) * step, side="left")
+    indices, counts = np.unique(np.minimum(indices, values.shape[0] - 1), return_counts=True)
+    return values[indices], counts * step, step / 2
+
+
+def quantile_sketch(data, weights=None, capacity=DEFAULT_CAPACITY, **kwargs):
+    """Build a quantile sketch from data.
+
+    Parameters
+    ----------
+    data: array_like
+    weights: Optional[array_like]
+    capacity: Optional[int]
+    dropna: Optional[bool]
+    workers: Optional[int]
+
+    Returns
+    -------
+    QuantileSketch
+
+    See Also
+    --------
+    physt.binnings.quantile_binning
+    """
+    return QuantileSketch(capacity).update(data, weights, **kwargs)
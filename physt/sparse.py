@@ -0,0 +1,614 @@
+"""Sparse multi-dimensional histograms.
+
+Only the occupied bins are stored, which makes it possible to have
+histograms with many dimensions (and huge total numbers of bins)
+as long as the data fill only a small part of them.
+"""
+from __future__ import absolute_import, division
+
+import numpy as np
+
+from .bin_utils import bin_map_to_indices
+from .binnings import GAP_INDEX
+from .histogram_base import HistogramBase
+from .histogram_nd import _prepare_columns, _drop_nan_rows
+
+
+class SparseHistogramND(HistogramBase):
+    """Multi-dimensional histogram storing only the occupied bins.
+
+    The contents are kept in the coordinate (COO) format: a sorted array
+    of unique flat indices (in the row-major order of the dense frequency
+    array) and arrays of frequencies and errors2 for these bins.
+    The binnings are the same as in the dense HistogramND.
+
+    Operations (fill, projection, addition, rebinning) work only with
+    the occupied bins, the dense array is created only on explicit
+    request (see to_dense).
+
+    Attributes
+    ----------
+    _indices : np.ndarray
+        Sorted unique flat indices of the occupied bins
+    _frequencies : np.ndarray
+        Bin contents of the occupied bins
+    _errors2 : np.ndarray
+        Square errors of the occupied bins
+    _shape : tuple[int]
+        Shape which the flat indices refer to
+    """
+
+    def __init__(self, binnings, indices=None, frequencies=None, errors2=None, **kwargs):
+        """Constructor
+
+        Parameters
+        ----------
+        binnings: Iterable[physt.binnings.BinningBase or array_like]
+            The binnings for all axes.
+        indices: Optional[array_like]
+            Flat indices of the occupied bins (shape (count,)) or
+            the indices along each axis (shape (count, ndim)).
+            Repeated indices are allowed, their contents are added.
+        frequencies: Optional[array_like]
+            Contents of the bins with the indices.
+        errors2: Optional[array_like]
+            Quadratic errors of the bins with the indices. If not set, defaults to frequencies.
+        dtype: Optional[type]
+        keep_missed: bool
+        missed: int or float (dtype?)
+        underflow: Optional[int or float]
+            Only for 1D histograms (together with overflow and inner_missed)
+        overflow: Optional[int or float]
+        inner_missed: Optional[int or float]
+        name: Optional[str]
+        axis_names: Optional[Iterable[str]]
+        """
+        from .binnings import as_binning
+        kwargs.pop("dimension", None)       # Not necessary (from_dict)
+        missed = kwargs.pop("missed", 0)
+        self._binnings = [as_binning(binning) for binning in binnings]
+        self._shape = self.shape
+        _check_shape(self._shape)
+
+        dtype = kwargs.pop("dtype", None)
+        if indices is None:
+            if frequencies is not None:
+                raise RuntimeError("Frequencies specified without indices.")
+            self._indices = np.zeros(0, dtype=np.int64)
+            self._frequencies = np.zeros(0, dtype=dtype or np.int64)
+        else:
+            indices = np.asarray(indices, dtype=np.int64)
+            if indices.ndim == 2:
+                if indices.shape[1] != self.ndim:
+                    raise RuntimeError("Indices must have {0} columns.".format(self.ndim))
+                indices = np.ravel_multi_index(tuple(indices.T), self._shape)
+            elif indices.ndim != 1:
+                raise RuntimeError("Indices must be 1D or 2D array.")
+            elif np.any((indices < 0) | (indices >= max(self.bin_count, 1))):
+                raise RuntimeError("Indices outside the bins.")
+            if frequencies is None:
+                frequencies = np.ones(indices.shape[0], dtype=dtype or np.int64)
+            elif dtype is not None:
+                frequencies = np.asarray(frequencies, dtype=dtype)
+            else:
+                frequencies = np.asarray(frequencies)
+                if np.issubdtype(frequencies.dtype, np.integer):
+                    frequencies = frequencies.astype(np.int64)
+                elif np.issubdtype(frequencies.dtype, np.floating):
+                    frequencies = frequencies.astype(np.float64)
+                else:
+                    raise RuntimeError("Frequencies of type {0} not understood"
+                                       .format(frequencies.dtype))
+            if frequencies.shape != indices.shape:
+                raise RuntimeError("Frequencies must have the same length as indices.")
+            if np.any(frequencies < 0):
+                raise RuntimeError("Cannot have negative frequencies.")
+            self._indices = indices
+            self._frequencies = frequencies
+        self._dtype = self._frequencies.dtype
+
+        if errors2 is None:
+            self._errors2 = self._frequencies.copy()
+        else:
+            self._errors2 = np.asarray(errors2, dtype=self.dtype)
+        if np.any(self._errors2 < 0):
+            raise RuntimeError("Cannot have negative squared errors.")
+        if self._errors2.shape != self._frequencies.shape:
+            raise RuntimeError("Errors must have same dimension as frequencies.")
+        self._coalesce()
+
+        self.keep_missed = kwargs.pop("keep_missed", True)
+        missed = np.ravel(missed)
+        if self.ndim == 1 and missed.shape[0] == 3:
+            self._missed = missed.astype(self.dtype)     # Layout of Histogram1D (from_dict)
+        elif self.ndim == 1:
+            # Same layout as in Histogram1D: underflow, overflow, inner missed
+            self._missed = np.array([kwargs.pop("underflow", 0), kwargs.pop("overflow", 0),
+                                     kwargs.pop("inner_missed", 0) + missed.sum()],
+                                    dtype=self.dtype)
+        else:
+            self._missed = np.array([missed.sum()], dtype=self.dtype)
+
+        if "axis_names" not in kwargs:
+            kwargs["axis_names"] = ["axis{0}".format(i) for i in range(self.ndim)]
+        self._meta_data = kwargs.copy()
+        if len(self.axis_names) != self.ndim:
+            raise RuntimeError("The length of axis names must be equal to histogram dimension.")
+
+    # Not supported yet
+    _stats = None
+
+    @property
+    def bins(self):
+        """Matrix of bins.
+
+        Returns
+        -------
+        list[np.ndarray]
+        """
+        return [binning.bins for binning in self._binnings]
+
+    @property
+    def binnings(self):
+        """The binnings.
+
+        Returns
+        -------
+        list[physt.binnings.BinningBase]
+        """
+        return self._binnings
+
+    @property
+    def numpy_bins(self):
+        """Numpy-like bins (if available)
+
+        Returns
+        -------
+        list[np.ndarray]
+        """
+        return [binning.numpy_bins for binning in self._binnings]
+
+    @property
+    def occupied_count(self):
+        """Number of stored (occupied) bins.
+
+        Returns
+        -------
+        int
+        """
+        return self._indices.shape[0]
+
+    @property
+    def flat_indices(self):
+        """Indices of the occupied bins in the flattened dense array.
+
+        Returns
+        -------
+        np.ndarray
+            Sorted integer array of shape (occupied_count,)
+        """
+        return self._indices
+
+    @property
+    def indices(self):
+        """Indices of the occupied bins along each axis.
+
+        Returns
+        -------
+        np.ndarray
+            Integer array of shape (occupied_count, ndim)
+        """
+        return np.array(np.unravel_index(self._indices, self._shape), dtype=np.int64).T.reshape(-1, self.ndim)
+
+    @property
+    def frequencies(self):
+        """Contents of the occupied bins (in the order of indices).
+
+        Returns
+        -------
+        np.ndarray
+
+        See also
+        --------
+        to_dense
+        """
+        return self._frequencies
+
+    @property
+    def errors2(self):
+        """Squares of the errors of the occupied bins (in the order of indices).
+
+        Returns
+        -------
+        np.ndarray
+        """
+        return self._errors2
+
+    @property
+    def densities(self):
+        """Frequencies of the occupied bins normalized by their sizes.
+
+        Returns
+        -------
+        np.ndarray
+        """
+        # Indices only change in methods, the sizes can be cached
+        return self._frequencies / self._get_cached("occupied_sizes", self._calculate_occupied_sizes)
+
+    def _calculate_occupied_sizes(self):
+        sizes = np.ones(self.occupied_count)
+        for axis, axis_indices in enumerate(self.indices.T):
+            binning = self._binnings[axis]
+            sizes *= (binning.bins[:, 1] - binning.bins[:, 0])[axis_indices]
+        return sizes
+
+    @property
+    def total_size(self):
+        """The total size of the bin space.
+
+        Returns
+        -------
+        float
+        """
+        return np.prod([np.sum(binning.bins[:, 1] - binning.bins[:, 0])
+                        for binning in self._binnings])
+
+    def fill(self, value, weight=1, **kwargs):
+        """Add a value.
+
+        Returns
+        -------
+        tuple or None
+            Indices of the bin or None if the value missed the bins.
+        """
+        flat_index = self._fill_columns([np.asarray([value_i]) for value_i in value],
+                                        weights=np.asarray([weight]))[0]
+        if flat_index < 0:
+            return None
+        else:
+            return tuple(int(i) for i in np.unravel_index(flat_index, self._shape))
+
+    def fill_n(self, values, weights=None, dropna=True, columns=False):
+        """Add more values at once.
+
+        Parameters
+        ----------
+        values: array_like
+            Values to add (see HistogramND.fill_n for accepted layouts).
+        weights: Optional[array_like]
+        dropna: bool
+            Whether to remove NaN values.
+        columns: bool
+            Signal that the data are in columns (e.g. a list of 1D arrays).
+        """
+        values = _prepare_columns(values, ndim=self.ndim, columns=columns)
+        if weights is not None:
+            weights = np.asarray(weights)
+            if weights.shape != values[0].shape:
+                raise RuntimeError("Weights must have the same length as values.")
+        if dropna:
+            values, weights = _drop_nan_rows(values, weights)
+        self._fill_columns(values, weights)
+
+    def _fill_columns(self, columns, weights=None):
+        """Add values in prepared columns.
+
+        Returns
+        -------
+        np.ndarray
+            Flat index of the bin for each value, -1 if the value missed.
+        """
+        if weights is not None:
+            self._coerce_dtype(weights.dtype)
+        for i, binning in enumerate(self._binnings):
+            if binning.is_adaptive() and columns[i].shape[0]:
+                bin_map = binning.force_bin_existence(columns[i])
+                self._reshape_data(binning.bin_count, bin_map, i)
+
+        flat = np.zeros(columns[0].shape[0], dtype=np.int64)
+        inside = np.ones(columns[0].shape[0], dtype=bool)
+        for column, binning in zip(columns, self._binnings):
+            axis_indices = binning._find_bin_indices(column)
+            inside &= (axis_indices >= 0) & (axis_indices < binning.bin_count)
+            flat *= binning.bin_count
+            flat += axis_indices
+        flat[~inside] = -1
+
+        if self.ndim == 1:
+            # Underflow, overflow or gap (as in Histogram1D)
+            missed_indices = axis_indices[~inside]
+            missed_slots = np.where(missed_indices == GAP_INDEX, 2, (missed_indices >= 0).astype(int))
+        else:
+            missed_slots = np.zeros(columns[0].shape[0] - int(inside.sum()), dtype=int)
+        missed = np.bincount(missed_slots, weights=(None if weights is None else weights[~inside]),
+                             minlength=self._missed.shape[0])
+        if weights is None:
+            frequencies = np.ones(int(inside.sum()), dtype=self.dtype)
+            errors2 = frequencies
+        else:
+            frequencies = weights[inside].astype(self.dtype)
+            errors2 = (weights[inside] ** 2).astype(self.dtype)
+        self._missed += missed.astype(self.dtype)
+        self._indices = np.concatenate([self._indices, flat[inside]])
+        self._frequencies = np.concatenate([self._frequencies, frequencies])
+        self._errors2 = np.concatenate([self._errors2, errors2])
+        self._coalesce()
+        return flat
+
+    def _coalesce(self):
+        """Sort the occupied bins and add contents with the same index."""
+        self._indices, (self._frequencies, self._errors2) = _coalesce(
+            self._indices, self._frequencies, self._errors2)
+        self._modified()
+
+    def _reshape_data(self, new_size, bin_map, axis=0):
+        """Update the indices to match new binning schema.
+
+        Parameters
+        ----------
+        new_size: int
+        bin_map: Iterable[(old, new)] or np.ndarray or int or None
+            (see HistogramBase._reshape_data)
+        axis: int
+        """
+        self._binning_cache = None
+        if bin_map is None:
+            return
+        new_shape = list(self._shape)
+        new_shape[axis] = new_size
+        new_shape = tuple(new_shape)
+        _check_shape(new_shape)
+        multi_index = list(np.unravel_index(self._indices, self._shape))
+        if isinstance(bin_map, int):
+            multi_index[axis] = multi_index[axis] + bin_map
+        else:
+            old_indices, new_indices = bin_map_to_indices(bin_map)
+            lookup = np.full(self._shape[axis], -1, dtype=np.int64)
+            lookup[old_indices] = new_indices
+            multi_index[axis] = lookup[multi_index[axis]]
+            kept = multi_index[axis] >= 0      # Bins without new counterpart are dropped
+            if not kept.all():
+                multi_index = [axis_indices[kept] for axis_indices in multi_index]
+                self._frequencies = self._frequencies[kept]
+                self._errors2 = self._errors2[kept]
+        self._shape = new_shape
+        self._indices = np.ravel_multi_index(tuple(multi_index), new_shape).astype(np.int64)
+        self._coalesce()
+
+    def _get_axis_frequencies(self, axis):
+        axis_indices = np.unravel_index(self._indices, self._shape)[axis]
+        return np.bincount(axis_indices, weights=self._frequencies,
+                           minlength=self._shape[axis]).astype(self.dtype)
+
+    def projection(self, *axes, **kwargs):
+        """Reduce dimensionality by summing along axis/axes.
+
+        Only the occupied bins are summed, the result is also sparse.
+
+        Parameters
+        ----------
+        axes: Iterable[int or str]
+            List of axes for the new histogram. Could be either
+            numbers or names. Must contain at least one axis.
+        name: Optional[str]
+            Name for the projected histogram (default: same)
+
+        Returns
+        -------
+        SparseHistogramND
+        """
+        axes, _ = self._get_projection_axes(*axes)
+        name = kwargs.pop("name", self.name)
+        multi_index = np.unravel_index(self._indices, self._shape)
+        shape = tuple(self._shape[axis] for axis in axes)
+        indices = np.ravel_multi_index(tuple(multi_index[axis] for axis in axes), shape)
+        return SparseHistogramND(binnings=[self._binnings[axis].copy() for axis in axes],
+                                 indices=indices, frequencies=self._frequencies,
+                                 errors2=self._errors2, dtype=self.dtype, name=name,
+                                 axis_names=[self.axis_names[axis] for axis in axes])
+
+    def to_dense(self):
+        """Convert to a histogram with all bins stored.
+
+        Returns
+        -------
+        HistogramND or Histogram2D or Histogram1D
+        """
+        from .histogram1d import Histogram1D
+        from .histogram_nd import HistogramND, Histogram2D
+        frequencies = np.zeros(self._shape, dtype=self.dtype)
+        errors2 = np.zeros(self._shape, dtype=self.dtype)
+        frequencies.flat[self._indices] = self._frequencies
+        errors2.flat[self._indices] = self._errors2
+        binnings = [binning.copy() for binning in self._binnings]
+        if self.ndim == 1:
+            return Histogram1D(binning=binnings[0], frequencies=frequencies, errors2=errors2,
+                               underflow=self._missed[0], overflow=self._missed[1],
+                               inner_missed=self._missed[2], keep_missed=self.keep_missed,
+                               name=self.name, axis_name=self.axis_names[0])
+        elif self.ndim == 2:
+            return Histogram2D(binnings=binnings, frequencies=frequencies, errors2=errors2,
+                               missed=self.missed, name=self.name, axis_names=list(self.axis_names))
+        else:
+            return HistogramND(dimension=self.ndim, binnings=binnings, frequencies=frequencies,
+                               errors2=errors2, missed=self.missed, name=self.name,
+                               axis_names=list(self.axis_names))
+
+    @classmethod
+    def from_dense(cls, histogram):
+        """Create a sparse histogram from a dense one.
+
+        Parameters
+        ----------
+        histogram: HistogramND or Histogram1D
+
+        Returns
+        -------
+        SparseHistogramND
+        """
+        frequencies = histogram.frequencies.ravel()
+        errors2 = histogram._get_errors2().ravel()
+        indices = np.flatnonzero((frequencies != 0) | (errors2 != 0))
+        return cls(binnings=[binning.copy() for binning in histogram._binnings],
+                   indices=indices, frequencies=frequencies[indices], errors2=errors2[indices],
+                   dtype=histogram.dtype, missed=histogram._missed,
+                   keep_missed=histogram.keep_missed, **histogram.meta_data)
+
+    def copy(self, include_frequencies=True):
+        a_copy = HistogramBase.copy(self, include_frequencies=include_frequencies)
+        a_copy._shape = self._shape
+        if include_frequencies:
+            a_copy._indices = self._indices.copy()
+        else:
+            a_copy._indices = np.zeros(0, dtype=np.int64)
+            a_copy._frequencies = np.zeros(0, dtype=self.dtype)
+            a_copy._errors2 = np.zeros(0, dtype=self.dtype)
+        return a_copy
+
+    copy.__doc__ = HistogramBase.copy.__doc__
+
+    def __iadd__(self, other):
+        if np.isscalar(other):
+            raise RuntimeError("Cannot add constant to histograms.")
+        if other.ndim != self.ndim:
+            raise RuntimeError("Cannot add histograms with different dimensions.")
+        if not self.has_same_bins(other):
+            raise RuntimeError("Incompatible binning")
+        if not isinstance(other, SparseHistogramND):
+            other = SparseHistogramND.from_dense(other)
+        self._coerce_dtype(other.dtype)
+        self._indices = np.concatenate([self._indices, other._indices])
+        self._frequencies = np.concatenate([self._frequencies, other._frequencies.astype(self.dtype)])
+        self._errors2 = np.concatenate([self._errors2, other._errors2.astype(self.dtype)])
+        self._coalesce()
+        self._missed += other._missed.astype(self.dtype)
+        return self
+
+    def __eq__(self, other):
+        if not isinstance(other, self.__class__):
+            return False
+        if not self.has_same_bins(other):
+            return False
+        if not np.array_equal(self._indices, other._indices):
+            return False
+        if not np.allclose(self._frequencies, other._frequencies):
+            return False
+        if not np.allclose(self._errors2, other._errors2):
+            return False
+        if not other.missed == self.missed:
+            return False
+        if not other.name == self.name:
+            return False
+        if not other.axis_names == self.axis_names:
+            return False
+        return True
+
+    def _update_dict(self, a_dict):
+        a_dict["indices"] = self._indices.tolist()
+
+    @classmethod
+    def _from_dict_kwargs(cls, a_dict):
+        kwargs = super(SparseHistogramND, cls)._from_dict_kwargs(a_dict)
+        kwargs["indices"] = a_dict.get("indices")
+        return kwargs
+
+
+def sparse_histogram(data, bins=10, *args, **kwargs):
+    """Facade function to create sparse n-dimensional histograms.
+
+    Parameters
+    ----------
+    data : array_like
+        Container of all the values (see physt.histogramdd)
+    bins: Any
+    weights: array_like, optional
+    dropna: bool
+        whether to clear data from nan's before histogramming
+    name: str
+        name of the histogram
+    axis_names: Iterable[str]
+        names of the variable on x axis
+    adaptive:
+        whether the bins should be updated when new non-fitting value are filled
+    dtype: Optional[type]
+    dim: int
+        Dimension - necessary if you are creating an empty adaptive histogram
+    columns: bool
+        Whether the data are in columns (shape (dim, count) or a list of arrays).
+
+    Returns
+    -------
+    SparseHistogramND
+
+    See Also
+    --------
+    physt.histogramdd
+    """
+    from .binnings import calculate_bins_nd
+
+    adaptive = kwargs.pop("adaptive", False)
+    dropna = kwargs.pop("dropna", True)
+    name = kwargs.pop("name", None)
+    dim = kwargs.pop("dim", None)
+    axis_names = kwargs.pop("axis_names", None)
+    columns = kwargs.pop("columns", False)
+    weights = kwargs.pop("weights", None)
+    dtype = kwargs.pop("dtype", None)
+
+    if data is not None:
+        data = _prepare_columns(data, ndim=dim, columns=columns)
+        dim = len(data)
+        if dropna:
+            data, weights = _drop_nan_rows(data, weights)
+        check_nan = not dropna
+    else:
+        if dim is None:
+            raise RuntimeError("You have to specify either data or its dimension.")
+        data = [np.zeros(0)] * dim
+        check_nan = False
+
+    bin_schemas = calculate_bins_nd(data, bins, *args, check_nan=check_nan, adaptive=adaptive,
+                                    **kwargs)
+    if weights is not None:
+        weights = np.asarray(weights)
+        if dtype is None:
+            dtype = weights.dtype
+    meta_data = {"name": name}
+    if axis_names:
+        meta_data["axis_names"] = axis_names
+    histogram = SparseHistogramND(binnings=bin_schemas, dtype=dtype, **meta_data)
+    histogram._fill_columns(data, weights)
+    return histogram
+
+
+def _coalesce(indices, *arrays):
+    """Sort the indices and sum the arrays for repeated indices.
+
+    Parameters
+    ----------
+    indices: np.ndarray
+    arrays: np.ndarray
+        Values with the same length as indices.
+
+    Returns
+    -------
+    indices: np.ndarray
+        Sorted unique indices.
+    arrays: list[np.ndarray]
+        Summed values for each of the unique indices.
+    """
+    if indices.shape[0] == 0 or np.all(indices[1:] > indices[:-1]):
+        return indices, list(arrays)      # Already OK
+    order = np.argsort(indices, kind="mergesort")
+    indices = indices[order]
+    starts = np.flatnonzero(np.concatenate([[True], indices[1:] != indices[:-1]]))
+    return indices[starts], [np.add.reduceat(array[order], starts) for array in arrays]
+
+
+def _check_shape(shape):
+    """Check that flat indices for the shape fit in int64."""
+    total = 1
+    for size in shape:
+        total *= int(size)
+    if total >= np.iinfo(np.int64).max:
+        raise RuntimeError("Too many bins ({0}) for a sparse histogram.".format(total))
@@ -21,7 +21,7 @@ from functools import reduce
 import numpy as np
 
 from .histogram_nd import HistogramND
-from .histogram1d import Histogram1D
+from .histogram1d import Histogram1D, DEFAULT_CHUNK_SIZE, _iter_chunks, _has_nans
 from . import binnings, histogram_nd
 
 
@@ -32,7 +32,9 @@ class TransformedHistogramMixin(object):
 
     When implementing, you are required to provide tbe following:
     - `transform` method to convert rectangular (suggested to make it classmethod)
-    - `bin_sizes` property
+    - optionally `transform_columns` classmethod working on separate columns
+      (used when filling many values, by default it calls `transform`)
+    - `_calculate_bin_sizes` method (its result is cached as `bin_sizes`)
 
     In certain cases, you may want to have default axis names + projections.
     Look at PolarHistogram / SphericalHistogram / CylindricalHistogram as
@@ -56,6 +58,23 @@ class TransformedHistogramMixin(object):
         """
         raise NotImplementedError("TransformedHistogramMixin descendant must implement transform method.")
 
+    @classmethod
+    def transform_columns(cls, columns):
+        """Convert cartesian (general) coordinates in columns into internal ones.
+
+        Parameters
+        ----------
+        columns : list[np.ndarray]
+            One 1D array for each of the input coordinates.
+
+        Returns
+        -------
+        list[np.ndarray]
+            One 1D array for each axis of the histogram.
+        """
+        transformed = cls.transform(np.column_stack(columns))
+        return [transformed[:, i] for i in range(transformed.shape[1])]
+
     def find_bin(self, value, axis=None, transformed=False):
         """
 
@@ -70,17 +89,67 @@ class TransformedHistogramMixin(object):
             value = self.transform(value)
         return HistogramND.find_bin(self, value, axis=axis)
 
-    @property
-    def bin_sizes(self):
-        raise NotImplementedError("TransformedHistogramMixin descendant must implement bin_sizes property.")
+    def find_bin_n(self, values, flat=False, transformed=False):
+        """Vectorized variant of find_bin.
 
-    def fill(self, value, weight=1, transformed=False):
-        return HistogramND.fill(self, value=value, weight=weight, transformed=transformed)
+        Parameters
+        ----------
+        values : array_like
+            Values with dimensionality equal to histogram (one per row).
+        flat : bool
+            If true, return index into the flattened frequencies.
+        transformed : bool
+            If true, the values are already transformed and have same axes as the bins.
 
-    def fill_n(self, values, weights=None, dropna=True, transformed=False):
+        See also
+        --------
+        HistogramND.find_bin_n
+        """
         if not transformed:
             values = self.transform(values)
-        HistogramND.fill_n(self, values=values, weights=weights, dropna=dropna)
+        return HistogramND.find_bin_n(self, values, flat=flat)
+
+    def _calculate_bin_sizes(self):
+        raise NotImplementedError("TransformedHistogramMixin descendant must implement _calculate_bin_sizes.")
+
+    def fill(self, value, weight=1, transformed=False):
+        return HistogramND.fill(self, value=value, weight=weight, transformed=transformed)
+
+    def fill_n(self, values, weights=None, dropna=True, transformed=False, columns=False,
+               chunk_size=None):
+        """Add more values at once.
+
+        The values are transformed and binned in chunks, so that
+        no transformed copy of all the data is created.
+
+        Parameters
+        ----------
+        values: array_like
+            Array of shape (count, ndim) or (with columns=True) a list of 1D arrays.
+        weights: Optional[array_like]
+        dropna: bool
+        transformed: bool
+            If true, the values are already transformed and have same axes as the bins.
+        columns: bool
+        chunk_size: Optional[int]
+            Maximum number of values transformed at once (default: DEFAULT_CHUNK_SIZE).
+
+        See also
+        --------
+        HistogramND.fill_n
+        """
+        if transformed:
+            HistogramND.fill_n(self, values=values, weights=weights, dropna=dropna, columns=columns)
+            return
+        values = histogram_nd._prepare_columns(values, ndim=self.ndim, columns=columns)
+        if weights is not None:
+            weights = np.asarray(weights)
+            if weights.shape[0] != values[0].shape[0]:
+                raise RuntimeError("Different number of entries in data and weights.")
+        for chunk in _iter_chunks(values[0].shape[0], chunk_size or DEFAULT_CHUNK_SIZE):
+            HistogramND.fill_n(self, values=self.transform_columns([column[chunk] for column in values]),
+                               weights=(None if weights is None else weights[chunk]),
+                               dropna=dropna, columns=True)
 
     _projection_class_map = {}
 
@@ -105,8 +174,7 @@ class RadialHistogram(Histogram1D):
 
     This is a special case of a 1D histogram with transformed coordinates.
     """
-    @property
-    def bin_sizes(self):
+    def _calculate_bin_sizes(self):
         return (self.bin_right_edges ** 2 - self.bin_left_edges ** 2) * np.pi
 
     def fill_n(self, values, weights=None, dropna=True):
@@ -147,8 +215,7 @@ class PolarHistogram(TransformedHistogramMixin, HistogramND):
             kwargs.pop("dim")
         super(PolarHistogram, self).__init__(2, binnings=binnings, frequencies=frequencies, **kwargs)
 
-    @property
-    def bin_sizes(self):
+    def _calculate_bin_sizes(self):
         sizes = 0.5 * (self.get_bin_right_edges(0) ** 2 - self.get_bin_left_edges(0) ** 2)
         sizes = np.outer(sizes, self.get_bin_widths(1))
         return sizes
@@ -157,10 +224,12 @@ class PolarHistogram(TransformedHistogramMixin, HistogramND):
     def transform(cls, value):
         value = np.asarray(value, dtype=np.float64)
         assert value.shape[-1] == 2
-        result = np.empty_like(value)
-        result[...,0] = np.hypot(value[...,1], value[...,0])
-        result[...,1] = np.arctan2(value[...,1], value[...,0]) % (2 * np.pi)
-        return result
+        return np.stack(cls.transform_columns([value[..., 0], value[..., 1]]), axis=-1)
+
+    @classmethod
+    def transform_columns(cls, columns):
+        x, y = columns
+        return [np.hypot(y, x), np.arctan2(y, x) % (2 * np.pi)]
 
     _projection_class_map = {
         (0,) : RadialHistogram,
@@ -176,8 +245,7 @@ class DirectionalHistogram(TransformedHistogramMixin, HistogramND):
     - phi as azimuthal angle  (in the xy projection) in the (0, 2*pi) range
     """
 
-    @property
-    def bin_sizes(self):
+    def _calculate_bin_sizes(self):
         sizes1 = np.cos(self.get_bin_left_edges(0)) - np.cos(self.get_bin_right_edges(0))
         sizes2 = self.get_bin_widths(1)
         return reduce(np.multiply, np.ix_(sizes1, sizes2))
@@ -221,16 +289,18 @@ class SphericalHistogram(TransformedHistogramMixin, HistogramND):
     @classmethod
     def transform(cls, value):
         value = np.asarray(value, dtype=np.float64)
-        result = np.empty_like(value)
-        x, y, z = value.T
+        return np.stack(cls.transform_columns([value[..., 0], value[..., 1], value[..., 2]]),
+                        axis=-1)
+
+    @classmethod
+    def transform_columns(cls, columns):
+        x, y, z = columns
         xy = np.hypot(x, y)
-        result[..., 0] = np.hypot(xy, z)
-        result[..., 1] = np.arctan2(xy, z) % (2 * np.pi)
-        result[..., 2] = np.arctan2(y, x) % (2 * np.pi)
-        return result
+        return [np.hypot(xy, z),
+                np.arctan2(xy, z) % (2 * np.pi),
+                np.arctan2(y, x) % (2 * np.pi)]
 
-    @property
-    def bin_sizes(self):
+    def _calculate_bin_sizes(self):
         sizes1 = (self.get_bin_right_edges(0) ** 3 - self.get_bin_left_edges(0) ** 3) / 3
         sizes2 = np.cos(self.get_bin_left_edges(1)) - np.cos(self.get_bin_right_edges(1))
         sizes3 = self.get_bin_widths(2)
@@ -303,15 +373,17 @@ class CylindricalHistogram(TransformedHistogramMixin, HistogramND):
     @classmethod
     def transform(cls, value):
         value = np.asarray(value, dtype=np.float64)
-        result = np.empty_like(value)
-        x, y, z = value.T
-        result[..., 0] = np.hypot(x, y)                     # tho
-        result[..., 1] = np.arctan2(y, x) % (2 * np.pi)     # phi
-        result[..., 2] = z
-        return result
+        return np.stack(cls.transform_columns([value[..., 0], value[..., 1], value[..., 2]]),
+                        axis=-1)
 
-    @property
-    def bin_sizes(self):
+    @classmethod
+    def transform_columns(cls, columns):
+        x, y, z = columns
+        return [np.hypot(x, y),                        # rho
+                np.arctan2(y, x) % (2 * np.pi),        # phi
+                np.asarray(z, dtype=np.float64)]
+
+    def _calculate_bin_sizes(self):
         sizes1 = 0.5 * (self.get_bin_right_edges(0) ** 2 - self.get_bin_left_edges(0) ** 2)
         sizes2 = self.get_bin_widths(1)
         sizes3 = self.get_bin_widths(2)
@@ -332,18 +404,92 @@ class CylindricalHistogram(TransformedHistogramMixin, HistogramND):
 def _prepare_data(data, transformed, klass,  *args, **kwargs):
     """Transform data for binning.
 
+    Parameters
+    ----------
+    data : array_like or list[array_like]
+        Array of shape (count, ndim) or (with columns=True) a list of 1D arrays.
+    columns : Optional[bool]
+        Whether the data are in columns. The columns are transformed
+        and used without stacking.
+    dropna : Optional[bool]
+        Whether to remove rows with NaN's (the weights are filtered as well).
+    weights : Optional[array_like]
+
     Returns
     -------
-    np.ndarray
+    data : list[np.ndarray]
+        One array for each axis.
+    weights : np.ndarray or None
     """
     # TODO: Maybe include in the class itself?
-    data = np.asarray(data)
+    columns = kwargs.get("columns", False)
+    weights = kwargs.get("weights", None)
+    data = histogram_nd._prepare_columns(data, columns=columns)
     if not transformed:
-        data = klass.transform(data)
+        data = klass.transform_columns(data)
+    if weights is not None:
+        weights = np.asarray(weights)
     dropna = kwargs.get("dropna", False)
     if dropna:
-        data = data[~np.isnan(data).any(axis=1)]
-    return data
+        data, weights = histogram_nd._drop_nan_rows(data, weights)
+    return data, weights
+
+
+def _is_static_bins(bins):
+    """Whether the bins are given explicitly (i.e. do not depend on data)."""
+    if isinstance(bins, binnings.BinningBase):
+        return True
+    return not isinstance(bins, (str, int)) and np.ndim(bins) > 0
+
+
+def _create_histogram(klass, data, bins, transformed=False, *args, **kwargs):
+    """Bin the data into a new transformed histogram (common part of the facades).
+
+    If the bins in all axes are given explicitly, untransformed data are
+    transformed and binned chunk by chunk (see TransformedHistogramMixin.fill_n),
+    without a transformed copy of all the data. Otherwise, the whole transformed
+    data are necessary to find the bins.
+
+    Parameters
+    ----------
+    klass : type
+        Subclass of TransformedHistogramMixin.
+    data : array_like or list[array_like]
+    bins : list
+        Bin specification for each axis (see binnings.calculate_bins_nd)
+    transformed : bool
+    dropna : Optional[bool]
+    columns : Optional[bool]
+    weights : Optional[array_like]
+
+    Returns
+    -------
+    TransformedHistogramMixin
+    """
+    dropna = kwargs.pop("dropna", True)
+    columns = kwargs.pop("columns", False)
+    weights = kwargs.pop("weights", None)
+
+    if not transformed and all(_is_static_bins(item) for item in bins):
+        bin_schemas = binnings.calculate_bins_nd([np.zeros(0)] * len(bins), bins, *args,
+                                                 check_nan=False, **kwargs)
+        if not dropna:
+            # NaN's stay NaN's after transformation, check them as calculate_bins_nd does
+            data = histogram_nd._prepare_columns(data, columns=columns)
+            if any(_has_nans(column) for column in data):
+                raise RuntimeError("Cannot calculate bins in presence of NaN's.")
+            columns = True
+        histogram = klass(binnings=bin_schemas)
+        histogram.fill_n(data, weights=weights, dropna=dropna, columns=columns)
+        return histogram
+
+    data, weights = _prepare_data(data, transformed=transformed, klass=klass, dropna=dropna,
+                                  columns=columns, weights=weights)
+    bin_schemas = binnings.calculate_bins_nd(data, bins, *args, check_nan=not dropna, **kwargs)
+    frequencies, errors2, missed = histogram_nd.calculate_frequencies(data, ndim=len(bins),
+                                                                      binnings=bin_schemas,
+                                                                      weights=weights, columns=True)
+    return klass(binnings=bin_schemas, frequencies=frequencies, errors2=errors2, missed=missed)
 
 
 def polar_histogram(xdata, ydata, radial_bins="numpy", phi_bins=16,
@@ -356,9 +502,7 @@ def polar_histogram(xdata, ydata, radial_bins="numpy", phi_bins=16,
     phi_range : Optional[tuple]
     range
     """
-    dropna = kwargs.pop("dropna", True)
-    data = np.concatenate([xdata[:, np.newaxis], ydata[:, np.newaxis]], axis=1)
-    data = _prepare_data(data, transformed=transformed, klass=PolarHistogram, dropna=dropna)
+    data = [np.asarray(xdata), np.asarray(ydata)]
 
     if isinstance(phi_bins, int):
         phi_range = (0, 2 * np.pi)
@@ -369,13 +513,8 @@ def polar_histogram(xdata, ydata, radial_bins="numpy", phi_bins=16,
         phi_range = list(phi_range) + [phi_bins + 1]
         phi_bins = np.linspace(*phi_range)
 
-    bin_schemas = binnings.calculate_bins_nd(data, [radial_bins, phi_bins], *args,
-                                             check_nan=not dropna, **kwargs)
-    weights = kwargs.pop("weights", None)
-    frequencies, errors2, missed = histogram_nd.calculate_frequencies(data, ndim=2,
-                                                                      binnings=bin_schemas,
-                                                                      weights=weights)
-    return PolarHistogram(binnings=bin_schemas, frequencies=frequencies, errors2=errors2, missed=missed)
+    return _create_histogram(PolarHistogram, data, [radial_bins, phi_bins], transformed,
+                             *args, columns=True, **kwargs)
 
 
 def spherical_histogram(data=None, radial_bins="numpy", theta_bins=16, phi_bins=16, transformed=False, *args, **kwargs):
@@ -383,9 +522,6 @@ def spherical_histogram(data=None, radial_bins="numpy", theta_bins=16, phi_bins=
 
     """
 
-    dropna = kwargs.pop("dropna", True)
-    data = _prepare_data(data, transformed=transformed, klass=SphericalHistogram, dropna=dropna)
-
     if isinstance(theta_bins, int):
         theta_range = (0, np.pi)
         if "theta_range" in "kwargs":
@@ -404,13 +540,8 @@ def spherical_histogram(data=None, radial_bins="numpy", theta_bins=16, phi_bins=
         phi_range = list(phi_range) + [phi_bins + 1]
         phi_bins = np.linspace(*phi_range)
 
-    bin_schemas = binnings.calculate_bins_nd(data, [radial_bins, theta_bins, phi_bins], *args,
-                                             check_nan=not dropna, **kwargs)
-    weights = kwargs.pop("weights", None)
-    frequencies, errors2, missed = histogram_nd.calculate_frequencies(data, ndim=3,
-                                                                  binnings=bin_schemas,
-                                                                  weights=weights)
-    return SphericalHistogram(binnings=bin_schemas, frequencies=frequencies, errors2=errors2, missed=missed)
+    return _create_histogram(SphericalHistogram, data, [radial_bins, theta_bins, phi_bins],
+                             transformed, *args, **kwargs)
 
 
 def cylindrical_histogram(data=None, rho_bins="numpy", phi_bins=16, z_bins="numpy", transformed=False, *args, **kwargs):
@@ -418,9 +549,6 @@ def cylindrical_histogram(data=None, rho_bins="numpy", phi_bins=16, z_bins="nump
 
     """
 
-    dropna = kwargs.pop("dropna", True)
-    data = _prepare_data(data, transformed=transformed, klass=CylindricalHistogram, dropna=dropna)
-
     if isinstance(phi_bins, int):
         phi_range = (0, 2 * np.pi)
         if "phi_range" in "kwargs":
@@ -430,11 +558,5 @@ def cylindrical_histogram(data=None, rho_bins="numpy", phi_bins=16, z_bins="nump
         phi_range = list(phi_range) + [phi_bins + 1]
         phi_bins = np.linspace(*phi_range)
 
-    bin_schemas = binnings.calculate_bins_nd(data, [rho_bins, phi_bins, z_bins], *args,
-                                             check_nan=not dropna, **kwargs)
-    weights = kwargs.pop("weights", None)
-    frequencies, errors2, missed = histogram_nd.calculate_frequencies(data, ndim=3,
-                                                                  binnings=bin_schemas,
-                                                                  weights=weights)
-    return CylindricalHistogram(binnings=bin_schemas, frequencies=frequencies,
-                                errors2=errors2, missed=missed)
+    return _create_histogram(CylindricalHistogram, data, [rho_bins, phi_bins, z_bins],
+                             transformed, *args, **kwargs)
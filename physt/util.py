@@ -31,3 +31,28 @@ def find_subclass(base, name):
     elif len(class_candidates) > 1:
         raise RuntimeError("Multiple \"{0}\" subclasses of \"{1}\".".format(base.__name__, name))
     return class_candidates[0]
+
+
+def parallel_map(func, items, workers=None):
+    """Apply a function to all items, possibly in a pool of threads.
+
+    Parameters
+    ----------
+    func: Callable
+    items: Iterable
+    workers: Optional[int]
+        Number of threads to use. If None or 1, everything is
+        evaluated in the calling thread.
+
+    Returns
+    -------
+    list
+        Results in the same order as items.
+    """
+    if not workers or workers == 1:
+        return [func(item) for item in items]
+    elif workers < 1:
+        raise RuntimeError("Number of workers must be positive.")
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(func, items))
@@ -0,0 +1,38 @@
+"""Comparison of the threaded and process-based histogramming.
+
+Usage:
+    python benchmark_parallel.py [size] [workers]
+"""
+from __future__ import print_function
+import sys
+import time
+import numpy as np
+import physt
+from physt import special
+from physt.compat import process_pool
+
+
+def measure(title, func, *args, **kwargs):
+    start = time.time()
+    func(*args, **kwargs)
+    print("{0:<40} {1:8.3f} s".format(title, time.time() - start))
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 20000000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    data = np.random.normal(0, 1, (size, 3))
+
+    measure("h1", physt.h1, data[:, 0], 100)
+    measure("h1 ({0} threads)".format(workers), physt.h1, data[:, 0], 100, workers=workers)
+    measure("h1 ({0} processes)".format(workers), process_pool.h1, data[:, 0], 100,
+            processes=workers)
+
+    measure("h3", physt.h3, data, 20)
+    measure("h3 ({0} threads)".format(workers), physt.h3, data, 20, workers=workers)
+    measure("h3 ({0} processes)".format(workers), process_pool.h3, data, 20,
+            processes=workers)
+
+    measure("spherical", special.spherical_histogram, data)
+    measure("spherical ({0} processes)".format(workers), process_pool.spherical_histogram, data,
+            processes=workers)
@@ -14,6 +14,7 @@ import gc
 
 
 def make_big_h1(data):
+    # Now the values are processed in chunks (no additional full-size copy)
     # 0.3.26 The following creates 2 additional copies!!!
     # 0.3.25 The following creates 5 additional copies!!!
     h = physt.h1(data)
@@ -131,6 +131,65 @@ class TestAdaptiveND(object):
 #         h.fill_n([10])
 #         assert False
 
+class TestExponentialAdaptive(object):
+    def test_fill(self):
+        h = h1(None, "exponential", log_width=0.5, adaptive=True)
+        h.fill(5)
+        h.fill_n([0.02, 200, -1])
+        assert np.allclose(h.numpy_bins, 10 ** np.arange(-2, 2.6, 0.5))
+        assert np.array_equal(h.frequencies, [1, 0, 0, 0, 0, 1, 0, 0, 1])
+        assert h.underflow == 1
+
+
+class TestGrowth(object):
+    def test_drifting_1d(self):
+        h = h1(None, "fixed_width", 1, adaptive=True)
+        values = np.concatenate([np.arange(0, 200), -np.arange(1, 200)]) + 0.5
+        for value in values:
+            h.fill(value)
+        assert h.bin_count == 399
+        assert np.array_equal(h.frequencies, np.ones(399))
+        assert np.array_equal(h.errors2, np.ones(399))
+        assert np.array_equal(h.numpy_bins, np.arange(-199, 201))
+        # Views of a larger storage, so that not every new bin reallocates
+        storage = h._storage["all_frequencies"]
+        assert h.frequencies.base is storage
+        assert storage.shape[0] > h.bin_count
+        h.fill(200.5)
+        assert h._storage["all_frequencies"] is storage
+        assert h.frequencies[-1] == 1
+
+    def test_drifting_2d(self):
+        data = np.random.normal(0, 10, (500, 2))
+        h = h2(None, None, "fixed_width", 1, adaptive=True)
+        for value in data:
+            h.fill(value)
+        expected = h2(data[:, 0], data[:, 1], "fixed_width", 1)
+        assert h.shape == expected.shape
+        assert np.array_equal(h.frequencies, expected.frequencies)
+
+    def test_copy_drops_storage(self):
+        import pickle
+        h = h1(None, "fixed_width", 1, adaptive=True)
+        for value in range(20):
+            h.fill(value)
+        h2 = pickle.loads(pickle.dumps(h))
+        assert h2._storage is None
+        assert h2 == h
+        h2.fill(25)
+        assert h2.bin_count == 26
+
+
+    def test_max_bins(self):
+        h = h1(None, "fixed_width", bin_width=1, adaptive=True, max_bins=50)
+        data = np.random.normal(0, 5, 1000)
+        h.fill_n(data)
+        h.fill(1e12)
+        assert h.bin_count <= 50
+        assert h.total == 1001
+        assert np.array_equal(h.frequencies, h1(np.concatenate([data, [1e12]]), h.binning.copy()).frequencies)
+
+
 class TestAdaptiveArithmetics(object):
     def test_adding_empty(self):
         ha1 = h1(None, "fixed_width", 10, adaptive=True)
@@ -157,6 +216,43 @@ class TestAdaptiveArithmetics(object):
         assert np.array_equal(ha3.numpy_bins, [0, 10, 20, 30, 40, 50, 60])
         assert ha4 == ha3
 
+    def test_adding_log_linear(self):
+        ha1 = h1([0.5, 3, 12], "log_linear", lowest=0.5, significant_digits=1, adaptive=True)
+        ha2 = h1([3, 1000], "log_linear", lowest=0.5, significant_digits=1, adaptive=True)
+        assert ha2.bin_count > ha1.bin_count
+        ha3 = ha1 + ha2
+        assert ha3.numpy_bins is not ha2.numpy_bins
+        assert np.array_equal(ha3.numpy_bins, ha2.numpy_bins)
+        assert np.array_equal(ha3.frequencies, h1([0.5, 3, 12, 3, 1000], ha2.binning).frequencies)
+        assert ha2 + ha1 == ha3
+        with pytest.raises(RuntimeError):
+            ha1 + h1([1, 2], "log_linear", lowest=0.5, significant_digits=2, adaptive=True)
+
+        ha1.fill(1e4)
+        assert ha1.binning.last_edge > 1e4
+        assert ha1.total == 4
+
+    def test_adding_exponential(self):
+        ha1 = h1([2, 30, 31], "exponential", log_width=1, adaptive=True)
+        ha2 = h1([0.5, 3000], "exponential", log_width=1, adaptive=True)
+        ha3 = ha1 + ha2
+        assert np.allclose(ha3.numpy_bins, [0.1, 1, 10, 100, 1000, 10000])
+        assert np.array_equal(ha3.frequencies, [1, 1, 2, 0, 1])
+        assert ha2 + ha1 == ha3
+        with pytest.raises(RuntimeError):
+            ha1 + h1([2], "exponential", log_width=0.5, adaptive=True)
+
+    def test_adding_max_bins(self):
+        data = np.random.normal(0, 5, 1000)
+        ha1 = h1(data, "fixed_width", bin_width=1, adaptive=True, max_bins=64)
+        ha2 = h1(data * 100, "fixed_width", bin_width=1, adaptive=True, max_bins=64)
+        assert ha1.binning.bin_width != ha2.binning.bin_width
+        ha3 = ha1 + ha2
+        assert ha3.bin_count <= 64
+        assert np.array_equal(ha3.frequencies,
+                              h1(np.concatenate([data, data * 100]), ha3.binning.copy()).frequencies)
+        assert ha2 + ha1 == ha3
+
     def test_multiplication(self):
         ha1 = h1(None, "fixed_width", 10, adaptive=True)
         ha1.fill_n([1, 43, 23])
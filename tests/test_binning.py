@@ -30,6 +30,31 @@ class TestCalculateBinsNd(object):
         assert bins2.last_edge == 10
 
 
+class TestCachedRepresentations(object):
+    def test_cached(self):
+        the_binning = binnings.static_binning(bins=[[0, 1], [2, 3], [3, 5]])
+        assert the_binning.numpy_bins_with_mask is the_binning.numpy_bins_with_mask
+        assert np.array_equal(the_binning.numpy_bins_with_mask[1], [0, 2, 3])
+        assert np.array_equal(the_binning._find_bin_indices([0.5, 1.5, 4, 6]), [0, -2, 2, 3])
+        assert the_binning.first_edge == 0
+        assert the_binning.last_edge == 5
+        assert not the_binning.is_regular()
+
+    def test_invalidated_on_change(self):
+        the_binning = binnings.fixed_width_binning(np.array([1.5]), bin_width=1, adaptive=True)
+        assert np.array_equal(the_binning._find_bin_indices([0.5, 1.5, 2.5]), [-1, 0, 1])
+        assert the_binning.is_consecutive()
+        the_binning.force_bin_existence(np.array([0.5, 2.5]))
+        assert np.array_equal(the_binning._find_bin_indices([0.5, 1.5, 2.5]), [0, 1, 2])
+        assert np.array_equal(the_binning.numpy_bins_with_mask[0], [0, 1, 2, 3, np.inf])
+
+    def test_slicing(self):
+        the_binning = binnings.static_binning(bins=[0, 1, 2, 4])
+        assert the_binning.is_regular() is False
+        assert the_binning[:2].is_regular()
+        assert np.array_equal(the_binning[1:]._find_bin_indices([0.5, 1.5, 3]), [-1, 0, 1])
+
+
 class TestNumpyBins(object):
     def test_int_behaviour(self):
         data = np.random.rand(100)
@@ -46,6 +71,17 @@ class TestNumpyBins(object):
         assert np.allclose(the_binning.numpy_bins, edges)
         assert np.allclose(the_binning.numpy_bins, np.histogram(data, edges)[1])
 
+    def test_regular_indices(self):
+        # Equal widths => direct computation, must be the same as searching the edges
+        edges = np.linspace(0, 2 * np.pi, 17)
+        the_binning = binnings.numpy_binning(None, edges)
+        values = np.concatenate([np.random.rand(1000) * 8 - 1, edges,
+                                 np.nextafter(edges, np.inf), np.nextafter(edges, -np.inf)])
+        expected = np.searchsorted(edges, values, side="right") - 1
+        expected[values == edges[-1]] = 15    # Right edge included
+        expected[expected > 15] = 16
+        assert np.array_equal(the_binning._find_bin_indices(values), expected)
+
 
 class TestFixedWidthBins(object):
     def test_without_alignment(self):
@@ -129,6 +165,35 @@ class TestFixedWidthBins(object):
             b3.adapt(b1)
 
 
+    def test_max_bins(self):
+        b = binnings.FixedWidthBinning(bin_width=1, bin_count=4, min=0, adaptive=True, max_bins=8)
+        assert b.force_bin_existence(7.5) == 0
+        assert b.bin_count == 8
+        bin_map = b.force_bin_existence(-3)
+        assert np.array_equal(bin_map, [2, 2, 3, 3, 4, 4, 5, 5])
+        assert b.bin_width == 2
+        assert np.array_equal(b.numpy_bins, [-4, -2, 0, 2, 4, 6, 8])
+        assert b.force_bin_existence(1e12) is not None
+        assert b.bin_count <= 8
+        assert b.last_edge > 1e12
+        assert binnings.BinningBase.from_dict(b.to_dict()).max_bins == 8
+        with pytest.raises(RuntimeError):
+            binnings.FixedWidthBinning(bin_width=1, max_bins=1)
+        with pytest.raises(RuntimeError):
+            binnings.FixedWidthBinning(bin_width=1, bin_count=100, max_bins=10)
+
+    def test_adapt_max_bins(self):
+        b1 = binnings.FixedWidthBinning(bin_width=1, bin_count=3, min=0, adaptive=True, max_bins=4)
+        b2 = binnings.FixedWidthBinning(bin_width=4, bin_count=2, min=-4, adaptive=True, max_bins=4)
+        m1, m2 = b1.adapt(b2)
+        assert b1.bin_width == 4
+        assert np.array_equal(b1.numpy_bins, [-4, 0, 4])
+        assert np.array_equal(m1, [1, 1, 1])
+        assert m2 is None
+        with pytest.raises(RuntimeError):
+            b1.adapt(binnings.FixedWidthBinning(bin_width=3, bin_count=2, min=0, adaptive=True))
+
+
 class TestHumanBins(object):
     def test_exact(self):
         data = np.random.rand(1000)
@@ -161,6 +226,59 @@ class TestExponentialBins(object):
         the_binning = binnings.exponential_binning(data, 2, range=(1.0, 100.0))
         assert np.allclose(the_binning.numpy_bins, [1.0, 10.0, 100.0])
 
+    def test_log_width(self):
+        the_binning = binnings.exponential_binning(np.asarray([2.0, 50.0]), log_width=0.5)
+        assert np.allclose(the_binning.numpy_bins, 10 ** np.arange(0, 2.1, 0.5))
+
+    def test_adaptive(self):
+        the_binning = binnings.exponential_binning(log_width=1, adaptive=True)
+        assert the_binning.bin_count == 0
+        assert the_binning.force_bin_existence([5, -1]) == ()
+        assert np.allclose(the_binning.numpy_bins, [1, 10])
+        assert the_binning.force_bin_existence([2, 3]) is None
+        assert the_binning.force_bin_existence([0.05, 100]) == 2
+        assert np.allclose(the_binning.numpy_bins, [0.01, 0.1, 1, 10, 100, 1000])
+        with pytest.raises(RuntimeError):
+            the_binning.force_bin_existence(np.inf)
+
+
+class TestLogLinearBins(object):
+    def test_edges(self):
+        the_binning = binnings.log_linear_binning(lowest=1, significant_digits=0, range=(0, 10))
+        assert np.array_equal(the_binning.numpy_bins, [0, 1, 2, 4, 8, 16])
+        the_binning = binnings.calculate_bins(None, "log_linear", lowest=1e-6, significant_digits=3,
+                                              range=(0, 3600))
+        assert the_binning.sub_bucket_count == 2048
+        assert the_binning.last_edge > 3600
+        edges = the_binning.numpy_bins
+        assert np.allclose(np.diff(edges[:2049]), 1e-6)
+        assert np.all(np.diff(edges[2048:]) / edges[2048:-1] <= 1e-3)
+
+    def test_indices(self):
+        the_binning = binnings.log_linear_binning(lowest=1e-3, significant_digits=2, range=(0, 1e4))
+        np.random.seed(42)
+        values = np.concatenate([np.random.lognormal(0, 4, 10000), the_binning.numpy_bins,
+                                 [-1, 0, np.nan, np.inf, 1e5]])
+        expected = binnings.static_binning(bins=the_binning.bins)._find_bin_indices(values)
+        assert np.array_equal(the_binning._find_bin_indices(values), expected)
+        assert [the_binning._find_bin_index(value) for value in values[-200:]] == list(expected[-200:])
+
+    def test_adaptive(self):
+        the_binning = binnings.log_linear_binning(lowest=1, significant_digits=1, adaptive=True)
+        bin_count = the_binning.bin_count
+        assert the_binning.force_bin_existence([1, 2]) is None
+        assert the_binning.force_bin_existence([1, 1000]) == 0
+        assert the_binning.bin_count > bin_count
+        assert the_binning.numpy_bins[-2] <= 1000 < the_binning.last_edge
+        assert np.array_equal(the_binning.numpy_bins[:bin_count + 1],
+                              binnings.LogLinearBinning(1, 1, bin_count).numpy_bins)
+
+    def test_dict(self):
+        the_binning = binnings.log_linear_binning(lowest=0.5, significant_digits=2, range=(0, 100))
+        copy = binnings.BinningBase.from_dict(the_binning.to_dict())
+        assert isinstance(copy, binnings.LogLinearBinning)
+        assert np.array_equal(copy.numpy_bins, the_binning.numpy_bins)
+
 
 class TestQuantileBins(object):
     def test_simple(self):
@@ -176,6 +294,64 @@ class TestQuantileBins(object):
         the_binning = binnings.quantile_binning(data, 3, qrange=(0.4, 1.0))
         assert np.allclose(the_binning.numpy_bins, [0.76, 1.8, 2.96, 10.])
 
+    def test_weights(self):
+        data = np.asarray([0.1, 0.3, 0.4, 0.7, 1.0])
+        the_binning = binnings.quantile_binning(data, 2, weights=[1, 1, 1, 1, 2])
+        assert np.allclose(the_binning.numpy_bins, [0.1, 0.4, 1.0])
+        the_binning = binnings.quantile_binning(data, 2, weights=[2, 1, 1, 1, 1])
+        assert np.allclose(the_binning.numpy_bins, [0.1, 0.3, 1.0])
+
+    def test_sketch(self):
+        from physt.quantiles import quantile_sketch
+        np.random.seed(42)
+        data = np.random.normal(size=100000)
+        sketch = quantile_sketch(data, capacity=200)
+        the_binning = binnings.calculate_bins(None, "quantile", 4, sketch=sketch)
+        assert the_binning.first_edge == data.min()
+        assert the_binning.last_edge == data.max()
+        expected = np.percentile(data, [25, 50, 75])
+        ranks = np.searchsorted(np.sort(data), the_binning.numpy_bins[1:-1], side="right") / data.size
+        assert np.all(np.abs(ranks - [0.25, 0.5, 0.75]) <= sketch.relative_rank_error + 1e-5)
+        assert np.allclose(the_binning.numpy_bins[1:-1], expected, atol=0.05)
+
+
+class TestBayesianBlocksBins(object):
+    @pytest.mark.parametrize("fine_bins", [100, 10000])
+    def test_steps(self, fine_bins):
+        np.random.seed(42)
+        data = np.concatenate([np.random.rand(1000), 1 + np.random.rand(5000)])
+        the_binning = binnings.calculate_bins(data, "fine_blocks", fine_bins=fine_bins)
+        assert the_binning.first_edge == data.min()
+        assert the_binning.last_edge == data.max()
+        assert 2 <= the_binning.bin_count <= 4
+        assert np.min(np.abs(the_binning.numpy_bins - 1)) < 0.02
+
+    def test_invalid(self):
+        with pytest.raises(RuntimeError):
+            binnings.fine_bayesian_blocks_binning(np.ones(10))
+
+
+class TestKnuthBins(object):
+    def test_exact(self):
+        from math import lgamma
+        np.random.seed(42)
+        data = np.random.normal(size=500)
+        the_binning = binnings.fine_knuth_binning(data, max_bins=50)
+
+        def posterior(bin_count):
+            counts, _ = np.histogram(data, bin_count)
+            return (500 * np.log(bin_count) + lgamma(bin_count / 2) - bin_count * lgamma(0.5)
+                    - lgamma(500 + bin_count / 2) + sum(lgamma(c + 0.5) for c in counts))
+        assert the_binning.bin_count == max(range(1, 51), key=posterior)
+        assert np.allclose(the_binning.numpy_bins, np.linspace(data.min(), data.max(), the_binning.bin_count + 1))
+
+    def test_fine(self):
+        np.random.seed(42)
+        data = np.random.normal(size=20000)
+        exact = binnings.fine_knuth_binning(data, max_bins=100, fine_bins=20000)
+        fine = binnings.calculate_bins(data, "fine_knuth", max_bins=100, fine_bins=4000)
+        assert abs(exact.bin_count - fine.bin_count) <= 3
+
 
         # TODO: Rework the binning
 # if sys.version_info >= (3, 3):
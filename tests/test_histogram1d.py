@@ -2,7 +2,8 @@ from __future__ import division
 import sys
 import os
 sys.path = [os.path.join(os.path.dirname(__file__), "..")] + sys.path
-from physt.histogram1d import Histogram1D
+from physt.histogram1d import Histogram1D, calculate_frequencies
+from physt.binnings import static_binning
 from physt import h1
 import numpy as np
 import pytest
@@ -278,6 +279,138 @@ class TestMerging(object):
         hhb = hh.merge_bins(2, inplace=False)
         assert hha == hhb
 
+    def test_min_frequency(self):
+        h = Histogram1D([0, 1, 2, 3, 4, 5], [1, 0, 3, 0, 1], errors2=[1, 0, 5, 0, 1])
+        merged = h.merge_bins(min_frequency=2)
+        assert np.array_equal(merged.numpy_bins, [0, 2, 3, 5])
+        assert np.array_equal(merged.frequencies, [1, 3, 1])
+        assert np.array_equal(merged.errors2, [1, 5, 1])
+
+    def test_bin_map_array(self):
+        h = Histogram1D([0, 1, 2, 3, 4], [1, 2, 3, 4], errors2=[1, 4, 9, 16])
+        h._change_binning(h.binning.apply_bin_map(np.array([0, 0, 0, 1])), np.array([0, 0, 0, 1]))
+        assert np.array_equal(h.numpy_bins, [0, 3, 4])
+        assert np.array_equal(h.frequencies, [6, 4])
+        assert np.array_equal(h.errors2, [14, 16])
+
+
+class TestFixedWidthFrequencies(object):
+    def test_same_as_numpy(self):
+        data = np.random.normal(0, 1, 1000)
+        h = h1(data, "fixed_width", 0.1)
+        frequencies, _ = np.histogram(data, h.numpy_bins)
+        assert np.array_equal(h.frequencies, frequencies)
+        assert np.array_equal(h.errors2, frequencies)
+        assert np.isclose(h.mean(), data.mean())
+
+    def test_edges_and_missed(self):
+        h = h1([0.1, 0.2, 0.3, 0.6], "fixed_width", 0.1, range=(0.1, 0.3))
+        assert np.array_equal(h.frequencies, [1, 2])
+        assert h.underflow == 0
+        assert h.overflow == 1
+
+    def test_weights(self):
+        h = h1([0, 1, 2, 2, 7], "integer", range=(0, 5), weights=[1, 2, 3, 4, 5])
+        assert np.array_equal(h.frequencies, [1, 2, 7, 0, 0])
+        assert np.array_equal(h.errors2, [1, 4, 25, 0, 0])
+        assert h.overflow == 5
+
+
+class TestSearchedFrequencies(object):
+    def test_same_as_numpy(self):
+        data = np.random.normal(0, 1, 1000)
+        edges = np.sort(np.random.normal(0, 1, 50))
+        h = h1(data, edges)
+        frequencies, _ = np.histogram(data, edges)
+        assert np.array_equal(h.frequencies, frequencies)
+        assert h.underflow == (data < edges[0]).sum()
+        assert h.overflow == (data > edges[-1]).sum()
+
+    def test_inconsecutive(self):
+        binning = static_binning(bins=[[0, 1], [2, 3]])
+        frequencies, errors2, underflow, overflow, stats = calculate_frequencies(
+            [0.5, 1.5, 2.5, 3.0, 3.5, 5.0], binning)
+        assert np.array_equal(frequencies, [1, 2])
+        assert errors2 is None
+        assert np.isnan(underflow)
+        assert np.isnan(overflow)
+        assert stats["sum"] == 6.0
+
+
+class TestExponentialFrequencies(object):
+    def test_same_as_numpy(self):
+        data = np.random.lognormal(0, 2, 1000)
+        h = h1(data, "exponential", 20)
+        frequencies, _ = np.histogram(data, h.numpy_bins)
+        assert np.array_equal(h.frequencies, frequencies)
+        assert h.underflow == (data < h.numpy_bins[0]).sum()
+        assert h.overflow == (data > h.numpy_bins[-1]).sum()
+
+    def test_non_positive(self):
+        h = h1([-1.0, 0.0, 0.5, 2.0, 50.0, 100.0, 1000.0], "exponential", 2, range=(1, 100))
+        assert np.array_equal(h.frequencies, [1, 2])
+        assert h.underflow == 3
+        assert h.overflow == 1
+
+
+class TestChunks(object):
+    def test_same_as_single_shot(self):
+        data = np.random.normal(0, 1, 10000)
+        data[::7] = np.nan
+        weights = np.random.rand(10000)
+        for bins in [20, "fixed_width", "exponential"]:
+            args = (bins, 0.2) if bins == "fixed_width" else (bins,)
+            data_ = np.abs(data) if bins == "exponential" else data
+            h = h1(data_, *args, weights=weights, chunk_size=data.shape[0])
+            hc = h1(data_, *args, weights=weights, chunk_size=333)
+            assert np.array_equal(h.frequencies, hc.frequencies)
+            assert np.array_equal(h.errors2, hc.errors2)
+            assert h.underflow == hc.underflow
+            assert h.overflow == hc.overflow
+            assert h.mean() == hc.mean()
+            assert h.std() == hc.std()
+
+    def test_same_as_single_shot_blocks(self, monkeypatch):
+        from physt import histogram1d
+        monkeypatch.setattr(histogram1d, "BLOCK_SIZE", 100)
+        data = np.random.normal(0, 1, 10001)
+        weights = np.random.rand(10001)
+        h = h1(data, 20, weights=weights, chunk_size=data.shape[0])
+        for chunk_size in [1, 250, 1000, 3333]:
+            hc = h1(data, 20, weights=weights, chunk_size=chunk_size)
+            assert np.array_equal(h.frequencies, hc.frequencies)
+            assert np.array_equal(h.errors2, hc.errors2)
+            assert h._stats == hc._stats
+
+    def test_dropna_keeps_weights(self):
+        h = h1([1.0, np.nan, 2.0], [0, 1.5, 3], weights=[1, 10, 2], chunk_size=2)
+        assert np.array_equal(h.frequencies, [1, 2])
+        assert h.overflow == 0
+
+
+class TestWorkers(object):
+    def test_same_as_single_thread(self):
+        data = np.random.normal(0, 1, 10001)
+        weights = np.random.rand(10001)
+        h = h1(data, 30, weights=weights)
+        hw = h1(data, 30, weights=weights, workers=4)
+        assert h == hw
+        assert np.isclose(h.mean(), hw.mean())
+
+    def test_fill_n(self):
+        data = np.random.normal(0, 1, 1000)
+        h = h1(data, "fixed_width", 0.5)
+        h.fill_n(data, workers=3)
+        assert np.array_equal(h.frequencies, 2 * h1(data, "fixed_width", 0.5).frequencies)
+
+    def test_fill_n_after_weights(self):
+        h = h1([0.5, 1.5], [0, 1, 2])
+        assert h._errors2 is None
+        h.fill_n([0.5], weights=[2])
+        h.fill_n([0.5, 1.5])
+        assert np.array_equal(h.frequencies, [4, 2])
+        assert np.array_equal(h.errors2, [6, 2])
+
 
 class TestConversion(object):
     def test_pandas(self):
@@ -314,6 +447,81 @@ class TestFindBin(object):
         assert selected.find_bin(1.8) == 1
         assert selected.find_bin(1.9) == 2
 
+    def test_vectorized(self):
+        values = [1, 1.3, 1.45, 1.5, 1.72, 1.8, 1.9, np.nan]
+        assert np.array_equal(example.find_bin_n(values), [-1, 0, 1, 2, 3, 3, 4, 4])
+        selected = example[[0, 3]]
+        assert np.array_equal(selected.find_bin_n(values), [-1, 0, -2, -2, 1, 1, 2, 2])
+        assert [selected.find_bin(value) for value in values[:-1]] == [-1, 0, None, None, 1, 1, 2]
+
+    def test_direct(self):
+        h = h1(np.random.rand(100), "fixed_width", 0.1)
+        for value in np.concatenate([h.numpy_bins, np.random.rand(100) * 2 - 0.5]):
+            assert h.find_bin(value) == h.find_bin_n([value])[0]
+        h = h1(np.logspace(0, 3, 100), "exponential", 10)
+        assert h.find_bin(0) == -1
+        assert h.find_bin(-1) == -1
+        assert h.find_bin(h.numpy_bins[-1]) == 9
+        assert h.find_bin(np.nan) == 10
+        for i, edge in enumerate(h.numpy_bins[:-1]):
+            assert h.find_bin(edge) == i
+
+
+class TestCachedEdges(object):
+    def test_read_only(self):
+        h = h1(np.random.rand(100), 10)
+        assert h.bin_left_edges is h.bin_left_edges
+        with pytest.raises(ValueError):
+            h.bin_centers[0] = 1
+
+    def test_invalidated_on_change(self):
+        h = h1(None, "fixed_width", 0.1, adaptive=True)
+        assert h.bin_right_edges.shape == (0,)
+        h.fill(1.55)
+        assert np.allclose(h.bin_right_edges, [1.6])
+        assert np.allclose(h.bin_widths, [0.1])
+        assert h.find_bin(1.55) == 0
+
+
+class TestDerivedViews(object):
+    def test_in_place_edit(self):
+        h = h1(np.arange(10.), 5, range=(0, 10))
+        assert h.total == 10
+        assert np.array_equal(h.densities, [1] * 5)
+        h.frequencies[0] += 5
+        assert h.total == 15
+        assert h.densities[0] == 3.5
+        assert h.cumulative_frequencies[-1] == 15
+
+    def test_writable(self):
+        h = h1(np.arange(10.), 5, range=(0, 10))
+        densities = h.densities
+        densities /= 2
+        h.densities[0] = 2
+        assert h.densities[0] == 1
+
+    def test_invalidated_by_operations(self):
+        h = h1(np.random.rand(100), 10, range=(0, 1))
+        assert h.total == 100
+        h *= 2
+        assert h.total == 200
+        h += h1(np.random.rand(100), 10, range=(0, 1))
+        assert h.total == 300
+        h.fill_n([0.5, 0.5])
+        assert h.total == 302
+        h.normalize(inplace=True)
+        assert np.isclose(h.cumulative_frequencies[-1], 1)
+        h.merge_bins(2, inplace=True)
+        assert h.densities.shape == (5,)
+
+    def test_buffered(self):
+        h = h1(np.random.rand(100), 10, range=(0, 1))
+        h.set_buffer_size(10)
+        assert h.total == 100
+        h.fill(0.5)
+        assert h.total == 101
+        assert h.cumulative_frequencies[-1] == 101
+
 
 class TestFill(object):
     def test_fill(self):
@@ -344,6 +552,118 @@ class TestFill(object):
         assert np.allclose(h.frequencies, [1, 4.2, 3])
 
 
+class TestBufferedFill(object):
+    def test_same_as_unbuffered(self):
+        data = np.random.normal(size=1000)
+        h = h1(data[:100], 10)
+        hb = h.copy()
+        hb.set_buffer_size(64)
+        assert hb.buffer_size == 64
+        for value in data:
+            h << value
+            hb << value
+        assert hb._buffer_length == 1000 % 64
+        assert np.array_equal(h.frequencies, hb.frequencies)
+        assert hb._buffer_length == 0
+        assert h == hb
+        assert h.mean() == pytest.approx(hb.mean())
+
+    def test_weights_and_dtype(self):
+        h = Histogram1D([[0, 1], [1, 2], [2, 3]], [1, 2, 3])
+        h.buffer_size = 10
+        h.fill(1.3, weight=2)
+        h.fill(7)
+        assert h.overflow == 1
+        assert h.dtype == np.int64
+        h.fill(0.5, weight=0.5)
+        assert h.dtype == np.float64
+        assert np.allclose(h.frequencies, [1.5, 4, 3])
+        assert np.allclose(h.errors2, [1.25, 6, 3])
+
+    def test_adaptive_binning(self):
+        h = h1(None, "fixed_width", bin_width=1, adaptive=True)
+        h.fill_n([0.5, 1.5])
+        h.set_buffer_size(100)
+        for value in (5.5, 10.5, -3.5):
+            h.fill(value)
+        assert h.bin_count == 15
+        assert np.array_equal(h.numpy_bins, np.arange(-4, 12))
+        assert h.find_bin(10.5) == 14
+        assert h.frequencies.shape == (15,)
+
+    def test_buffer_dtype(self):
+        h = Histogram1D([[0, 1], [1, 2]], [1, 1])
+        h.set_buffer_size(10)
+        h.fill(1, weight=2 ** 53 + 1)
+        assert h._buffer[0].dtype == np.int64
+        assert h._buffer[1][0] == 2 ** 53 + 1
+        h.fill(0.5)    # Values of another type => flushed and reallocated
+        assert h._buffer[0].dtype == np.float64
+        assert h._buffer_length == 1
+        assert h.frequencies[0] == 2
+
+    def test_flush_before_arithmetic(self):
+        h = Histogram1D([[0, 1], [1, 2]], [1, 1])
+        h.set_buffer_size(10)
+        h.fill(0.5)
+        h *= 2
+        assert np.array_equal(h.frequencies, [4, 2])
+        h.set_buffer_size(None)
+        assert h.buffer_size == 0
+
+    def test_public_readers_flush(self):
+        h = h1([0.5, 1.5], [0, 1, 2])
+        h.set_buffer_size(10)
+        h.fill(1.5)
+        assert h.total == 3
+        h.fill(0.5)
+        assert h.to_dict()["frequencies"] == [2, 2]
+        h.fill(1.5)
+        assert h.mean() == pytest.approx(5.5 / 5)
+        other = h1([], [0, 1, 2])
+        other.set_buffer_size(10)
+        other.fill(0.5)
+        h += other
+        assert other._buffer_length == 0
+        assert np.array_equal(h.frequencies, [3, 3])
+
+
+class TestLazyErrors2(object):
+    def test_unweighted(self):
+        h = h1(np.random.normal(size=100), 10)
+        assert h._errors2 is None
+        h.fill_n(np.random.normal(size=100))
+        h.fill(0.1)
+        assert h._errors2 is None
+        assert np.array_equal(h.errors, np.sqrt(h.frequencies))
+        assert h._errors2 is None
+        assert np.array_equal(h.errors2, h.frequencies)
+        errors2 = h.errors2
+        errors2 *= 4         # Stored separately when requested
+        assert np.array_equal(h.errors2, 4 * h.frequencies)
+        h.fill(0.1)
+        assert h.errors2[h.find_bin(0.1)] == 4 * h.frequencies[h.find_bin(0.1)] - 3
+
+    def test_materialized(self):
+        h = Histogram1D([[0, 1], [1, 2]], [1, 1])
+        assert h._errors2 is None
+        h.fill(0.5, weight=3)
+        assert h._errors2 is not None
+        assert np.array_equal(h.frequencies, [4, 1])
+        assert np.array_equal(h.errors2, [10, 1])
+
+        h = Histogram1D([[0, 1], [1, 2]], [1, 1]) * 2
+        assert np.array_equal(h.errors2, [4, 4])
+
+    def test_mixed_add(self):
+        h = Histogram1D([[0, 1], [1, 2]], [1, 1])
+        hw = Histogram1D([[0, 1], [1, 2]], [1, 1], errors2=[2, 3])
+        assert np.array_equal((h + h).errors2, [2, 2])
+        assert (h + h)._errors2 is None
+        assert np.array_equal((h + hw).errors2, [3, 4])
+        assert np.array_equal((hw + h).errors2, [3, 4])
+
+
 class TestDtype(object):
     def test_simple(self):
         example = h1(values)
@@ -416,5 +736,64 @@ class TestDtype(object):
             example * complex(4, 5)
 
 
+class TestCompactDtype(object):
+    def test_promotion(self):
+        h = h1(values, 4, dtype="auto")
+        assert h.dtype == np.uint8
+        h.fill_n(np.repeat(values, 100))
+        assert h.dtype == np.uint8
+        h.fill_n(np.repeat(values, 200))
+        assert h.dtype == np.uint16
+        assert np.array_equal(h.frequencies, [301, 301, 301, 301])
+
+    def test_single_fills(self):
+        h = Histogram1D([[0, 1], [1, 2]], [250, 0], dtype="auto")
+        assert h.dtype == np.uint8
+        for i in range(10):
+            h.fill(0.5)
+            h.fill(-1)
+        assert h.dtype == np.uint16
+        assert np.array_equal(h.frequencies, [260, 0])
+        assert h.underflow == 10
+
+    def test_missed(self):
+        h = h1(values, 4, dtype="auto")
+        h.fill_n(-np.ones(1000))
+        assert h.dtype == np.uint16
+        assert h.underflow == 1000
+
+    def test_weights(self):
+        h = h1(values, 4, dtype="auto", weights=[1, 2, 2.1, 3.2])
+        assert h.dtype == np.float64
+        h = h1(values, 4, dtype="auto")
+        h.fill_n(values, weights=[0.5, 0.5, 0.5, 0.5])
+        assert h.dtype == np.float64
+        assert np.allclose(h.frequencies, [1.5, 1.5, 1.5, 1.5])
+        assert np.allclose(h.errors2, [1.25, 1.25, 1.25, 1.25])
+
+    def test_weights_precision(self):
+        h = Histogram1D([[0, 1], [1, 2]], [100000, 2 ** 24 + 1], dtype="auto")
+        for i in range(1000):
+            h.fill(0.5, weight=1e-3)
+        for i in range(3):
+            h.fill(1.5, weight=0.25)
+        assert np.isclose(h.frequencies[0], 100001, rtol=0, atol=1e-6)
+        assert h.frequencies[1] == 2 ** 24 + 1.75
+
+    def test_explicit_float32(self):
+        h = h1(values, dtype=np.float32)
+        h.fill_n(values, weights=np.array([0.5, 0.5, 0.5, 0.5]))
+        assert h.dtype == np.float64    # Promoted as with other explicit dtypes
+        h.fill_n(values, weights=np.array([0.5, 0.5, 0.5, 0.5], dtype=np.float32))
+        assert h.dtype == np.float64
+
+    def test_arithmetic(self):
+        h = Histogram1D([[0, 1], [1, 2]], [200, 100], dtype="auto")
+        assert (h + h).dtype == np.uint16
+        assert np.array_equal((h + h).frequencies, [400, 200])
+        assert (h * 1000).dtype == np.uint32
+        assert h.copy()._compact
+
+
 if __name__ == "__main__":
     pytest.main(__file__)
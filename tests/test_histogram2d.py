@@ -29,7 +29,7 @@ class TestCalculateFrequencies(object):
         frequencies, errors2, missing = histogram_nd.calculate_frequencies(vals, ndim=2, binnings=schemas)
         assert np.array_equal([[1, 3], [0, 1]], frequencies)
         assert missing == 2
-        assert np.array_equal(errors2, frequencies)
+        assert errors2 is None
 
     def test_gap(self):
         bins = [
@@ -40,7 +40,7 @@ class TestCalculateFrequencies(object):
         frequencies, errors2, missing = histogram_nd.calculate_frequencies(vals, ndim=2, binnings=schemas)
         assert np.array_equal([[0, 0], [0, 1]], frequencies)
         assert missing == 6
-        assert np.array_equal(errors2, frequencies)
+        assert errors2 is None
 
     def test_errors(self):
         bins = [
@@ -4,6 +4,7 @@ sys.path = [os.path.join(os.path.dirname(__file__), "..")] + sys.path
 import physt
 import numpy as np
 import pytest
+from physt import histogram_nd
 from physt.histogram_nd import Histogram2D, HistogramND
 from physt.histogram1d import Histogram1D
 from physt import h2, h3
@@ -109,6 +110,26 @@ class TestProjections(object):
         with pytest.raises(RuntimeError):
             h.projection()
 
+    def test_projections(self):
+        data = np.random.rand(500, 4)
+        h = physt.histogramdd(data, (4, 5, 6, 3), axis_names=["a", "b", "c", "d"],
+                              weights=np.random.rand(500))
+        groups = [0, "c", (1, 3), ("d", "a"), (0, 1, 2)]
+        projections = h.projections(*groups)
+        assert [p.ndim for p in projections] == [1, 1, 2, 2, 3]
+        assert isinstance(projections[2], Histogram2D)
+        for group, projection in zip(groups, projections):
+            group = group if isinstance(group, tuple) else (group,)
+            expected = h.copy().projection(*group)
+            assert projection.axis_names == expected.axis_names
+            assert np.allclose(projection.frequencies, expected.frequencies)
+            assert np.allclose(projection.errors2, expected.errors2)
+
+    def test_projections_invalid(self):
+        h = physt.histogramdd(np.random.rand(100, 3), (4, 5, 6))
+        with pytest.raises(RuntimeError):
+            h.projections(0, (1, 1))
+
 
 class TestSlicing:
     def test_slicing_with_upper_bound_only(self):
@@ -125,6 +146,156 @@ class TestSlicing:
         assert h[:,2].shape == (4,)
         # TODO: Add more combinations
 
+
+class TestFindBin(object):
+    def test_find_bin_n(self):
+        data = np.random.rand(100, 3)
+        h = physt.histogramdd(data, (4, 5, 6))
+        values = np.random.rand(50, 3) * 1.2 - 0.1
+        indices = h.find_bin_n(values)
+        assert indices.shape == (50, 3)
+        for value, index in zip(values, indices):
+            expected = h.find_bin(value)
+            if expected is None:
+                assert ((index < 0) | (index >= h.shape)).any()
+                assert h.find_bin_n([value], flat=True)[0] == -1
+            else:
+                assert tuple(index) == expected
+                assert h.find_bin_n([value], flat=True)[0] == np.ravel_multi_index(expected, h.shape)
+
+    def test_wrong_shape(self):
+        h = physt.histogramdd(np.random.rand(100, 3), 4)
+        with pytest.raises(RuntimeError):
+            h.find_bin_n(np.random.rand(10, 2))
+
+
+class TestWorkers(object):
+    def test_same_as_single_thread(self):
+        data = np.random.rand(1001, 3)
+        weights = np.random.rand(1001)
+        h = physt.histogramdd(data, (4, 5, 6), weights=weights)
+        hw = physt.histogramdd(data, (4, 5, 6), weights=weights, workers=4)
+        assert h == hw
+
+    def test_fill_n(self):
+        data = np.random.rand(1000, 3)
+        h = physt.histogramdd(data, (4, 5, 6))
+        h.fill_n(data, workers=3)
+        assert np.array_equal(h.frequencies, 2 * physt.histogramdd(data, (4, 5, 6)).frequencies)
+
+
+class TestCalculateFrequencies(object):
+    def test_same_as_numpy(self):
+        data = np.random.rand(1000, 3)
+        weights = np.random.rand(1000)
+        h = physt.histogramdd(data, (4, 5, 6), weights=weights)
+        edges = [binning.numpy_bins for binning in h._binnings]
+        expected, _ = np.histogramdd(data, edges, weights=weights)
+        expected_errors2, _ = np.histogramdd(data, edges, weights=weights ** 2)
+        assert np.allclose(h.frequencies, expected)
+        assert np.allclose(h.errors2, expected_errors2)
+
+    def test_chunks(self):
+        data = np.random.rand(1000, 3) * 1.2 - 0.1
+        binnings = physt.histogramdd(np.random.rand(100, 3), 4)._binnings
+        frequencies, errors2, missing = histogram_nd.calculate_frequencies(
+            data, 3, binnings, chunk_size=7)
+        frequencies1, errors21, missing1 = histogram_nd.calculate_frequencies(data, 3, binnings)
+        assert frequencies.dtype == np.int64
+        assert np.array_equal(frequencies, frequencies1)
+        assert errors2 is None
+        assert missing == missing1 == 1000 - frequencies.sum()
+
+    def test_fill_n_empty(self):
+        h = physt.histogramdd(np.random.rand(100, 3), 4)
+        h.fill_n(np.zeros((0, 3)))
+        assert h.total == 100
+
+
+class TestColumns(object):
+    def test_facade(self):
+        data = np.random.rand(100, 3)
+        h = physt.histogramdd(data, (4, 5, 6))
+        assert h == physt.histogramdd([data[:, 0], data[:, 1], data[:, 2]], (4, 5, 6), columns=True)
+        assert h == physt.histogramdd(data.T, (4, 5, 6), columns=True)
+
+    def test_structured_array(self):
+        data = np.random.rand(100, 2)
+        structured = np.zeros(100, dtype=[("x", float), ("y", float)])
+        structured["x"], structured["y"] = data[:, 0], data[:, 1]
+        assert physt.histogramdd(data, 4) == physt.histogramdd(structured, 4)
+
+    def test_fill_n(self):
+        data = np.random.rand(100, 3)
+        h = physt.histogramdd(data, (4, 5, 6))
+        h.fill_n([data[:, 0], data[:, 1], data[:, 2]], columns=True)
+        assert np.array_equal(h.frequencies, 2 * physt.histogramdd(data, (4, 5, 6)).frequencies)
+
+    def test_dropna_with_weights(self):
+        x = np.array([0.1, np.nan, 0.6, 0.9])
+        y = np.array([0.2, 0.3, np.nan, 0.8])
+        h = physt.histogram2d(x, y, [[0, 0.5, 1], [0, 0.5, 1]], weights=[1, 2, 3, 4])
+        assert np.array_equal(h.frequencies, [[1, 0], [0, 4]])
+
+    def test_wrong_columns(self):
+        with pytest.raises(RuntimeError):
+            physt.histogramdd([np.zeros(10), np.zeros(9)], columns=True)
+
+
+class TestLazyErrors2(object):
+    def test_unweighted(self):
+        data = np.random.rand(100, 3)
+        h = physt.histogramdd(data, (4, 5, 6))
+        h.fill_n(data)
+        h.fill([0.5, 0.5, 0.5])
+        assert h._errors2 is None
+        assert h.projection(0)._errors2 is None
+        assert np.array_equal(h.errors2, h.frequencies)
+        h.errors2[0, 0, 0] = 1000
+        assert h.frequencies[0, 0, 0] != 1000
+
+    def test_weighted_fill(self):
+        data = np.random.rand(100, 3)
+        weights = np.random.rand(100)
+        h = physt.histogramdd(data, (4, 5, 6))
+        h.fill_n(data, weights=weights)
+        expected = physt.histogramdd(data, (4, 5, 6)) + physt.histogramdd(data, (4, 5, 6), weights=weights)
+        assert np.allclose(h.errors2, expected.errors2)
+
+
+class TestCompactDtype(object):
+    def test_promotion(self):
+        data = np.zeros((200, 2))
+        h = physt.histogramdd(data, (2, 2), range=(0, 1), dtype="auto")
+        assert h.dtype == np.uint8
+        h.fill_n(data)
+        assert h.dtype == np.uint16
+        h.fill([0.1, 0.1])
+        assert h.frequencies[0, 0] == 401
+        assert h.total == 401
+
+
+class TestCachedViews(object):
+    def test_projection(self):
+        data = np.random.rand(100, 3)
+        h = physt.histogramdd(data, (4, 5, 6), axis_names=["x", "y", "z"])
+        projection = h.projection("x")
+        assert h.projection("x") is not projection
+        projection.fill(0.5)    # Projections are independent of the cache
+        assert h.projection("x").total == 100
+        h.fill_n(data)
+        assert h.projection("x").total == 200
+        assert np.array_equal(h.projection("z", "x").frequencies, h.frequencies.sum(axis=1))
+        h.frequencies[0, 0, 0] += 5
+        assert h.projection("x").total == 205
+        assert h.projections("x", ("x", "y"))[1].total == 205
+
+    def test_bin_sizes(self):
+        h = physt.histogramdd(np.random.rand(100, 3), (4, 5, 6), range=(0, 1))
+        assert h.bin_sizes is h.bin_sizes
+        assert np.allclose(h.densities, h.frequencies * 120)
+
+
 class TestH2(object):
     def test_create_empty_h2(self):
         h2(None, None, "integer", adaptive=True)
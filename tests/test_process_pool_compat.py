@@ -0,0 +1,60 @@
+from __future__ import absolute_import
+import sys
+import os
+sys.path = [os.path.join(os.path.dirname(__file__), "..")] + sys.path
+import physt
+from physt import special
+from physt.compat import process_pool
+import numpy as np
+import pytest
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+pytestmark = pytest.mark.skipif(shared_memory is None, reason="Requires Python 3.8+")
+
+
+class TestProcessPool(object):
+    def test_h1(self):
+        data = np.random.normal(size=1001)
+        data[7] = np.nan
+        weights = np.random.rand(1001)
+        h = physt.h1(data, 20, weights=weights)
+        hp = process_pool.h1(data, 20, weights=weights, processes=2)
+        assert np.allclose(h.frequencies, hp.frequencies)
+        assert np.array_equal(h.numpy_bins, hp.numpy_bins)
+        assert h.total == pytest.approx(hp.total)
+
+    def test_h1_adaptive(self):
+        data = np.random.normal(size=1000)
+        hp = process_pool.h1(data, "fixed_width", 0.5, adaptive=True, processes=2)
+        assert hp.is_adaptive()
+        assert hp == physt.h1(data, "fixed_width", 0.5, adaptive=True)
+
+    def test_h2_and_h3(self):
+        data = np.random.rand(1000, 3)
+        assert process_pool.h2(data[:, 0], data[:, 1], 4, processes=2) == \
+            physt.h2(data[:, 0], data[:, 1], 4)
+        assert process_pool.h3(data, 5, processes=3) == physt.h3(data, 5)
+        assert process_pool.h3(list(data.T), 5, processes=2) == physt.h3(list(data.T), 5)
+
+    def test_special(self):
+        data = np.random.normal(size=(1000, 3))
+        assert process_pool.polar_histogram(data[:, 0], data[:, 1], processes=2) == \
+            special.polar_histogram(data[:, 0], data[:, 1])
+        assert process_pool.spherical_histogram(data, processes=2) == \
+            special.spherical_histogram(data)
+        hp = process_pool.cylindrical_histogram(data, processes=2)
+        assert isinstance(hp, special.CylindricalHistogram)
+        assert hp == special.cylindrical_histogram(data)
+
+    def test_special_integer_data(self):
+        data = np.random.randint(-5, 5, size=(1000, 3))
+        assert process_pool.spherical_histogram(data, processes=2) == \
+            special.spherical_histogram(data.astype(float))
+
+
+if __name__ == "__main__":
+    pytest.main(__file__)
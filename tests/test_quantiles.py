@@ -0,0 +1,89 @@
+import sys
+import os
+sys.path = [os.path.join(os.path.dirname(__file__), "..")] + sys.path
+from physt.quantiles import QuantileSketch, quantile_sketch
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def data():
+    np.random.seed(42)
+    return np.random.exponential(size=50000)
+
+
+def within_bound(sketch, data, q, weights=None):
+    """Whether quantile estimates are exact quantiles of q' within the rank-error bound."""
+    values = sketch.quantile(q)
+    order = np.argsort(data)
+    cumulative = np.concatenate([[0], np.cumsum(np.ones_like(data) if weights is None else weights[order])])
+    lower = cumulative[np.searchsorted(data[order], values, side="left")] / cumulative[-1]
+    upper = cumulative[np.searchsorted(data[order], values, side="right")] / cumulative[-1]
+    tolerance = sketch.relative_rank_error + 1e-9
+    return np.all((lower <= q + tolerance) & (upper >= q - tolerance))
+
+
+class TestExact(object):
+    def test_small(self):
+        sketch = quantile_sketch([3, 1, 2, 2, np.nan, 4])
+        assert sketch.rank_error == 0
+        assert sketch.total == 5
+        assert sketch.size == 4
+        assert sketch.quantile(0.5) == 2
+        assert np.array_equal(sketch.quantile([0, 0.2, 0.7, 1]), [1, 1, 3, 4])
+
+    def test_weights(self):
+        sketch = quantile_sketch([1, 2, 3], weights=[1, 0, 3])
+        assert sketch.total == 4
+        assert np.array_equal(sketch.quantile([0.25, 0.26, 1]), [1, 3, 3])
+
+    def test_invalid(self):
+        with pytest.raises(RuntimeError):
+            QuantileSketch().quantile(0.5)
+        with pytest.raises(RuntimeError):
+            quantile_sketch([1, 2]).quantile(1.5)
+        with pytest.raises(RuntimeError):
+            quantile_sketch([1, 2], weights=[1, -1])
+        with pytest.raises(RuntimeError):
+            quantile_sketch([1, np.nan], dropna=False)
+
+
+class TestApproximate(object):
+    def test_chunks(self, data):
+        sketch = QuantileSketch(capacity=100)
+        for i in range(0, data.size, 1000):
+            sketch.update(data[i:i + 1000])
+        assert sketch.total == data.size
+        assert 0 < sketch.relative_rank_error < 0.05
+        assert sketch.size <= 100 * len(sketch._levels)
+        q = np.linspace(0.01, 0.99, 99)
+        assert within_bound(sketch, data, q)
+        assert sketch.quantile(0) == data.min()
+        assert sketch.quantile(1) == data.max()
+
+    def test_weights(self, data):
+        weights = np.random.rand(data.size) * 10
+        sketch = quantile_sketch(data, weights, capacity=100)
+        assert np.isclose(sketch.total, weights.sum())
+        q = np.linspace(0.05, 0.95, 19)
+        assert within_bound(sketch, data, q, weights)
+
+    def test_merge(self, data):
+        parts = [quantile_sketch(part, capacity=100) for part in np.array_split(data, 7)]
+        merged = sum(parts)
+        assert merged.total == data.size
+        assert parts[0].total == data.size // 7 + 1
+        in_place = parts[0].copy().merge(*parts[1:])
+        assert np.array_equal(merged.quantile([0.1, 0.5]), in_place.quantile([0.1, 0.5]))
+        q = np.linspace(0.01, 0.99, 99)
+        assert within_bound(merged, data, q)
+
+    def test_workers(self, data):
+        sketch = quantile_sketch(data, capacity=100, workers=4)
+        assert sketch.total == data.size
+        q = np.linspace(0.01, 0.99, 99)
+        assert within_bound(sketch, data, q)
+
+
+if __name__ == "__main__":
+    pytest.main(__file__)
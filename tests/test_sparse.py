@@ -0,0 +1,115 @@
+import sys
+import os
+sys.path = [os.path.join(os.path.dirname(__file__), "..")] + sys.path
+import physt
+import numpy as np
+import pytest
+from physt.sparse import SparseHistogramND, sparse_histogram
+
+
+@pytest.fixture
+def data():
+    np.random.seed(42)
+    return np.random.rand(1000, 3) * 1.2 - 0.1
+
+
+class TestCreation(object):
+    def test_same_as_dense(self, data):
+        weights = np.random.rand(1000)
+        dense = physt.histogramdd(data, (4, 5, 6), range=(0, 1), weights=weights)
+        h = sparse_histogram(data, (4, 5, 6), range=(0, 1), weights=weights)
+        outside = ((data < 0) | (data > 1)).any(axis=1)
+        assert h.occupied_count == np.count_nonzero(dense.frequencies)
+        assert np.isclose(h.missed, weights[outside].sum())
+        assert np.allclose(h.to_dense().frequencies, dense.frequencies)
+        assert np.allclose(h.to_dense().errors2, dense.errors2)
+        from_dense = SparseHistogramND.from_dense(dense)
+        assert np.array_equal(from_dense.flat_indices, h.flat_indices)
+        assert np.allclose(from_dense.frequencies, h.frequencies)
+
+    def test_indices(self):
+        h = SparseHistogramND([[0, 1, 2], [0, 1, 2, 3]], indices=[[1, 2], [0, 0], [1, 2]],
+                              frequencies=[1, 2, 3])
+        assert np.array_equal(h.flat_indices, [0, 5])
+        assert np.array_equal(h.indices, [[0, 0], [1, 2]])
+        assert np.array_equal(h.frequencies, [2, 4])
+        assert h.total == 6
+
+    def test_too_many_bins(self):
+        with pytest.raises(RuntimeError):
+            SparseHistogramND([np.arange(10 ** 5)] * 5)
+
+
+class TestFill(object):
+    def test_fill_n(self, data):
+        h = sparse_histogram(data, (4, 5, 6), range=(0, 1))
+        h.fill_n([data[:, 0], data[:, 1], data[:, 2]], columns=True)
+        dense = physt.histogramdd(data, (4, 5, 6), range=(0, 1))
+        assert np.array_equal(h.to_dense().frequencies, 2 * dense.frequencies)
+        assert h.missed == 2 * ((data < 0) | (data > 1)).any(axis=1).sum()
+
+    def test_fill(self):
+        h = SparseHistogramND([[0, 1, 2], [0, 1, 2]])
+        assert h.fill([0.5, 1.5], weight=2) == (0, 1)
+        assert h.fill([3, 1.5]) is None
+        assert h.dtype == np.int64
+        assert np.array_equal(h.frequencies, [2])
+        assert np.array_equal(h.errors2, [4])
+        assert h.missed == 1
+
+    def test_adaptive(self):
+        h = sparse_histogram(None, "fixed_width", bin_width=1, dim=2, adaptive=True)
+        dense = physt.histogramdd(None, "fixed_width", bin_width=1, dim=2, adaptive=True)
+        for values in ([[1, 2], [5, -3]], [[10, 10.5]], [[-2, 0]]):
+            h.fill_n(values)
+            dense.fill_n(values)
+        assert h.to_dense() == dense
+
+
+class TestOperations(object):
+    def test_projection(self, data):
+        h = sparse_histogram(data, (4, 5, 6), range=(0, 1), axis_names=["x", "y", "z"])
+        dense = h.to_dense()
+        projection = h.projection("x", "z")
+        assert isinstance(projection, SparseHistogramND)
+        assert projection.axis_names == ("x", "z")
+        assert np.array_equal(projection.to_dense().frequencies, dense.projection("x", "z").frequencies)
+        assert np.array_equal(h.projection(1).to_dense().frequencies, dense.projection(1).frequencies)
+
+    def test_add(self, data):
+        h1 = sparse_histogram(data[:500], (4, 5, 6), range=(0, 1))
+        h2 = sparse_histogram(data[500:], (4, 5, 6), range=(0, 1))
+        expected = physt.histogramdd(data, (4, 5, 6), range=(0, 1))
+        assert np.array_equal((h1 + h2).to_dense().frequencies, expected.frequencies)
+        assert np.array_equal((h1 + h2.to_dense()).to_dense().frequencies, expected.frequencies)
+        with pytest.raises(RuntimeError):
+            h1 + sparse_histogram(data, (4, 5, 7))
+
+    def test_merge_bins(self, data):
+        h = sparse_histogram(data, (4, 6, 6), range=(0, 1))
+        merged = h.merge_bins(2, axis=1)
+        assert merged.shape == (4, 3, 6)
+        assert merged.to_dense() == h.to_dense().merge_bins(2, axis=1)
+
+    def test_merge_bins_min_frequency(self, data):
+        h = sparse_histogram(data, (4, 6, 6), range=(0, 1))
+        merged = h.merge_bins(min_frequency=100)
+        assert merged.to_dense() == h.to_dense().merge_bins(min_frequency=100)
+
+    def test_missed_1d(self):
+        from physt.binnings import static_binning
+        h = SparseHistogramND([static_binning(bins=[[0, 1], [2, 3]])])
+        h.fill_n([[-1], [0.5], [1.5], [2.5], [4], [4]], weights=[1, 2, 3, 4, 5, 6])
+        assert h.missed == 15
+        dense = h.to_dense()
+        assert (dense.underflow, dense.overflow, dense.inner_missed) == (1, 11, 3)
+        assert SparseHistogramND.from_dense(dense) == h
+        assert SparseHistogramND.from_dict(h.to_dict()).to_dense() == dense
+
+    def test_dict(self, data):
+        h = sparse_histogram(data, (4, 5, 6), range=(0, 1), weights=np.random.rand(1000))
+        assert SparseHistogramND.from_dict(h.to_dict()) == h
+
+
+if __name__ == "__main__":
+    pytest.main(__file__)
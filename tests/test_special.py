@@ -35,6 +35,52 @@ class TestPolar(object):
         assert special.RadialHistogram == type(h.projection("r"))
         assert special.AzimuthalHistogram == type(h.projection("phi"))
 
+    def test_find_bin_n(self):
+        data = np.array([[0.01, 0.01], [0.01, 0.99], [-1, .01], [-1, -.01]])
+        h = special.polar_histogram(data[:, 0], data[:, 1], radial_bins=2, phi_bins=4)
+        assert np.array_equal(h.find_bin_n(data), [h.find_bin(value) for value in data])
+        transformed = special.PolarHistogram.transform(data)
+        assert np.array_equal(h.find_bin_n(transformed, flat=True, transformed=True), [0, 4, 5, 6])
+
+
+class TestFill(object):
+    def test_chunked_fill_n(self):
+        data = np.random.normal(size=(1000, 3))
+        data[7, 1] = np.nan
+        weights = np.random.rand(1000)
+        h = special.spherical_histogram(data, radial_bins=5, weights=weights)
+        h2 = h.copy(include_frequencies=False)
+        h2.fill_n(data, weights=weights, chunk_size=128)
+        assert np.allclose(h2.frequencies, h.frequencies)
+        assert np.allclose(h2.errors2, h.errors2)
+
+        h3 = h.copy(include_frequencies=False)
+        h3.fill_n([data[:, 0], data[:, 1], data[:, 2]], weights=weights, columns=True)
+        assert np.allclose(h3.frequencies, h.frequencies)
+
+    def test_facade_with_explicit_bins(self):
+        data = np.random.normal(size=(1000, 3))
+        bins = [np.linspace(0, 2, 5), np.linspace(0, 2 * np.pi, 9), np.linspace(-1, 1, 3)]
+        h = special.cylindrical_histogram(data, *bins)
+        transformed = special.CylindricalHistogram.transform(data)
+        expected = physt.histogramdd(transformed, bins)
+        assert np.array_equal(h.frequencies, expected.frequencies)
+        assert h.missed == 1000 - expected.total
+
+    def test_explicit_bins_with_nan(self):
+        x = np.array([0.5, np.nan, 1.0])
+        y = np.array([0.5, 0.5, 1.0])
+        with pytest.raises(RuntimeError):
+            special.polar_histogram(x, y, dropna=False, radial_bins=[0, 1, 2, 3], phi_bins=4)
+        h = special.polar_histogram(x, y, radial_bins=[0, 1, 2, 3], phi_bins=4)
+        assert h.total == 2
+
+    def test_transform_columns(self):
+        data = np.random.normal(size=(100, 3))
+        for klass in (special.SphericalHistogram, special.CylindricalHistogram):
+            columns = klass.transform_columns([data[:, 0], data[:, 1], data[:, 2]])
+            assert np.allclose(np.column_stack(columns), klass.transform(data))
+
 
 class TestSpherical(object):
     def test_transform(self):
@@ -85,6 +131,14 @@ class TestCylindrical(object):
         assert special.PolarHistogram == type(h.projection("rho", "phi"))
         assert special.PolarHistogram == type(h.projection("phi", "rho"))
 
+    def test_projections(self):
+        h = special.cylindrical_histogram([[1, 2, 3], [2, 3, 4]])
+        surface, polar = h.projections(("phi", "z"), ("rho", "phi"))
+        assert special.CylinderSurfaceHistogram == type(surface)
+        assert special.PolarHistogram == type(polar)
+        assert surface.radius == h.get_bin_right_edges(0)[-1]
+        assert surface.total == 2
+
 
 if __name__ == "__main__":
     pytest.main(__file__)